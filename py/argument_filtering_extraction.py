@@ -1,11 +1,15 @@
-import json
+import logging
 import re
 from pathlib import Path
 import os
 import spacy
 
+from doid_table import load_doid_table
 from entity_detection import is_expression_type, is_disease_sample
 from exceptions import InvalidArgument, GeneNotFound, MistypedExpressionLevel, DiseaseNotFound
+from mention_matching import find_mentions
+
+logger = logging.getLogger(__name__)
 
 # Dictionary for Expression Level Normalization
 expression_level_norm = {'gain': 'UP', 'increased': 'UP', 'high': 'UP', 'overexpressed': 'UP',
@@ -40,16 +44,15 @@ investigation_trigs = ['investigate', 'investigated', 'examine', 'examined', 'an
 analyzed_trigs = ['tested', 'explored', 'collected', 'analyzed', 'measured', 'enrolled', 'assessed']
 
 # Generic Diseases
-generic_diseases = ['tumor', 'cancer', 'disease', 'tumor metastases', 'infection', 'metastases', 'tumors', 'died',
-                    'cancerous', 'carcinoma', 'cancerous', 'metastasis']
+generic_diseases = {'tumor', 'cancer', 'disease', 'tumor metastases', 'infection', 'metastases', 'tumors', 'died',
+                    'cancerous', 'carcinoma', 'metastasis'}
 
-# Dictionary to map DOIDs to the Disease Name
+# Table to map DOIDs to the Disease Name, {DOID: (Disease Name, lower-case Disease Name, True if generic)}
 doid_to_names_json = str(Path(os.path.abspath(os.getcwd())).parent.absolute()) + "/data/input/" + 'doid_to_names.json'
-with open(doid_to_names_json, 'r') as udf:
-    doid_to_names = json.loads(udf.read())
+doid_table = load_doid_table(doid_to_names_json, generic_diseases)
 
 
-def check_components(components, genes, diseases, micro_rnas, general_annotations, verbose=False):
+def components_meet_constraints(components, genes, diseases, micro_rnas, general_annotations, verbose=False):
     """
     Check if the arguments found by the RE module meet the type constraints.
 
@@ -58,19 +61,29 @@ def check_components(components, genes, diseases, micro_rnas, general_annotation
     :param diseases: (dict) dictionary of disease mentions detected using PubTator.
     :param micro_rnas: (list(String)) list of microRNA mentions detected using regex.
     :param general_annotations: (dict) dictionary of overall annotations.
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
-    :return: return True if components are okay, else raise an exception.
+    :return: True if components are okay, otherwise False.
     """
 
     # CA of type 'expression' or contains a gene/miRNA mention
     # CE1 of type 'disease/disease-sample' or contains a disease mention
-    if check_aspect(components['compared_aspect'], genes, micro_rnas, general_annotations, verbose) \
-            and check_entity(components['compared_entity_1'], diseases, general_annotations):
-        return True
+    return aspect_meets_constraints(components['compared_aspect'], genes, micro_rnas, general_annotations, verbose) \
+        and entity_meets_constraints(components['compared_entity_1'], diseases, general_annotations)
 
 
-def check_aspect(component, genes, micro_rnas, general_annotations, verbose):
+def check_components(components, genes, diseases, micro_rnas, general_annotations, verbose=False):
+    """
+    Check if the arguments found by the RE module meet the type constraints, see components_meet_constraints.
+
+    :return: return True if components are okay, else raise an exception.
+    """
+    if not components_meet_constraints(components, genes, diseases, micro_rnas, general_annotations, verbose):
+        raise InvalidArgument
+    return True
+
+
+def aspect_meets_constraints(component, genes, micro_rnas, general_annotations, verbose):
     """
     Check if Compared Aspect is of type expression or contains gene/microRNA mentions.
 
@@ -78,91 +91,117 @@ def check_aspect(component, genes, micro_rnas, general_annotations, verbose):
     :param genes: (dict) dictionary of gene mentions detected using PubTator.
     :param micro_rnas: (list(String)) list of microRNA mentions detected using regex.
     :param general_annotations: (dict) dictionary of overall annotations.
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
-    :return: True if CA meet the type constraint otherwise raise an Exception
+    :return: True if CA meet the type constraint otherwise False
     """
+    # Diagnostic messages are also produced when DEBUG logging is enabled for this module
+    verbose = verbose or logger.isEnabledFor(logging.DEBUG)
     # Normalize compared_aspect special characters such as '-' and if start of sentence lower-case first letter
     compared_aspect = component.text.encode().replace(b"\xe2\x80\x91", b"-").decode()
     if verbose:
-        print('Compared Aspect', compared_aspect)
+        logger.debug('Compared Aspect %s', compared_aspect)
     # Check compared_aspect of type 'expression or gene/microRNA itself
-    if genes and [g for g in genes.keys() if g in compared_aspect]:
+    if genes and find_mentions(genes, compared_aspect):
         if verbose:
-            print("compared aspect is the gene itself")
+            logger.debug('compared aspect is the gene itself')
         return True
     if micro_rnas and [m for m in micro_rnas if m in compared_aspect]:
         if verbose:
-            print("compared aspect is the microRNA itself")
+            logger.debug('compared aspect is the microRNA itself')
         return True
     if is_expression_type(component):
         if verbose:
-            print("Compared aspect is of type expression")
+            logger.debug('Compared aspect is of type expression')
         return True
-    if general_annotations['genes'] and [g for g in general_annotations['genes'].keys() if g in compared_aspect]:
+    if general_annotations['genes'] and find_mentions(general_annotations['genes'], compared_aspect):
         if verbose:
-            print('Gene mention in general_annotations')
+            logger.debug('Gene mention in general_annotations')
         return True
     # look for 'CD[0-9]+' genes
     if re.search("CD[0-9]+", compared_aspect):
         if verbose:
-            print('CD* gene mention')
+            logger.debug('CD* gene mention')
         return True
     # lower-case normalization
     if verbose:
-        print('Try lower-case normalization')
+        logger.debug('Try lower-case normalization')
     if genes:
-        tmp = [g for g in genes.keys() if g.lower() in compared_aspect.lower()]
+        tmp = find_mentions(genes, compared_aspect, lower=True)
         if tmp:
             if verbose:
-                print(f'gene lower-case normalization: {tmp}')
+                logger.debug('gene lower-case normalization: %s', tmp)
             return True
     # if gene is not yet found, look for general_annotations
     if general_annotations['genes']:
-        tmp = [m for m in general_annotations['genes'].keys() if m.lower() in compared_aspect.lower()]
+        tmp = find_mentions(general_annotations['genes'], compared_aspect, lower=True)
         if verbose:
-            print('Searching general_annotations')
-            print('mentions:', tmp)
+            logger.debug('Searching general_annotations')
+            logger.debug('mentions: %s', tmp)
         if tmp:
             if verbose:
-                print(f'gene lower-case normalization in general_annotations: {tmp}')
+                logger.debug('gene lower-case normalization in general_annotations: %s', tmp)
             return True
     if verbose:
-        print("Compared aspect does not meet type constraint")
-    raise InvalidArgument
+        logger.debug('Compared aspect does not meet type constraint')
+    return False
 
 
-def check_entity(component, diseases, general_annotations, verbose=False):
+def check_aspect(component, genes, micro_rnas, general_annotations, verbose):
+    """
+    Check if Compared Aspect is of type expression or contains gene/microRNA mentions, see aspect_meets_constraints.
+
+    :return: True if CA meet the type constraint otherwise raise an Exception
+    """
+    if not aspect_meets_constraints(component, genes, micro_rnas, general_annotations, verbose):
+        raise InvalidArgument
+    return True
+
+
+def entity_meets_constraints(component, diseases, general_annotations, verbose=False):
     """
     Check if Compared Entity 1/Compared Entity 2 is of type disease/disease-sample or contains disease mentions.
 
     :param component: (spacy.tokens.doc.Doc) Compared Entity extracted by the RE module.
     :param diseases: (dict) dictionary of disease mentions detected using PubTator.
     :param general_annotations: (dict) dictionary of overall annotations.
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
-    :return: True if CE1/CE2 meet the type constraint otherwise raise an Exception
+    :return: True if CE1/CE2 meet the type constraint otherwise False
     """
+    verbose = verbose or logger.isEnabledFor(logging.DEBUG)
 
     if verbose:
-        print(f"Checking compared entity/expression location: {component.text}")
-    if [k for k in diseases.keys() if k in component.text.lower()]:
+        logger.debug('Checking compared entity/expression location: %s', component.text)
+    if find_mentions(diseases, component.text.lower()):
         if verbose:
-            print("Compared entity is a disease")
+            logger.debug('Compared entity is a disease')
         return True
     # Check compared_entities of type disease/disease-sample
     if is_disease_sample(component):
         if verbose:
-            print("Compared entity is of type disease sample")
+            logger.debug('Compared entity is of type disease sample')
         return True
-    if general_annotations['diseases'] and [g for g in general_annotations['diseases'].keys() if g in component.text]:
+    if general_annotations['diseases'] and find_mentions(general_annotations['diseases'], component.text):
         if verbose:
-            print('Compared entity contains a disease in general_annotations')
+            logger.debug('Compared entity contains a disease in general_annotations')
         return True
-    raise InvalidArgument
+    return False
 
 
-def extract_gene(sentence, component, genes, micro_rnas, general_annotations, verbose=False):
+def check_entity(component, diseases, general_annotations, verbose=False):
+    """
+    Check if Compared Entity 1/Compared Entity 2 is of type disease/disease-sample or contains disease mentions, see
+    entity_meets_constraints.
+
+    :return: True if CE1/CE2 meet the type constraint otherwise raise an Exception
+    """
+    if not entity_meets_constraints(component, diseases, general_annotations, verbose):
+        raise InvalidArgument
+    return True
+
+
+def find_gene_mentions(sentence, component, genes, micro_rnas, general_annotations, verbose=False):
     """
     Extract gene/miRNA mention in the sentence by matching against precomputed PubTator mentions or
     microRNa detected in previous module.
@@ -172,11 +211,12 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
     :param genes: (dict) dictionary of gene mentions detected using PubTator.
     :param micro_rnas: (list(String)) list of microRNA mentions detected using regex.
     :param general_annotations: (dict) dictionary of overall annotations.
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
     :return: String corresponding to the gene/miRNA mentioned in the sentence and 'gene' or 'micro-RNA' type
-    otherwise raise an Exception.
+    otherwise None.
     """
+    verbose = verbose or logger.isEnabledFor(logging.DEBUG)
     # Normalize compared_aspect special characters such as '-' to avoid mismatch
     compared_aspect = component.text.encode().replace(b"\xe2\x80\x91", b"-").decode()
     # Check if previous word is a gene/miRNA mention, if CA is of expression_type
@@ -188,11 +228,11 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
     else:
         prev_token = ''
     if verbose:
-        print(f'prev_token: {prev_token}')
+        logger.debug('prev_token: %s', prev_token)
     # Check if there are gene mentions or microRNA mentions available
     if genes or micro_rnas:
         # Gene mentions in compared aspect
-        tmp = [g for g in genes.keys() if g in compared_aspect]
+        tmp = find_mentions(genes, compared_aspect)
         if tmp:
             # Discard gene mentions that are substring of other mentions
             gene = [t for t in tmp if not any(t in b for b in tmp if b != t)]
@@ -201,17 +241,17 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                 # Check if it is a miRNA
                 if genes[g] == 'micro-RNA':
                     if verbose:
-                        print('MicroRNA extracted from gene mentions')
+                        logger.debug('MicroRNA extracted from gene mentions')
                     results.append([g, 'micro-RNA'])
                 else:
                     if verbose:
-                        print('Gene extracted from gene mentions')
+                        logger.debug('Gene extracted from gene mentions')
                     results.append([g, 'gene'])
             return results
         # Check if previous token is a gene/miRNA mention
         elif prev_token in genes.keys():
             if verbose:
-                print('Previous token is a gene')
+                logger.debug('Previous token is a gene')
             if genes[prev_token] == 'micro-RNA':
                 return [[prev_token, 'micro-RNA']]
             else:
@@ -221,7 +261,7 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
             mi_rna = [m for m in micro_rnas if m in compared_aspect]
             if mi_rna:
                 if verbose:
-                    print('MicroRNA extracted from mentions')
+                    logger.debug('MicroRNA extracted from mentions')
                 results = []
                 for m in mi_rna:
                     results.append([m, 'micro-RNA'])
@@ -229,13 +269,13 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
             # Check if previous token is a gene/miRNA mention
             elif prev_token in micro_rnas:
                 if verbose:
-                    print('Previous token is a miRNA:', prev_token)
+                    logger.debug('Previous token is a miRNA: %s', prev_token)
                 return [[prev_token, 'micro-RNA']]
     # if gene is not yet found, look for general_annotations
     if general_annotations['genes']:
-        tmp = [m for m in general_annotations['genes'].keys() if m in compared_aspect]
+        tmp = find_mentions(general_annotations['genes'], compared_aspect)
         if verbose:
-            print('Searching general_annotations')
+            logger.debug('Searching general_annotations')
         if tmp:
             # Check it is not a mismatch, i.e. we match some characters inside a token
             if isinstance(component, spacy.tokens.token.Token):
@@ -251,7 +291,7 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                     mentions.append(match)
             if mentions:
                 if verbose:
-                    print('Found gene mentions in general_annotations')
+                    logger.debug('Found gene mentions in general_annotations')
                 results = []
                 for m in mentions:
                     if not results and m != 'to':
@@ -261,12 +301,12 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                             results.append([m, 'gene'])
                 if results:
                     if verbose:
-                        print('Returning gene mentions in general_annotations')
+                        logger.debug('Returning gene mentions in general_annotations')
                     return results
         # Check if previous token is a gene/miRNA mention
         if prev_token in general_annotations['genes'].keys():
             if verbose:
-                print('Previous token is in general_annotations')
+                logger.debug('Previous token is in general_annotations')
             if general_annotations['genes'][prev_token] == 'micro-RNA':
                 return [[prev_token, 'micro-RNA']]
             else:
@@ -274,7 +314,7 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
     # look for 'CD[0-9]+' genes
     if re.search("CD[0-9]+", compared_aspect):
         if verbose:
-            print('gene found by regex CD[0-9]+')
+            logger.debug('gene found by regex CD[0-9]+')
         return [[re.search("CD[0-9]+", compared_aspect).group(), 'gene']]
 
     if isinstance(component, spacy.tokens.token.Token):
@@ -283,9 +323,9 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
         tokens = [t for t in component]
     # lower-case normalization
     if verbose:
-        print('Trying lower-case normalization')
+        logger.debug('Trying lower-case normalization')
     if genes:
-        tmp = [g for g in genes.keys() if g.lower() in compared_aspect.lower()]
+        tmp = find_mentions(genes, compared_aspect, lower=True)
         if tmp:
             # Discard gene mentions that are substring of other mentions
             gene = [t for t in tmp if not any(t in b for b in tmp if b != t)]
@@ -294,16 +334,16 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                 # Check if it is a miRNA
                 if genes[g] == 'micro-RNA':
                     if verbose:
-                        print('MicroRNA extracted from gene mentions')
+                        logger.debug('MicroRNA extracted from gene mentions')
                     results.append([g, 'micro-RNA'])
                 else:
                     if verbose:
-                        print('Gene extracted from gene mentions')
+                        logger.debug('Gene extracted from gene mentions')
                     results.append([g, 'gene'])
                 # Check it is not a mismatch, i.e. we match some characters inside a token
                 mentions = []
                 if verbose:
-                    print('Check results are not mismatches')
+                    logger.debug('Check results are not mismatches')
                 for match in results:
                     toks = match[0].split()
                     # matches that are subtokens
@@ -316,13 +356,13 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                         if not results and m != 'to':
                             results.append(m)
                     if verbose:
-                        print('Returning gene mentions in annotations')
+                        logger.debug('Returning gene mentions in annotations')
                     return results
     # if gene is not yet found, look for general_annotations
     if general_annotations['genes']:
-        tmp = [m for m in general_annotations['genes'].keys() if m.lower() in compared_aspect.lower()]
+        tmp = find_mentions(general_annotations['genes'], compared_aspect, lower=True)
         if verbose:
-            print('Searching lower-case general_annotations')
+            logger.debug('Searching lower-case general_annotations')
         if tmp:
             # Check it is not a mismatch, i.e. we match some characters inside a token
             mentions = []
@@ -334,7 +374,7 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                     mentions.append(match)
             if mentions:
                 if verbose:
-                    print('Found gene mentions in general_annotations')
+                    logger.debug('Found gene mentions in general_annotations')
                 results = []
                 for m in mentions:
                     if not results and m != 'to':
@@ -345,7 +385,7 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                 return results
     if genes:
         if verbose:
-            print('Try special characters normalization')
+            logger.debug('Try special characters normalization')
         # Substitute special characters such as beta/alpha
         new_ca = ''
         if b"\xce\xb2" in component.text.encode():
@@ -357,7 +397,7 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                 new_ca = component.text.encode().replace(b"\xce\xb1", b"alpha").decode()
         if new_ca:
             if genes:
-                tmp = [g for g in genes.keys() if g in new_ca]
+                tmp = find_mentions(genes, new_ca)
                 if tmp:
                     # Discard gene mentions that are substring of other mentions
                     gene = [t for t in tmp if not any(t in b for b in tmp if b != t)]
@@ -366,17 +406,17 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                         # Check if it is a miRNA
                         if genes[g] == 'micro-RNA':
                             if verbose:
-                                print('MicroRNA extracted from gene mentions')
+                                logger.debug('MicroRNA extracted from gene mentions')
                             results.append([g, 'micro-RNA'])
                         else:
                             if verbose:
-                                print('Gene extracted from gene mentions')
+                                logger.debug('Gene extracted from gene mentions')
                             results.append([g, 'gene'])
                     return results
             if general_annotations['genes']:
-                tmp = [m for m in general_annotations['genes'].keys() if m in new_ca]
+                tmp = find_mentions(general_annotations['genes'], new_ca)
                 if verbose:
-                    print('Searching general_annotations')
+                    logger.debug('Searching general_annotations')
                 if tmp:
                     # Discard gene mentions that are substring of other mentions
                     gene = [t for t in tmp if not any(t in b for b in tmp if b != t)]
@@ -385,76 +425,139 @@ def extract_gene(sentence, component, genes, micro_rnas, general_annotations, ve
                         # Check if it is a miRNA
                         if general_annotations['genes'][g] == 'micro-RNA':
                             if verbose:
-                                print('MicroRNA extracted from general_annotations')
+                                logger.debug('MicroRNA extracted from general_annotations')
                             results.append([g, 'micro-RNA'])
                         else:
                             if verbose:
-                                print('MicroRNA extracted from general_annotations')
+                                logger.debug('MicroRNA extracted from general_annotations')
                             results.append([g, 'gene'])
                     return results
-    raise GeneNotFound
+    return None
 
 
-def normalize_expression_level(sentence, components, verbose=False):
+def extract_gene(sentence, component, genes, micro_rnas, general_annotations, verbose=False):
+    """
+    Extract gene/miRNA mention in the sentence, see find_gene_mentions.
+
+    :return: String corresponding to the gene/miRNA mentioned in the sentence and 'gene' or 'micro-RNA' type
+    otherwise raise an Exception.
+    """
+    gene_mentions = find_gene_mentions(sentence, component, genes, micro_rnas, general_annotations, verbose)
+    if gene_mentions is None:
+        raise GeneNotFound
+    return gene_mentions
+
+
+def find_expression_level(sentence, components, verbose=False):
     """
     Normalize scale indicator/level indicator to high or low by matching them against a list of triggers.
 
     :param sentence: (spacy.tokens.doc.Doc) input sentence.
     :param components: (dict) dictionary of arguments found by the RE module.
-    :param verbose: (Boolean) if True display diagnostic prints.
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
-    :return: scale indicator/level indicator normalized to 'UP'/'DOWN' otherwise raise an Exception.
+    :return: scale indicator/level indicator normalized to 'UP'/'DOWN' otherwise None.
     """
+    verbose = verbose or logger.isEnabledFor(logging.DEBUG)
     if verbose:
-        print(components['scale_indicator'].text.lower())
-    try:
-        return expression_level_norm[components['scale_indicator'].text.lower()]
-    except KeyError:
-        # Check if there is an adverb that depends on SI (i.e., highly...)
-        advs = [t for t in sentence if t.dep_ == 'advmod' and t.head == components['scale_indicator']]
-        if advs:
-            if verbose:
-                print('Checking adverbs that depend on SI')
-            for adv in advs:
-                try:
-                    return advmod_norm[adv.text.lower()]
-                except KeyError:
-                    continue
-        # if any expression level is connected to the SI (one-hop or two-hops)
-        if [t for t in sentence if (t.head == components['scale_indicator'] or t.head.head == components['scale_indicator']) and t.text in expression_level_norm.keys()]:
-            levels = [t for t in sentence if (t.head == components['scale_indicator'] or t.head.head == components['scale_indicator']) and t.text in expression_level_norm.keys()]
-            if verbose:
-                print('Checking any expression level is connected to the SI (one-hop or two-hops)')
-            for expr_level in levels:
-                try:
-                    return expression_level_norm[expr_level.text.lower()]
-                except KeyError:
-                    continue
-        # Check if next token is an expression level trigger
-        if sentence[components['scale_indicator'].i+1].text.lower() in expression_level_norm.keys():
-            if verbose:
-                print('next token is in expression level keys')
-            return expression_level_norm[sentence[components['scale_indicator'].i+1].text.lower()]
-        # Check if token may not match due to special characters (i.e., '/')
-        if '/' in sentence[components['scale_indicator'].i+1].text:
-            trig = sentence[components['scale_indicator'].i + 1].text.split('/')[0].lower()
-            if trig in expression_level_norm.keys():
-                if verbose:
-                    print('Expression Level needed splitting')
-                return expression_level_norm[trig]
-        # if SI is 'expressed' without additional information normalize to 'UP'
-        if components['scale_indicator'].text == 'expressed':
-            return 'UP'
-        # if there is an expr_level trigger whose head is a component
-        if [t for t in sentence if t.text.lower() in expression_level_norm.keys() and any(t.head.text in components[c].text for c in components.keys())]:
+        logger.debug('Scale indicator: %s', components['scale_indicator'].text.lower())
+    level = expression_level_norm.get(components['scale_indicator'].text.lower())
+    if level is not None:
+        return level
+    # Check if there is an adverb that depends on SI (i.e., highly...)
+    advs = [t for t in sentence if t.dep_ == 'advmod' and t.head == components['scale_indicator']]
+    if advs:
+        if verbose:
+            logger.debug('Checking adverbs that depend on SI')
+        for adv in advs:
+            level = advmod_norm.get(adv.text.lower())
+            if level is not None:
+                return level
+    # if any expression level is connected to the SI (one-hop or two-hops)
+    if [t for t in sentence if (t.head == components['scale_indicator'] or t.head.head == components['scale_indicator']) and t.text in expression_level_norm.keys()]:
+        levels = [t for t in sentence if (t.head == components['scale_indicator'] or t.head.head == components['scale_indicator']) and t.text in expression_level_norm.keys()]
+        if verbose:
+            logger.debug('Checking any expression level is connected to the SI (one-hop or two-hops)')
+        for expr_level in levels:
+            level = expression_level_norm.get(expr_level.text.lower())
+            if level is not None:
+                return level
+    # Check if next token is an expression level trigger
+    if sentence[components['scale_indicator'].i+1].text.lower() in expression_level_norm.keys():
+        if verbose:
+            logger.debug('next token is in expression level keys')
+        return expression_level_norm[sentence[components['scale_indicator'].i+1].text.lower()]
+    # Check if token may not match due to special characters (i.e., '/')
+    if '/' in sentence[components['scale_indicator'].i+1].text:
+        trig = sentence[components['scale_indicator'].i + 1].text.split('/')[0].lower()
+        if trig in expression_level_norm.keys():
             if verbose:
-                print('found a trigger connected to any component')
-            return expression_level_norm[[t.text.lower() for t in sentence if t.text.lower() in expression_level_norm.keys() and any(t.head.text in components[c].text for c in components.keys())][0]]
-        # no other action, raise Exception
+                logger.debug('Expression Level needed splitting')
+            return expression_level_norm[trig]
+    # if SI is 'expressed' without additional information normalize to 'UP'
+    if components['scale_indicator'].text == 'expressed':
+        return 'UP'
+    # if there is an expr_level trigger whose head is a component
+    if [t for t in sentence if t.text.lower() in expression_level_norm.keys() and any(t.head.text in components[c].text for c in components.keys())]:
+        if verbose:
+            logger.debug('found a trigger connected to any component')
+        return expression_level_norm[[t.text.lower() for t in sentence if t.text.lower() in expression_level_norm.keys() and any(t.head.text in components[c].text for c in components.keys())][0]]
+    # no other action
+    return None
+
+
+def normalize_expression_level(sentence, components, verbose=False):
+    """
+    Normalize scale indicator/level indicator to high or low, see find_expression_level.
+
+    :return: scale indicator/level indicator normalized to 'UP'/'DOWN' otherwise raise an Exception.
+    """
+    level = find_expression_level(sentence, components, verbose)
+    if level is None:
         raise MistypedExpressionLevel
+    return level
+
+
+def component_token_texts(component):
+    """
+    :param component: (spacy.tokens.span.Span) component extracted by the RE module, or a single token.
+    :return: (set) texts of the tokens of the component, stripped of commas and spaces. A mention matched in the
+    component is not a mismatch (i.e., it does not match characters inside a token) if all its words are in the set.
+    """
+    if isinstance(component, spacy.tokens.token.Token):
+        return {component.text.strip(', ')}
+    return {tok.text.strip(', ') for tok in component}
+
+
+def find_component_mentions(component, mentions, mention_index=None):
+    """
+    Find the mentions occurring in a component.
 
+    :param component: (spacy.tokens.span.Span) component extracted by the RE module, or a single token.
+    :param mentions: (dict) dictionary of mentions, e.g., disease mentions detected using PubTator.
+    :param mention_index: (mention_matching.PhraseMentionIndex) if given, mentions are matched on the tokens of the
+    sentence, otherwise they are matched as substrings of the component text.
 
-def extract_disease(components, sent_type, diseases, diseases_title, general_annotations, title, abstract, verbose=False):
+    :return: (list, set) mentions occurring in the component and texts of the tokens of the component, used to
+    discard the substring matches of characters inside a token (None if mentions are matched on tokens).
+    """
+    if mention_index is not None:
+        return mention_index.find(component, mentions), None
+    return find_mentions(mentions, component.text), component_token_texts(component)
+
+
+def sentence_disease_mentions(sentence, diseases, general_annotations):
+    """
+    :param sentence: (spacy.tokens.span.Span) sentence of the abstract.
+    :param diseases: (dict) dictionary of disease mentions detected using PubTator.
+    :param general_annotations: (dict) dictionary of overall annotations.
+    :return: (list, list) mentions of diseases and of general_annotations['diseases'] occurring in the sentence.
+    """
+    return find_mentions(diseases, sentence.text), find_mentions(general_annotations['diseases'], sentence.text)
+
+
+def find_disease(components, sent_type, diseases, diseases_title, general_annotations, title, abstract, verbose=False,
+                 mention_index=None):
     """
     Disease Extraction. First check Compared Entities, else infer from context.
 
@@ -464,157 +567,152 @@ def extract_disease(components, sent_type, diseases, diseases_title, general_ann
     :param diseases_title: (dict) dictionary of disease mentions detected in the title using PubTator.
     :param general_annotations: (dict) dictionary of overall annotations.
     :param title: (String) title text of the abstract.
-    :param abstract: (spacy.tokens.doc.Doc) abstract processed w/ spaCy models
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param abstract: (spacy.tokens.doc.Doc) abstract processed w/ spaCy models, or a callable returning it. The
+    callable is invoked only if the disease must be inferred from context.
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
+    :param mention_index: (mention_matching.PhraseMentionIndex) if given, disease mentions are matched on the tokens
+    of the Compared Entities instead of their text, see find_component_mentions.
 
-    :return: DOID of the disease, Disease Name, Mention, Disease Location otherwise raise an Exception.
+    :return: DOID of the disease, Disease Name, Mention, Disease Location otherwise None.
     """
+    verbose = verbose or logger.isEnabledFor(logging.DEBUG)
     mentions = []
     generic_mention = None
-    diseases_CE1 = [k for k in diseases.keys() if k in components['compared_entity_1'].text]
+    diseases_CE1, token_texts = find_component_mentions(components['compared_entity_1'], diseases, mention_index)
     # Checking disease mentions in CE1
     if diseases_CE1:
-        # Check it is not a mismatch, i.e. we match some characters inside a token
-        if isinstance(components['compared_entity_1'], spacy.tokens.token.Token):
-            tokens = [components['compared_entity_1']]
-        else:
-            tokens = [t for t in components['compared_entity_1']]
         for match in diseases_CE1:
             doid = diseases[match]
-            disease_name = doid_to_names[doid]
+            disease_name, _, generic = doid_table[doid]
             # Check it is not a generic disease
-            if disease_name.lower() not in generic_diseases:
-                toks = match.split()
+            if not generic:
                 # Checking match is not a subtoken
-                out_of_ca = [t for t in toks if not any(t == tok.text.strip(', ') for tok in tokens)]
-                if not out_of_ca:
+                if token_texts is None or all(t in token_texts for t in match.split()):
                     if verbose:
-                        print('Disease extracted from CE1')
+                        logger.debug('Disease extracted from CE1')
                     mentions.append([doid, disease_name, match, 'Sentence_ARG'])
             else:
                 if verbose:
-                    print('Storing a generic_disease')
+                    logger.debug('Storing a generic_disease')
                 generic_mention = [doid, disease_name, match, 'Sentence_ARG']
-    gen_diseases_CE1 = [k for k in general_annotations['diseases'].keys() if k in components['compared_entity_1'].text]
+    gen_diseases_CE1, token_texts = find_component_mentions(components['compared_entity_1'],
+                                                            general_annotations['diseases'], mention_index)
     if not mentions and gen_diseases_CE1:
-        # Check it is not a mismatch, i.e. we match some characters inside a token
-        if isinstance(components['compared_entity_1'], spacy.tokens.token.Token):
-            tokens = [components['compared_entity_1']]
-        else:
-            tokens = [t for t in components['compared_entity_1']]
         for match in gen_diseases_CE1:
             doid = general_annotations['diseases'][match]
-            disease_name = doid_to_names[doid]
+            disease_name, _, generic = doid_table[doid]
             # Check it is not a generic disease
-            if disease_name.lower() not in generic_diseases:
-                toks = match.split()
+            if not generic:
                 # Check match is not a subtoken
-                out_of_ca = [t for t in toks if not any(t == tok.text.strip(', ') for tok in tokens)]
-                if not out_of_ca:
+                if token_texts is None or all(t in token_texts for t in match.split()):
                     if verbose:
-                        print('Disease extracted from CE1 - general_annotations')
+                        logger.debug('Disease extracted from CE1 - general_annotations')
                     mentions.append([doid, disease_name, match, 'Sentence_ARG'])
             elif generic_mention is None:
                 if verbose:
-                    print('Storing a generic_disease')
+                    logger.debug('Storing a generic_disease')
                 generic_mention = [doid, disease_name, match, 'Sentence_ARG']
     if sent_type == 'TypeA':
         if verbose:
-            print(f' sent_type {sent_type} => checking for disease mentions in CE2')
-        diseases_CE2 = [k for k in diseases.keys() if k in components['compared_entity_2'].text]
+            logger.debug('sent_type %s => checking for disease mentions in CE2', sent_type)
+        diseases_CE2, token_texts = find_component_mentions(components['compared_entity_2'], diseases, mention_index)
         if not mentions and diseases_CE2:
-            # Check it is not a mismatch, i.e. we match some characters inside a token
-            if isinstance(components['compared_entity_2'], spacy.tokens.token.Token):
-                tokens = [components['compared_entity_2']]
-            else:
-                tokens = [t for t in components['compared_entity_2']]
             for match in diseases_CE2:
                 doid = diseases[match]
-                disease_name = doid_to_names[doid]
+                disease_name, _, generic = doid_table[doid]
                 # Check it is not a generic disease
-                if disease_name.lower() not in generic_diseases:
-                    toks = match.split()
+                if not generic:
                     # Check match is not a subetoken
-                    out_of_ca = [t for t in toks if not any(t == tok.text.strip(', ') for tok in tokens)]
-                    if not out_of_ca:
+                    if token_texts is None or all(t in token_texts for t in match.split()):
                         if verbose:
-                            print('Disease extracted from CE2')
+                            logger.debug('Disease extracted from CE2')
                         mentions.append([doid, disease_name, match, 'Sentence_ARG'])
                 elif generic_mention is None:
                     if verbose:
-                        print('Storing a generic_disease')
+                        logger.debug('Storing a generic_disease')
                     generic_mention = [doid, disease_name, match, 'Sentence_ARG']
-        gen_diseases_CE2 = [k for k in general_annotations['diseases'].keys() if k in components['compared_entity_2'].text]
+        gen_diseases_CE2, token_texts = find_component_mentions(components['compared_entity_2'],
+                                                                general_annotations['diseases'], mention_index)
         if not mentions and gen_diseases_CE2:
-            # Check it is not a mismatch, i.e. we match some characters inside a token
-            if isinstance(components['compared_entity_2'], spacy.tokens.token.Token):
-                tokens = [components['compared_entity_2']]
-            else:
-                tokens = [t for t in components['compared_entity_2']]
             for match in gen_diseases_CE2:
                 doid = general_annotations['diseases'][match]
-                disease_name = doid_to_names[doid]
+                disease_name, _, generic = doid_table[doid]
                 # Check it is not a generic disease
-                if disease_name.lower() not in generic_diseases:
-                    toks = match.split()
+                if not generic:
                     # Check match is not a subtoken
-                    out_of_ca = [t for t in toks if not any(t == tok.text.strip(', ') for tok in tokens)]
-                    if not out_of_ca:
+                    if token_texts is None or all(t in token_texts for t in match.split()):
                         if verbose:
-                            print('Disease extracted from CE2 - general_annotations')
+                            logger.debug('Disease extracted from CE2 - general_annotations')
                         mentions.append([doid, disease_name, match, 'Sentence_ARG'])
                 elif generic_mention is None:
                     if verbose:
-                        print('Storing a generic_disease')
+                        logger.debug('Storing a generic_disease')
                     generic_mention = [doid, disease_name, match, 'Sentence_ARG']
     if mentions:
         return mentions[0]
     if verbose:
-        print("Disease must be inferred from context")
-        print('Checking Abstract title')
+        logger.debug('Disease must be inferred from context')
+        logger.debug('Checking Abstract title')
     # Infer from title
     if len(diseases_title.keys()) > 0:
         for d in diseases_title.keys():
             doid = diseases_title[d]
-            disease_name = doid_to_names[doid]
-            if disease_name.lower() not in generic_diseases:
+            disease_name, _, generic = doid_table[doid]
+            if not generic:
                 if verbose:
-                    print('Disease extracted from title')
+                    logger.debug('Disease extracted from title')
                 return doid, disease_name, d, 'Title'
             elif generic_mention is None:
                 if verbose:
-                    print('Storing a generic_disease')
+                    logger.debug('Storing a generic_disease')
                 generic_mention = [doid, disease_name, d, 'Title']
     if title is not None:
-        gen_diseases_title = [d for d in general_annotations['diseases'].keys() if d in title]
+        gen_diseases_title = find_mentions(general_annotations['diseases'], title)
         # Check for disease mentions in the title from general_annotations
         if gen_diseases_title:
             for d in gen_diseases_title:
                 doid = general_annotations['diseases'][d]
-                disease_name = doid_to_names[doid]
-                if disease_name.lower() not in generic_diseases:
+                disease_name, _, generic = doid_table[doid]
+                if not generic:
                     if verbose:
-                        print('Disease extracted from title - general_annotations')
+                        logger.debug('Disease extracted from title - general_annotations')
                     return doid, disease_name, d, 'Title'
                 elif generic_mention is None:
                     if verbose:
-                        print('Storing a generic_disease')
+                        logger.debug('Storing a generic_disease')
                     generic_mention = [doid, disease_name, d, 'Title']
     if abstract is not None:
         # Infer from context
         if verbose:
-            print("Disease inferred from context")
-        return infer_disease_from_context(abstract, diseases, general_annotations, generic_mention, verbose)
+            logger.debug('Disease inferred from context')
+        if callable(abstract):
+            # Parse the abstract only now that it is needed
+            abstract = abstract()
+        return find_disease_in_context(abstract, diseases, general_annotations, generic_mention, verbose)
     else:
         if generic_mention is not None:
             if verbose:
-                print('Returning a generic disease')
+                logger.debug('Returning a generic disease')
             return generic_mention
         else:
-            raise DiseaseNotFound
+            return None
 
 
-def infer_disease_from_context(doc, diseases, general_annotations, generic_mention, verbose):
+def extract_disease(components, sent_type, diseases, diseases_title, general_annotations, title, abstract, verbose=False,
+                    mention_index=None):
+    """
+    Disease Extraction, see find_disease.
+
+    :return: DOID of the disease, Disease Name, Mention, Disease Location otherwise raise an Exception.
+    """
+    disease = find_disease(components, sent_type, diseases, diseases_title, general_annotations, title, abstract,
+                           verbose, mention_index)
+    if disease is None:
+        raise DiseaseNotFound
+    return disease
+
+
+def find_disease_in_context(doc, diseases, general_annotations, generic_mention, verbose):
     """
     Infer the disease mentioned by checking for investigation or analyzed sentences.
 
@@ -623,114 +721,130 @@ def infer_disease_from_context(doc, diseases, general_annotations, generic_menti
     :param general_annotations: (dict) dictionary of overall annotations.
     :param generic_mention: (list) list of DOID of the disease, Disease Name, Mention, Disease Location
     of a generic disease extracted before.
-    :param verbose: (Boolean) if True display diagnostic prints.
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
-    :return: DOID of the disease, Disease Name, Mention, Disease Location otherwise raise an Exception.
+    :return: DOID of the disease, Disease Name, Mention, Disease Location otherwise None.
     """
+    verbose = verbose or logger.isEnabledFor(logging.DEBUG)
     count = 0
     for sentence in doc.sents:
         count += 1
+        # Disease mentions in the sentence, searched at most once and only if needed
+        sentence_mentions = None
         # Check disease mentions in the first sentence
         if count == 1:
-            disease = [d for d in diseases.keys() if d in sentence.text]
-            gen_disease = [d for d in general_annotations['diseases'].keys() if d in sentence.text]
+            disease = find_mentions(diseases, sentence.text)
+            gen_disease = find_mentions(general_annotations['diseases'], sentence.text)
             if disease:
                 for d in disease:
                     doid = diseases[d]
-                    disease_name = doid_to_names[doid]
-                    if disease_name.lower() not in generic_diseases:
+                    disease_name, _, generic = doid_table[doid]
+                    if not generic:
                         if verbose:
-                            print('Disease extracted from the First Sentence')
+                            logger.debug('Disease extracted from the First Sentence')
                         return doid, disease_name, d, 'First_Sentence'
                     elif generic_mention is None:
                         if verbose:
-                            print('Storing a generic_disease')
+                            logger.debug('Storing a generic_disease')
                         generic_mention = [doid, disease_name, d, 'First_Sentence']
             if gen_disease:
                 for d in gen_disease:
                     doid = general_annotations['diseases'][d]
-                    disease_name = doid_to_names[doid]
-                    if disease_name.lower() not in generic_diseases:
+                    disease_name, _, generic = doid_table[doid]
+                    if not generic:
                         if verbose:
-                            print('Disease extracted from the First Sentence - general_annotations')
+                            logger.debug('Disease extracted from the First Sentence - general_annotations')
                         return doid, disease_name, d, 'First_Sentence'
                     elif generic_mention is None:
                         if verbose:
-                            print('Storing a generic_disease')
+                            logger.debug('Storing a generic_disease')
                         generic_mention = [doid, disease_name, d, 'First_Sentence']
         else:
             # Check for investigation triggers
             if [t for t in sentence if t.text in investigation_trigs]:
                 # Check if subjects of the triggers is in the list
                 if [t for t in sentence if t.dep_ == 'nsubj' and t.text.lower() in ['we', 'authors', 'purpose', 'aim', 'objective', 'results']]:
-                    disease = [k for k in diseases.keys() if k in sentence.text]
-                    gen_disease = [k for k in general_annotations['diseases'].keys() if k in sentence.text]
+                    sentence_mentions = sentence_disease_mentions(sentence, diseases, general_annotations)
+                    disease, gen_disease = sentence_mentions
                     # Check disease mention in the sentence
                     if disease:
                         for d in disease:
                             doid = diseases[d]
-                            disease_name = doid_to_names[doid]
+                            disease_name, _, generic = doid_table[doid]
                             # Check it is not a generic disease
-                            if disease_name.lower() not in generic_diseases:
+                            if not generic:
                                 if verbose:
-                                    print('Disease inferred from context')
+                                    logger.debug('Disease inferred from context')
                                 return doid, disease_name, d, 'Sentence'
                             elif generic_mention is None:
                                 if verbose:
-                                    print('Storing a generic_disease')
+                                    logger.debug('Storing a generic_disease')
                                 generic_mention = [doid, disease_name, d, 'Sentence']
                     # Check disease mention in the sentence in general_annotations
                     elif gen_disease:
                         for d in gen_disease:
                             doid = general_annotations['diseases'][d]
-                            disease_name = doid_to_names[doid]
+                            disease_name, _, generic = doid_table[doid]
                             # Check it is not a generic disease
-                            if disease_name.lower() not in generic_diseases:
+                            if not generic:
                                 if verbose:
-                                    print('Disease inferred from context')
+                                    logger.debug('Disease inferred from context')
                                 return doid, disease_name, d, 'Sentence'
                             elif generic_mention is None:
                                 if verbose:
-                                    print('Storing a generic_disease')
+                                    logger.debug('Storing a generic_disease')
                                 generic_mention = [doid, disease_name, d, 'Sentence']
             # Check for analyzed triggers
             if [t for t in sentence if t.text in analyzed_trigs]:
-                disease = [k for k in diseases.keys() if k in sentence.text]
-                gen_disease = [k for k in general_annotations['diseases'].keys() if k in sentence.text]
+                if sentence_mentions is None:
+                    sentence_mentions = sentence_disease_mentions(sentence, diseases, general_annotations)
+                disease, gen_disease = sentence_mentions
                 # Check disease mention in the sentence
                 if disease:
                     for d in disease:
                         doid = diseases[d]
-                        disease_name = doid_to_names[doid]
+                        disease_name, _, generic = doid_table[doid]
                         # Check it is not a generic disease
-                        if disease_name.lower() not in generic_diseases:
+                        if not generic:
                             if verbose:
-                                print('Disease inferred from context')
+                                logger.debug('Disease inferred from context')
                             return doid, disease_name, d, 'Sentence'
                         elif generic_mention is None:
                             if verbose:
-                                print('Storing a generic_disease')
+                                logger.debug('Storing a generic_disease')
                             generic_mention = [doid, disease_name, d, 'Sentence']
                 # Check disease mention in the sentence in general_annotations
                 elif gen_disease:
                     for d in gen_disease:
                         doid = general_annotations['diseases'][d]
-                        disease_name = doid_to_names[doid]
+                        disease_name, _, generic = doid_table[doid]
                         # Check it is not a generic disease
-                        if disease_name.lower() not in generic_diseases:
+                        if not generic:
                             if verbose:
-                                print('Disease inferred from context')
+                                logger.debug('Disease inferred from context')
                             return general_annotations['diseases'][d], disease_name, d, 'Sentence'
                         elif generic_mention is None:
                             if verbose:
-                                print('Storing a generic_disease')
+                                logger.debug('Storing a generic_disease')
                             generic_mention = [doid, disease_name, d, 'Sentence']
     if generic_mention is not None:
         if verbose:
-            print('Returning a generic disease')
+            logger.debug('Returning a generic disease')
         return generic_mention
     else:
+        return None
+
+
+def infer_disease_from_context(doc, diseases, general_annotations, generic_mention, verbose):
+    """
+    Infer the disease mentioned by checking for investigation or analyzed sentences, see find_disease_in_context.
+
+    :return: DOID of the disease, Disease Name, Mention, Disease Location otherwise raise an Exception.
+    """
+    disease = find_disease_in_context(doc, diseases, general_annotations, generic_mention, verbose)
+    if disease is None:
         raise DiseaseNotFound
+    return disease
 
 
 def get_comparison(components, sent_type):
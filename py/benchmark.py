@@ -0,0 +1,277 @@
+# Benchmarks and differential checks of the DEXTER components
+import argparse
+import logging
+import os
+import sys
+import time
+from itertools import islice
+import spacy
+
+from expand_entities import expand_entity_mentions
+from input_handling import preprocess_sentence, read_input_sentences
+from entity_detection import retokenize_miRNA
+from relation_extraction import iter_rules, matcher_backends, extract_relations, status_ok
+from argument_filtering_extraction import find_component_mentions
+from mention_matching import PhraseMentionIndex
+from dexter_pipeline import DexterPipeline, log_format
+
+
+def load_docs(input_file, model='en_core_sci_sm', limit=None, batch_size=1000):
+    """
+    Parse the sentences of an input csv file as the pipeline does.
+
+    :param input_file: (String) path to the input csv file (PMID, Sentence).
+    :param model: (String) name of the spaCy model.
+    :param limit: (int) maximum number of sentences to parse, all if None.
+    :param batch_size: (int) number of sentences buffered by spaCy for each parsing batch.
+    :return: spacy.language, list(spacy.tokens.doc.Doc) nlp object and parsed sentences.
+    """
+    nlp = spacy.load(model)
+    nlp.add_pipe("expand_entity_mentions", name="Entity Expansion", after="ner")
+    sentences = (preprocess_sentence(sentence) for _, sentence in islice(read_input_sentences(input_file), limit))
+    docs = []
+    for doc in nlp.pipe(sentences, batch_size=batch_size):
+        retokenize_miRNA(doc)
+        docs.append(doc)
+    return nlp, docs
+
+
+def bench_matcher(args):
+    """
+    Check that the compiled matcher returns the same matches as spaCy DependencyMatcher for every rule and
+    sentence, and compare their matching time.
+
+    :param args: (argparse.Namespace) command line arguments.
+    :return: (int) exit status, 1 if any match differs.
+    """
+    nlp, docs = load_docs(args.input_file, args.model, args.limit)
+    print(f'{len(docs)} sentences parsed')
+    rules = list(iter_rules())
+    matchers = {}
+    for backend, matcher_class in matcher_backends.items():
+        matchers[backend] = []
+        for rule_name, pattern in rules:
+            matcher = matcher_class(nlp.vocab)
+            matcher.add(rule_name, [pattern])
+            matchers[backend].append(matcher)
+    timings = {backend: 0.0 for backend in matchers}
+    tot_matches = 0
+    mismatches = 0
+    for doc in docs:
+        results = {}
+        for backend, backend_matchers in matchers.items():
+            start_time = time.perf_counter()
+            results[backend] = [[(match_id, list(token_ids)) for match_id, token_ids in matcher(doc)]
+                                for matcher in backend_matchers]
+            timings[backend] += time.perf_counter() - start_time
+        tot_matches += sum(len(matches) for matches in results['spacy'])
+        for (rule_name, _), expected, found in zip(rules, results['spacy'], results['compiled']):
+            if expected != found:
+                mismatches += 1
+                if mismatches <= args.max_report:
+                    print(f'Mismatch for rule {rule_name} on sentence: {doc.text}')
+                    print('  spacy:   ', expected)
+                    print('  compiled:', found)
+    print(f'{len(rules)} rules, {tot_matches} matches, {mismatches} mismatches')
+    for backend, seconds in timings.items():
+        print(f'{backend}: {seconds:.3f} seconds ({1000 * seconds / max(len(docs), 1):.3f} ms per sentence)')
+    if timings['compiled'] > 0:
+        print(f"speedup: {timings['spacy'] / timings['compiled']:.2f}x")
+    return 1 if mismatches else 0
+
+
+def bench_adaptive(args):
+    """
+    Compare the exhaustive and the adaptive rule evaluation on the sentences of an input file: time spent to extract
+    the rows from the parsed sentences and difference of the extracted rows. The adaptive pass orders the rules by
+    their yield in the rule history and in the exhaustive pass. The annotations of the PubMed IDs are retrieved from
+    PubTator.
+
+    :param args: (argparse.Namespace) command line arguments.
+    :return: (int) exit status.
+    """
+    pipeline = DexterPipeline(model=args.model, single_pass=args.single_pass, matcher_backend=args.matcher,
+                              max_accepted=args.max_accepted, rule_history=args.rule_history)
+    sentences = [(str(pmid), sentence) for pmid, sentence in islice(read_input_sentences(args.input_file), args.limit)]
+    pipeline.load_annotations(list(dict.fromkeys(pmid for pmid, _ in sentences)))
+    docs = list(pipeline.parse_sentences((pipeline.preprocess(sentence), pmid) for pmid, sentence in sentences))
+    print(f'{len(docs)} sentences parsed')
+    rows = {}
+    timings = {}
+    for mode in ['exhaustive', 'adaptive']:
+        pipeline.adaptive = mode == 'adaptive'
+        # The statistics of the exhaustive pass are kept as history, so that the adaptive pass orders the rules by
+        # their yield on the same sentences
+        pipeline.stats.rules.fold_into_history()
+        pipeline.stats.reset()
+        pipeline.parse_abstract.cache_clear()
+        # Each mode processes its own copy of the sentences, as they are retokenized by the pipeline
+        copies = [(doc.copy(), pmid) for doc, pmid in docs]
+        rows[mode] = set()
+        start_time = time.perf_counter()
+        for doc, pmid in copies:
+            rows[mode].update(tuple(row) for row in pipeline.process_doc(doc, pmid))
+        timings[mode] = time.perf_counter() - start_time
+        applied = sum(stats['selected'] for stats in pipeline.stats.rules.rules.values())
+        print(f'{mode}: {timings[mode]:.3f} seconds ({len(docs) / max(timings[mode], 1e-9):.1f} sentences/s), '
+              f'{len(rows[mode])} rows, {applied} rules applied')
+    if timings['adaptive'] > 0:
+        print(f"speedup: {timings['exhaustive'] / timings['adaptive']:.2f}x")
+    print(f"rows in both: {len(rows['exhaustive'] & rows['adaptive'])}, "
+          f"only exhaustive: {len(rows['exhaustive'] - rows['adaptive'])}, "
+          f"only adaptive: {len(rows['adaptive'] - rows['exhaustive'])}")
+    return 0
+
+
+def bench_logging(args):
+    """
+    Compare the time spent to extract the rows from the parsed sentences with the diagnostic messages disabled
+    (WARNING level) and enabled (DEBUG level). Enabled messages are formatted and written to os.devnull, so that
+    the comparison does not depend on the speed of the terminal. The annotations of the PubMed IDs are retrieved
+    from PubTator.
+
+    :param args: (argparse.Namespace) command line arguments.
+    :return: (int) exit status.
+    """
+    pipeline = DexterPipeline(model=args.model, single_pass=args.single_pass, matcher_backend=args.matcher)
+    sentences = [(str(pmid), sentence) for pmid, sentence in islice(read_input_sentences(args.input_file), args.limit)]
+    pipeline.load_annotations(list(dict.fromkeys(pmid for pmid, _ in sentences)))
+    docs = list(pipeline.parse_sentences((pipeline.preprocess(sentence), pmid) for pmid, sentence in sentences))
+    print(f'{len(docs)} sentences parsed')
+    root = logging.getLogger()
+    previous_level = root.level
+    timings = {}
+    with open(os.devnull, 'w') as devnull:
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter(log_format))
+        root.addHandler(handler)
+        try:
+            for mode, level in [('quiet', logging.WARNING), ('verbose', logging.DEBUG)]:
+                root.setLevel(level)
+                pipeline.stats.reset()
+                pipeline.parse_abstract.cache_clear()
+                # Each mode processes its own copy of the sentences, as they are retokenized by the pipeline
+                copies = [(doc.copy(), pmid) for doc, pmid in docs]
+                start_time = time.perf_counter()
+                for doc, pmid in copies:
+                    pipeline.process_doc(doc, pmid)
+                timings[mode] = time.perf_counter() - start_time
+        finally:
+            root.removeHandler(handler)
+            root.setLevel(previous_level)
+    for mode, seconds in timings.items():
+        print(f'{mode}: {seconds:.3f} seconds ({len(docs) / max(seconds, 1e-9):.1f} sentences/s)')
+    if timings['quiet'] > 0:
+        print(f"verbose/quiet: {timings['verbose'] / timings['quiet']:.2f}x")
+    return 0
+
+
+def bench_mentions(args):
+    """
+    Compare the substring and the PhraseMatcher matching of the disease mentions in the Compared Entities extracted
+    from the sentences of an input file: mentions accepted by each path (after discarding the substring matches of
+    characters inside a token) and matching time. The annotations of the PubMed IDs are retrieved from PubTator.
+
+    :param args: (argparse.Namespace) command line arguments.
+    :return: (int) exit status.
+    """
+    pipeline = DexterPipeline(model=args.model)
+    sentences = [(str(pmid), sentence) for pmid, sentence in islice(read_input_sentences(args.input_file), args.limit)]
+    pipeline.load_annotations(list(dict.fromkeys(pmid for pmid, _ in sentences)))
+    docs = list(pipeline.parse_sentences((pipeline.preprocess(sentence), pmid) for pmid, sentence in sentences))
+    print(f'{len(docs)} sentences parsed')
+    # (component, mention set) pairs to match, from the components extracted by the RE module
+    queries = []
+    for doc, pmid in docs:
+        retokenize_miRNA(doc)
+        result = extract_relations(doc, pipeline.nlp)
+        if result.status != status_ok:
+            continue
+        diseases = pipeline.annotations.get(pmid, {}).get('diseases', {})
+        for components in result.components:
+            for key in ['compared_entity_1', 'compared_entity_2']:
+                if components.get(key) is not None:
+                    for mentions in [diseases, pipeline.general_annotations['diseases']]:
+                        queries.append((components[key], mentions))
+    print(f'{len(queries)} compared entities to match')
+    mention_index = PhraseMentionIndex(pipeline.nlp)
+    # Automata and PhraseMatchers are built once per mention set, before timing the matching
+    for component, mentions in queries:
+        find_component_mentions(component, mentions)
+        mention_index.get_matcher(mentions)
+    for doc, _ in docs:
+        doc._.mention_matches = None
+    results = {}
+    timings = {}
+    for path, index in [('substring', None), ('phrase', mention_index)]:
+        results[path] = []
+        start_time = time.perf_counter()
+        for component, mentions in queries:
+            found, token_texts = find_component_mentions(component, mentions, index)
+            results[path].append([m for m in found if token_texts is None or all(t in token_texts for t in m.split())])
+        timings[path] = time.perf_counter() - start_time
+    mismatches = 0
+    for (component, _), expected, found in zip(queries, results['substring'], results['phrase']):
+        if expected != found:
+            mismatches += 1
+            if mismatches <= args.max_report:
+                print(f'Mismatch for component "{component.text}" of sentence: {component.doc.text}')
+                print('  substring:', expected)
+                print('  phrase:   ', found)
+    print(f'{mismatches} mismatches')
+    for path, seconds in timings.items():
+        print(f'{path}: {seconds:.3f} seconds ({1000 * seconds / max(len(queries), 1):.3f} ms per compared entity)')
+    if timings['phrase'] > 0:
+        print(f"speedup: {timings['substring'] / timings['phrase']:.2f}x")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='DEXTER benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    matcher_parser = subparsers.add_parser('matcher', help='compare the compiled matcher with spaCy DependencyMatcher')
+    matcher_parser.add_argument('input_file', nargs='?', default='../data/input/DEXTER_DATA.csv',
+                                help='path to the input csv file (PMID, Sentence)')
+    matcher_parser.add_argument('--model', default='en_core_sci_sm', help='name of the spaCy model')
+    matcher_parser.add_argument('--limit', type=int, default=None, help='maximum number of sentences to parse')
+    matcher_parser.add_argument('--max-report', type=int, default=10, help='maximum number of mismatches to print')
+    matcher_parser.set_defaults(func=bench_matcher)
+    adaptive_parser = subparsers.add_parser('adaptive', help='compare the exhaustive and the adaptive rule evaluation')
+    adaptive_parser.add_argument('input_file', nargs='?', default='../data/input/DEXTER_DATA.csv',
+                                 help='path to the input csv file (PMID, Sentence)')
+    adaptive_parser.add_argument('--model', default='en_core_sci_sm', help='name of the spaCy model')
+    adaptive_parser.add_argument('--limit', type=int, default=None, help='maximum number of sentences to parse')
+    adaptive_parser.add_argument('--single-pass', action='store_true',
+                                 help='match all the applicable rules of a sentence in one matcher call')
+    adaptive_parser.add_argument('--matcher', choices=['spacy', 'compiled'], default='spacy',
+                                 help='matcher used by the rules')
+    adaptive_parser.add_argument('--max-accepted', type=int, default=1,
+                                 help='number of components meeting the type constraints after which a sentence is '
+                                      'not matched against the remaining rules')
+    adaptive_parser.add_argument('--rule-history', default=None,
+                                 help='path to the JSON file with the statistics of the rules in previous runs')
+    adaptive_parser.set_defaults(func=bench_adaptive)
+    logging_parser = subparsers.add_parser('logging', help='compare the pipeline with and without diagnostic messages')
+    logging_parser.add_argument('input_file', nargs='?', default='../data/input/DEXTER_DATA.csv',
+                                help='path to the input csv file (PMID, Sentence)')
+    logging_parser.add_argument('--model', default='en_core_sci_sm', help='name of the spaCy model')
+    logging_parser.add_argument('--limit', type=int, default=None, help='maximum number of sentences to parse')
+    logging_parser.add_argument('--single-pass', action='store_true',
+                                help='match all the applicable rules of a sentence in one matcher call')
+    logging_parser.add_argument('--matcher', choices=['spacy', 'compiled'], default='spacy',
+                                help='matcher used by the rules')
+    logging_parser.set_defaults(func=bench_logging)
+    mentions_parser = subparsers.add_parser('mentions',
+                                            help='compare the substring and the PhraseMatcher matching of the diseases')
+    mentions_parser.add_argument('input_file', nargs='?', default='../data/input/DEXTER_DATA.csv',
+                                 help='path to the input csv file (PMID, Sentence)')
+    mentions_parser.add_argument('--model', default='en_core_sci_sm', help='name of the spaCy model')
+    mentions_parser.add_argument('--limit', type=int, default=None, help='maximum number of sentences to parse')
+    mentions_parser.add_argument('--max-report', type=int, default=10, help='maximum number of mismatches to print')
+    mentions_parser.set_defaults(func=bench_mentions)
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
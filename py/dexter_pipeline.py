@@ -1,26 +1,25 @@
 # Testing Class
-import csv
+import argparse
+import logging
 import time
-import pandas as pd
-import sys
+from functools import lru_cache, partial
+from itertools import islice
 import spacy
 
 from expand_entities import expand_entity_mentions
-from input_handling import preprocess_sentence
-from exceptions import MatchNotFound, InvalidArgument, GeneNotFound, MistypedExpressionLevel, DiseaseNotFound
-from relation_extraction import relation_extraction
+from instrumentation import Instrumentation
+from mention_matching import MentionIndex, PhraseMentionIndex
+from input_handling import preprocess_sentence, read_input_pmids, read_input_sentences
+from output_handling import ResultWriter, load_checkpoint, save_checkpoint
+from relation_extraction import extract_relations, compile_rules, use_rules, status_ok
 from entity_detection import get_miRNA, get_annotations_list_pmids, retokenize_miRNA
-from argument_filtering_extraction import check_components, extract_gene, normalize_expression_level, extract_disease, \
-    get_comparison, check_entity
+from argument_filtering_extraction import components_meet_constraints, entity_meets_constraints, find_gene_mentions, \
+    find_expression_level, find_disease, get_comparison
 
-
-# Extracting input and output file from arguments
-if len(sys.argv) < 3:
-    print('Usage: path_to_input_file path_to_output_file')
-    raise Exception
-input_file = sys.argv[1]
-print(f'Reading from {sys.argv[1]}')
-output_file = sys.argv[2]
+logger = logging.getLogger(__name__)
+# Levels of --log-level and format of the logged messages
+log_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+log_format = '%(asctime)s %(name)s %(levelname)s %(message)s'
 
 # Trigger lists to filter-out sentences
 trigs = ["high", "low", "increase", "decrease", "express", "silence", "reduce", "elevate", "change", "regulate",
@@ -29,180 +28,529 @@ trigs = ["high", "low", "increase", "decrease", "express", "silence", "reduce",
          'find', 'note', 'detect', 'observe', 'discover', 'occurred', 'occur', 'appear', 'identify', 'show',
          'prove', 'know', 'report', 'suggest', 'document', 'demonstrate', 'tend', 'amplified/over-expressed',
          'coexpressed', 'coexpresse', 'downexpressed', 'downexpresse', 'lower-expressed', 'lower-expresse', 'validate']
-pmids = []
-check = {}
-print('Getting all the annotations')
-start_time = time.time()
-df = pd.read_csv(input_file, index_col=False)
-tot_docs = 0
-i = 1
-for index, row in df.iterrows():
-    try:
-        tmp = check[str(row['PMID'])]
-    except KeyError:
-        tot_docs += 1
-        pmids.append(str(row['PMID']))
-        check[str(row['PMID'])] = 1
-
-annotations, general_annotations = get_annotations_list_pmids(pmids)
-
-print("--- %s seconds ---" % (time.time() - start_time))
-# Measuring time execution without considering loading of the abstract
-start_time = time.time()
-print("--- Spacy pipeline initialization ---")
-# Initialize the pipeline
-nlp_biore = spacy.load("en_core_sci_sm")
-# Add entity expansion custom component
-nlp_biore.add_pipe("expand_entity_mentions", name="Entity Expansion", after="ner")
-
-print("--- Start parsing ---")
-
-# output csv file
-header = ['PMID', 'geneMen', 'geneID', 'DOID', 'DOID_Name', 'DiseaseMention', 'DiseaseDetectedFrom', 'ExpressionLevel', 'SentenceType',
-          'Sample1', 'Sample2', 'Sentence']
-rows = []
-
-for index, row in df.iterrows():
-    pmid = str(row['PMID'])
-    input_doc = preprocess_sentence(str(row['Sentence']))
-    doc = nlp_biore(input_doc)
-    print('sentence:', doc.text)
-    retokenize_miRNA(doc)
-    # filter out sentences that do not contain type-A or type-B triggers
-    if [t for t in doc if t.lemma_ in trigs]:
-
-        correct_matches = []
-        potential_failures = []
-        print("Relation Extraction Module for sentence:", doc.text)
-        print("PMID:", pmid)
+trigger_lemmas = set(trigs)
+
+
+def index_general_annotations(general_annotations):
+    """
+    :param general_annotations: (dict) dictionary of overall annotations, {'genes': {...}, 'diseases': {...}}.
+    :return: (dict) the same dictionary with the gene and disease mentions indexed by mention_matching.MentionIndex.
+    """
+    return {key: MentionIndex(mentions) for key, mentions in general_annotations.items()}
+
+
+def has_trigger(doc):
+    """
+    Check if the sentence contains a type-A or type-B trigger.
+
+    :param doc: (spacy.tokens.doc.Doc) sentence processed at least up to the lemmatizer.
+    :return: True or False.
+    """
+    return any(t.lemma_ in trigger_lemmas for t in doc)
+
+
+class DexterPipeline:
+    """
+    DEXTER pipeline. The spaCy model, the lexicons and the caches are loaded once, so that the same object can
+    process several sentences or files without paying the initialization again.
+    """
+
+    def __init__(self, model='en_core_sci_sm', batch_size=1000, n_process=1, prefilter=False, chunk_size=10000,
+                 abstract_cache_size=128, annotation_cache=None, pubtator_workers=3, pubtator_rate=3,
+                 single_pass=False, matcher_backend='spacy', rules_file=None, adaptive=False, max_accepted=1,
+                 rule_history=None, mention_matcher='substring', annotation_index_size=256):
+        """
+        :param model: (String) name of the spaCy model.
+        :param batch_size: (int) number of sentences buffered by spaCy for each parsing batch.
+        :param n_process: (int) number of processes used by spaCy to parse the sentences.
+        :param prefilter: (Boolean) if True run the parser, the NER and the entity expansion only on sentences
+        containing a trigger lemma.
+        :param chunk_size: (int) number of input rows read at once from the input csv file.
+        :param abstract_cache_size: (int) maximum number of parsed abstracts kept in memory.
+        :param annotation_cache: (String) path to a SQLite file caching the PubTator annotations across runs.
+        :param pubtator_workers: (int) maximum number of concurrent requests to PubTator.
+        :param pubtator_rate: (float) maximum number of requests per second sent to PubTator.
+        :param single_pass: (Boolean) if True match all the applicable rules of a sentence in one matcher call.
+        :param matcher_backend: (String) matcher used by the rules, 'spacy' (DependencyMatcher) or 'compiled'.
+        :param rules_file: (String) path to the JSON rule file of the relation extraction module. If None, the rule
+        file set by DEXTER_RULES_FILE or the one shipped with DEXTER is used.
+        :param adaptive: (Boolean) if True apply the rules of a sentence in order of historical yield, and stop once
+        max_accepted components meet the type constraints. If False all the applicable rules are applied.
+        :param max_accepted: (int) number of components meeting the type constraints after which the relation
+        extraction module stops applying rules, in adaptive mode.
+        :param rule_history: (String) path to the JSON file with the statistics of the rules in previous runs, loaded
+        at startup and updated at the end of each run.
+        :param mention_matcher: (String) how disease mentions are found in the Compared Entities, 'substring' (text of
+        the component) or 'phrase' (spaCy PhraseMatcher over the tokens of the sentence).
+        :param annotation_index_size: (int) maximum number of PubMed IDs whose indexed annotations are kept in memory.
+        """
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.prefilter = prefilter
+        self.chunk_size = chunk_size
+        self.annotation_cache = annotation_cache
+        self.pubtator_workers = pubtator_workers
+        self.pubtator_rate = pubtator_rate
+        self.single_pass = single_pass
+        self.matcher_backend = matcher_backend
+        self.adaptive = adaptive
+        self.max_accepted = max_accepted
+        self.rule_history = rule_history
+        logger.info('Spacy pipeline initialization')
+        # Initialize the pipeline
+        self.nlp = spacy.load(model)
+        # Add entity expansion custom component
+        self.nlp.add_pipe("expand_entity_mentions", name="Entity Expansion", after="ner")
+        # Components needed only by sentences that pass the trigger filter
+        self.late_pipes = [name for name in ['parser', 'ner', 'Entity Expansion'] if name in self.nlp.pipe_names]
+        # Components needed to compute lemmas (tokenizer, tagger, lemmatizer...)
+        self.early_pipes = [name for name in self.nlp.pipe_names if name not in self.late_pipes]
+        # Compile the dependency matchers of all the rules once
+        if rules_file is not None:
+            use_rules(rules_file)
+        compile_rules(self.nlp, matcher_backend)
+        # Token-level matching of the disease mentions, see argument_filtering_extraction.find_component_mentions
+        self.mention_index = PhraseMentionIndex(self.nlp) if mention_matcher == 'phrase' else None
+        # PubTator annotations of the PubMed IDs to process
+        self.annotations = {}
+        self.general_annotations = {'genes': {}, 'diseases': {}}
+        # Annotations indexed for mention matching: general annotations once per load_annotations, the annotations of
+        # a PubMed ID once for all its sentences
+        self.general_index = index_general_annotations(self.general_annotations)
+        self.annotation_index = lru_cache(maxsize=annotation_index_size)(self._index_annotation)
+        # Parsed abstracts are cached so that each abstract is parsed only once
+        self.parse_abstract = lru_cache(maxsize=abstract_cache_size)(self._parse_abstract)
+        # Time and calls of each stage and outcomes of the extraction
+        self.stats = Instrumentation()
+        if rule_history is not None:
+            self.stats.rules.load_history(rule_history)
+
+    def load_annotations(self, pmids):
+        """
+        Retrieve the PubTator annotations of the PubMed IDs that are going to be processed. They replace the
+        annotations of previous calls, as general_annotations must be computed over the processed PubMed IDs.
+
+        :param pmids: List(String) List of PubMed IDs
+        :return: None
+        """
+        self.annotations, self.general_annotations = get_annotations_list_pmids(
+            pmids, cache_path=self.annotation_cache, max_workers=self.pubtator_workers,
+            requests_per_second=self.pubtator_rate)
+        self.general_index = index_general_annotations(self.general_annotations)
+        self.annotation_index.cache_clear()
+
+    def _index_annotation(self, pmid):
+        """
+        Index the annotations of a PubMed ID for mention matching.
+
+        :param pmid: (String) PubMed ID of the abstract
+        :return: (dict) {'genes', 'diseases', 'diseases_title': mention_matching.MentionIndex, 'title': title text,
+        'abstract': True if the abstract text is available}, or None if the PubMed ID has no title and abstract
+        annotations.
+        """
+        annotation = self.annotations.get(pmid)
+        # Documents without a title or an abstract passage are treated as not annotated
+        if annotation is None or 'title' not in annotation or 'abstract' not in annotation:
+            return None
+        return {'genes': MentionIndex(annotation['genes']), 'diseases': MentionIndex(annotation['diseases']),
+                'diseases_title': MentionIndex(annotation['diseases_title']), 'title': annotation['title'],
+                'abstract': annotation['abstract'] is not None}
+
+    def _parse_abstract(self, pmid):
+        """
+        Parse the abstract of a PubMed ID.
+
+        :param pmid: (String) PubMed ID of the abstract
+        :return: (spacy.tokens.doc.Doc) abstract processed w/ spaCy models
+        """
+        with self.stats.stage('abstract_parsing'):
+            return self.nlp(self.annotations[pmid]['abstract'])
+
+    def parse_sentences(self, sentences):
+        """
+        Parse the sentences in batches. If the prefilter is enabled, sentences are first processed only up to the
+        lemmatizer, and only those containing a trigger lemma go through the parser, the NER and the entity expansion.
+
+        :param sentences: iterable of (sentence, context) tuples.
+        :return: generator of (spacy.tokens.doc.Doc, context) tuples.
+        """
+        if not self.prefilter:
+            return self.nlp.pipe(sentences, as_tuples=True, batch_size=self.batch_size, n_process=self.n_process)
+        lemmatized = self.nlp.pipe(sentences, as_tuples=True, disable=self.late_pipes, batch_size=self.batch_size,
+                                   n_process=self.n_process)
+        triggered = ((doc, context) for doc, context in lemmatized if has_trigger(doc))
+        # Docs are completed by the remaining components, reusing tokens, tags and lemmas of the first stage
+        return self.nlp.pipe(triggered, as_tuples=True, disable=self.early_pipes, batch_size=self.batch_size,
+                             n_process=self.n_process)
+
+    def process_sentences(self, sentences):
+        """
+        Extract gene-disease associations from sentences. The annotations of their PubMed IDs must have been
+        retrieved with load_annotations.
+
+        :param sentences: iterable of (pmid, sentence) tuples.
+        :return: generator of output rows (list), with the columns of output_handling.header.
+        """
+        contexts = ((self.preprocess(sentence), str(pmid)) for pmid, sentence in sentences)
+        for doc, pmid in self.stats.timed_iter('parsing', self.parse_sentences(contexts)):
+            for row in self.process_doc(doc, pmid):
+                yield row
+
+    def preprocess(self, sentence):
+        """
+        Preprocess a sentence, see input_handling.preprocess_sentence.
+
+        :param sentence: (String) input sentence.
+        :return: (String) preprocessed sentence.
+        """
+        with self.stats.stage('preprocessing'):
+            return preprocess_sentence(str(sentence))
+
+    def process_file(self, input_file, output_file, resume=False, checkpoint_every=1000, stats_file=None,
+                     stats_interval=None):
+        """
+        Extract gene-disease associations from an input csv file (PMID, Sentence) and write them to the output csv
+        file. The number of processed input rows is saved in a checkpoint file (output_file.checkpoint) so that an
+        interrupted run can be resumed.
+
+        :param input_file: (String) path to the input csv file.
+        :param output_file: (String) path to the output csv file.
+        :param resume: (Boolean) if True resume the run from its checkpoint, appending to the existing output file.
+        :param checkpoint_every: (int) number of input rows processed between two checkpoints.
+        :param stats_file: (String) path to the JSON file where the statistics of the run are emitted. If None, they
+        are printed.
+        :param stats_interval: (float) if set, seconds between two intermediate emissions of the statistics.
+        :return: (dict) number of documents in input, of documents with at least an extracted association and of
+        rows written, or None if the run was already completed.
+        """
+        # The statistics emitted are the ones of this run, the rule statistics of the previous runs are kept as
+        # history (to estimate the yield of the rules and to be saved in the rule history file)
+        self.stats.rules.fold_into_history()
+        self.stats.reset()
+        # The checkpoint stores the number of input rows already processed
+        checkpoint_file = output_file + '.checkpoint'
+        start_offset = 0
+        if resume:
+            checkpoint = load_checkpoint(checkpoint_file)
+            if checkpoint is not None:
+                if checkpoint['input_file'] != input_file:
+                    raise ValueError(f"Checkpoint {checkpoint_file} refers to a different input file: {checkpoint['input_file']}")
+                if checkpoint['completed']:
+                    logger.info('Run already completed, results are in %s', output_file)
+                    return None
+                start_offset = checkpoint['offset']
+                logger.info('Resuming from input row %s', start_offset)
+
+        logger.info('Getting all the annotations')
+        start_time = time.time()
+        # Lightweight first pass over the input reading only the PMID column
+        pmids = read_input_pmids(input_file, chunksize=self.chunk_size)
+        with self.stats.stage('annotations'):
+            self.load_annotations(pmids)
+        logger.info('Annotations loaded in %.1f seconds', time.time() - start_time)
+
+        logger.info('Start parsing')
+        # output csv file, rows are written as soon as they are extracted
+        writer = ResultWriter(output_file, append=resume)
+
+        def write_checkpoint(offset, completed=False):
+            save_checkpoint(checkpoint_file, {'input_file': input_file, 'offset': offset,
+                                              'rows_written': writer.tot_matched, 'completed': completed})
+
+        # Input rows before next_offset have been completely processed
+        next_offset = start_offset
+        last_checkpoint = start_offset
+        row_index = None
+        completed = False
+        last_emission = time.time()
         try:
-            # Relation Extraction Module
-            cmp_list, sent_type, rules = relation_extraction(doc, nlp_biore)
-            # Gene and Disease mentions
-            try:
-                genes = annotations[pmid]['genes']
-                diseases = annotations[pmid]['diseases']
-                diseases_title = annotations[pmid]['diseases_title']
-                title = annotations[pmid]['title']
-                abstract = nlp_biore(annotations[pmid]['abstract'])
-            except KeyError:
-                genes = {}
-                diseases = {}
-                diseases_title = {}
-                title = None
-                abstract = None
-            print('Abstract title:', title)
-            print("sent_type:", sent_type)
-            for components in cmp_list:
-                print(components)
-                cmp_type = sent_type
-                # microRNA mentions
-                micro_rnas = get_miRNA(doc)
-                # --- Argument Filtering ---
-                try:
-                    res_check = check_components(components, genes, diseases, micro_rnas, general_annotations)
-                    if res_check:
-                        if sent_type == 'TypeA' and components['compared_entity_1'].text == components['compared_entity_2'].text:
-                            if not correct_matches:
-                                cmp_type = 'TypeB'
-                            else:
-                                continue
-                        elif sent_type == 'TypeA':
-                            try:
-                                tmp = check_entity(components['compared_entity_2'], diseases, general_annotations)
-                            except InvalidArgument:
-                                if not correct_matches:
-                                    cmp_type = 'TypeB'
-                                else:
-                                    continue
-                        print("Extracting gene")
-                        # --- Gene/miRNA Extraction ---
-                        try:
-                            gene_mentions = extract_gene(doc, components['compared_aspect'], genes, micro_rnas, general_annotations)
-                            print("gene mentions:", gene_mentions)
-                        except GeneNotFound:
-                            print('Failed to extract gene/miRNA from Compared Aspect or Expressed Aspect')
-                            continue
-                        # --- Expression Level Normalization ---
-                        try:
-                            norm_level = normalize_expression_level(doc, components)
-                            print("normalized level:", norm_level)
-                        except MistypedExpressionLevel:
-                            print('Failed to Normalize the scale indicator')
-                            continue
-                        # --- Disease Extraction ---
-                        try:
-                            doid, doid_name, mention, disease_location = extract_disease(components, cmp_type, diseases, diseases_title, general_annotations, title, abstract)
-                            print("extracted disease:", doid_name, 'id:', doid, 'location:', disease_location)
-                        except DiseaseNotFound:
-                            print('Failed to extract the disease')
-                            continue
-                        # --- Comparison Flag ---
-                        flag = get_comparison(components, cmp_type)
-                        print("Flag comparison:", flag)
-                        print("Components extracted correctly")
-                        # Extracting gene_id
-                        for gene in gene_mentions:
-                            if gene[1] == 'gene':
-                                try:
-                                    ncbi_id = genes[gene[0]]
-                                except KeyError:
-                                    # Check general_annotations
-                                    try:
-                                        ncbi_id = general_annotations[gene[0]]
-                                    except KeyError:
-                                        ncbi_id = 'NA'
-                            else:
-                                ncbi_id = 'NA'
-                            # --- Saving the results ---
-                            if cmp_type == 'TypeA':
-                                potential_row = [pmid, gene[0], ncbi_id, doid, doid_name, mention,
-                                                     disease_location, norm_level, cmp_type,
-                                                     components['compared_entity_1'].text,
-                                                     components['compared_entity_2'].text,
-                                                     doc.text]
-                            elif cmp_type == 'TypeB':
-                                potential_row = [pmid, gene[0], ncbi_id, doid, doid_name, mention,
-                                                     disease_location, norm_level, cmp_type,
-                                                     components['compared_entity_1'].text, None,
-                                                     doc.text]
-                            # Check for duplicates
-                            info = [pmid, gene, norm_level, cmp_type, doc.text]
-                            if info not in correct_matches:
-                                correct_matches.append(info)
-                                rows.append(potential_row)
-                except InvalidArgument:
-                    print('Arguments found by RE module do not meet the type constraints')
+            # Parse sentences in batches (possibly on multiple processes), the pmid is kept as context of each sentence
+            docs = self.parse_sentences(self.read_sentences(input_file, start_offset))
+            for doc, (row_index, pmid) in self.stats.timed_iter('parsing', docs):
+                # Rows are returned in input order, all the previous rows have been processed
+                next_offset = row_index
+                if next_offset - last_checkpoint >= checkpoint_every:
+                    write_checkpoint(next_offset)
+                    last_checkpoint = next_offset
+                for row in self.process_doc(doc, pmid):
+                    with self.stats.stage('output'):
+                        written = writer.write_row(row)
+                    self.stats.count('rows_written' if written else 'duplicate_rows')
+                if stats_interval is not None and time.time() - last_emission >= stats_interval:
+                    self.stats.emit(stats_file)
+                    last_emission = time.time()
+            # All the input rows have been processed
+            if row_index is not None:
+                next_offset = row_index + 1
+            completed = True
+        finally:
+            # Save the progress also if the run is interrupted by an error
+            write_checkpoint(next_offset, completed)
+            writer.close()
+            self.stats.emit(stats_file)
+            if self.rule_history is not None:
+                self.stats.rules.save_history(self.rule_history)
+        return {'documents': len(pmids), 'documents_matched': len(writer.pmids_matched),
+                'rows': writer.tot_matched}
+
+    def read_sentences(self, input_file, offset=0):
+        """
+        Preprocess the input sentences keeping track of the PubMed ID they belong to and of their position in the
+        input.
+
+        :param input_file: (String) path to the input csv file with columns PMID and Sentence.
+        :param offset: (int) number of input rows to skip (already processed).
+        :return: generator of (preprocessed sentence, (row index, pmid)) tuples.
+        """
+        input_rows = enumerate(read_input_sentences(input_file, chunksize=self.chunk_size))
+        for row_index, (input_pmid, sentence) in islice(input_rows, offset, None):
+            yield self.preprocess(sentence), (row_index, input_pmid)
+
+    def process_doc(self, doc, pmid):
+        """
+        Extract gene-disease associations from a parsed sentence.
+
+        :param doc: (spacy.tokens.doc.Doc) sentence processed w/ spaCy models
+        :param pmid: (String) PubMed ID of the abstract containing the sentence
+        :return: list of output rows (list), with the columns of output_handling.header.
+        """
+        rows = []
+        general_annotations = self.general_index
+        stats = self.stats
+        # Diagnostic messages are formatted only if DEBUG logging is enabled
+        debug = logger.isEnabledFor(logging.DEBUG)
+        stats.count('sentences')
+        if debug:
+            logger.debug('sentence: %s', doc.text)
+        with stats.stage('retokenize_miRNA'):
+            retokenize_miRNA(doc)
+        # filter out sentences that do not contain type-A or type-B triggers
+        if not has_trigger(doc):
+            stats.count('no_trigger')
+            return rows
+
+        correct_matches = set()
+        # Gene and Disease mentions
+        annotation = self.annotation_index(pmid)
+        if annotation is not None:
+            genes = annotation['genes']
+            diseases = annotation['diseases']
+            diseases_title = annotation['diseases_title']
+            title = annotation['title']
+            # The abstract is parsed lazily, only if the disease has to be inferred from context
+            abstract = partial(self.parse_abstract, pmid) if annotation['abstract'] else None
+        else:
+            genes = {}
+            diseases = {}
+            diseases_title = {}
+            title = None
+            abstract = None
+        # microRNA mentions
+        micro_rnas = get_miRNA(doc)
+        # Result of the type constraints check of each component, computed during the relation extraction in
+        # adaptive mode
+        checked = {}
+
+        def accept(components):
+            with stats.stage('check_components'):
+                checked[id(components)] = components_meet_constraints(components, genes, diseases, micro_rnas,
+                                                                      general_annotations)
+            return checked[id(components)]
+
+        if debug:
+            logger.debug('Relation Extraction Module for sentence: %s', doc.text)
+            logger.debug('PMID: %s', pmid)
+        # Relation Extraction Module
+        with stats.stage('relation_extraction'):
+            result = extract_relations(doc, self.nlp, single_pass=self.single_pass, backend=self.matcher_backend,
+                                       rule_stats=stats.rules, adaptive=self.adaptive,
+                                       accept=accept if self.adaptive else None, max_accepted=self.max_accepted)
+        if result.status != status_ok:
+            stats.count(result.status)
+            if debug:
+                logger.debug('RE module failed to retrieve the components')
+            return rows
+        sent_type = result.sent_type
+        if debug:
+            logger.debug('Abstract title: %s', title)
+            logger.debug('sent_type: %s', sent_type)
+        for components, rule_name in zip(result.components, result.component_rules):
+            if debug:
+                logger.debug('components: %s', components)
+            cmp_type = sent_type
+            # --- Argument Filtering ---
+            stats.count('components')
+            if id(components) in checked:
+                res_check = checked[id(components)]
+            else:
+                with stats.stage('check_components'):
+                    res_check = components_meet_constraints(components, genes, diseases, micro_rnas,
+                                                            general_annotations)
+            if not res_check:
+                stats.count('InvalidArgument')
+                if debug:
+                    logger.debug('Arguments found by RE module do not meet the type constraints')
+                continue
+            stats.rules.count(rule_name, 'survived')
+            if sent_type == 'TypeA' and components['compared_entity_1'].text == components['compared_entity_2'].text:
+                if not correct_matches:
+                    cmp_type = 'TypeB'
+                else:
+                    stats.count('same_compared_entities')
                     continue
-        except MatchNotFound:
-            print('RE module failed to retrieve the components')
-            continue
-
-print('--- Saving the results ---')
-tot_matched = 0
-pmids_matched = {}
-# writing to csv file
-with open(output_file, 'w') as csvfile:
-    # creating a csv writer object
-    csvwriter = csv.writer(csvfile)
-    # writing the fields
-    csvwriter.writerow(header)
-    for r in rows:
-        if r[0] not in pmids_matched.keys():
-            tot_matched += 1
-            pmids_matched[r[0]] = {}
-            pmids_matched[r[0]]['sentences'] = [r[9]]
-            pmids_matched[r[0]]['rows'] = [r]
-            # writing the data rows
-            csvwriter.writerow(r)
-        elif r not in pmids_matched[r[0]]['rows']:
-            if r[9] not in pmids_matched[r[0]]['sentences']:
-                pmids_matched[r[0]]['sentences'].append(r[9])
-            tot_matched += 1
-            pmids_matched[r[0]]['rows'].append(r)
-            # writing the data rows
-            csvwriter.writerow(r)
-
-print("--- %s seconds ---" % (time.time() - start_time))
-print('tot docs to parse: ', tot_docs)
-print('Documents correctly parsed: ', len(pmids_matched.keys()))
+            elif sent_type == 'TypeA':
+                if not entity_meets_constraints(components['compared_entity_2'], diseases, general_annotations):
+                    if not correct_matches:
+                        cmp_type = 'TypeB'
+                    else:
+                        stats.count('invalid_compared_entity')
+                        continue
+            if debug:
+                logger.debug('Extracting gene')
+            # --- Gene/miRNA Extraction ---
+            with stats.stage('extract_gene'):
+                gene_mentions = find_gene_mentions(doc, components['compared_aspect'], genes, micro_rnas,
+                                                   general_annotations)
+            if gene_mentions is None:
+                stats.count('GeneNotFound')
+                if debug:
+                    logger.debug('Failed to extract gene/miRNA from Compared Aspect or Expressed Aspect')
+                continue
+            if debug:
+                logger.debug('gene mentions: %s', gene_mentions)
+            # --- Expression Level Normalization ---
+            with stats.stage('normalize_expression_level'):
+                norm_level = find_expression_level(doc, components)
+            if norm_level is None:
+                stats.count('MistypedExpressionLevel')
+                if debug:
+                    logger.debug('Failed to Normalize the scale indicator')
+                continue
+            if debug:
+                logger.debug('normalized level: %s', norm_level)
+            # --- Disease Extraction ---
+            with stats.stage('extract_disease'):
+                disease = find_disease(components, cmp_type, diseases, diseases_title, general_annotations, title,
+                                       abstract, mention_index=self.mention_index)
+            if disease is None:
+                stats.count('DiseaseNotFound')
+                if debug:
+                    logger.debug('Failed to extract the disease')
+                continue
+            doid, doid_name, mention, disease_location = disease
+            if debug:
+                logger.debug('extracted disease: %s id: %s location: %s', doid_name, doid, disease_location)
+            # --- Comparison Flag ---
+            flag = get_comparison(components, cmp_type)
+            if debug:
+                logger.debug('Flag comparison: %s', flag)
+                logger.debug('Components extracted correctly')
+            stats.count('components_accepted')
+            # Extracting gene_id
+            for gene in gene_mentions:
+                if gene[1] == 'gene':
+                    if gene[0] in genes:
+                        ncbi_id = genes[gene[0]]
+                    else:
+                        # Check general_annotations
+                        ncbi_id = general_annotations.get(gene[0], 'NA')
+                else:
+                    ncbi_id = 'NA'
+                # --- Saving the results ---
+                if cmp_type == 'TypeA':
+                    potential_row = [pmid, gene[0], ncbi_id, doid, doid_name, mention,
+                                     disease_location, norm_level, cmp_type,
+                                     components['compared_entity_1'].text,
+                                     components['compared_entity_2'].text,
+                                     doc.text]
+                else:
+                    potential_row = [pmid, gene[0], ncbi_id, doid, doid_name, mention,
+                                     disease_location, norm_level, cmp_type,
+                                     components['compared_entity_1'].text, None,
+                                     doc.text]
+                # Check for duplicates
+                info = (pmid, tuple(gene), norm_level, cmp_type, doc.text)
+                if info not in correct_matches:
+                    correct_matches.add(info)
+                    rows.append(potential_row)
+                    stats.rules.count(rule_name, 'rows')
+        return rows
+
+
+def main():
+    # Extracting input and output file from arguments
+    parser = argparse.ArgumentParser(description='DEXTER: Disease-Expression Relation Extraction from Text')
+    parser.add_argument('input_file', help='path to the input csv file (PMID, Sentence)')
+    parser.add_argument('output_file', help='path to the output csv file')
+    parser.add_argument('--chunk-size', type=int, default=10000,
+                        help='number of input rows read at once from the input csv file')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='number of sentences buffered by spaCy for each parsing batch')
+    parser.add_argument('--n-process', type=int, default=1,
+                        help='number of processes used by spaCy to parse the sentences (-1 for all cores)')
+    parser.add_argument('--prefilter', action='store_true',
+                        help='run the parser, the NER and the entity expansion only on sentences with a trigger lemma')
+    parser.add_argument('--single-pass', action='store_true',
+                        help='match all the applicable rules of a sentence in one matcher call')
+    parser.add_argument('--matcher', choices=['spacy', 'compiled'], default='spacy',
+                        help='matcher used by the rules: spaCy DependencyMatcher or the compiled rule matcher')
+    parser.add_argument('--mention-matcher', choices=['substring', 'phrase'], default='substring',
+                        help='how disease mentions are found in the compared entities: substrings of their text or '
+                             'spaCy PhraseMatcher over the tokens of the sentence')
+    parser.add_argument('--rules', default=None,
+                        help='path to the JSON rule file of the relation extraction module')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='apply the rules in order of historical yield and stop once --max-accepted components '
+                             'meet the type constraints')
+    parser.add_argument('--max-accepted', type=int, default=1,
+                        help='number of components meeting the type constraints after which a sentence is not '
+                             'matched against the remaining rules, in adaptive mode')
+    parser.add_argument('--rule-history', default=None,
+                        help='path to the JSON file with the statistics of the rules in previous runs, updated at the '
+                             'end of the run')
+    parser.add_argument('--abstract-cache-size', type=int, default=128,
+                        help='maximum number of parsed abstracts kept in memory')
+    parser.add_argument('--annotation-index-size', type=int, default=256,
+                        help='maximum number of PubMed IDs whose annotations are kept indexed for mention matching')
+    parser.add_argument('--annotation-cache', default=None,
+                        help='path to a SQLite file caching the PubTator annotations across runs')
+    parser.add_argument('--pubtator-workers', type=int, default=3,
+                        help='maximum number of concurrent requests to PubTator')
+    parser.add_argument('--pubtator-rate', type=float, default=3,
+                        help='maximum number of requests per second sent to PubTator (0 for no limit)')
+    parser.add_argument('--checkpoint-every', type=int, default=1000,
+                        help='number of input rows processed between two checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='resume an interrupted run from its checkpoint, appending to the existing output file')
+    parser.add_argument('--stats', default=None,
+                        help='path to the JSON file with time and calls of each stage and outcome counters '
+                             '(printed at the end of the run if not set)')
+    parser.add_argument('--stats-interval', type=float, default=None,
+                        help='seconds between two intermediate emissions of the statistics')
+    parser.add_argument('--log-level', choices=log_levels, default='INFO',
+                        help='minimum level of the logged messages, DEBUG logs the diagnostics of every sentence')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format=log_format)
+    logger.info('Reading from %s', args.input_file)
+
+    start_time = time.time()
+    pipeline = DexterPipeline(batch_size=args.batch_size, n_process=args.n_process, prefilter=args.prefilter,
+                              chunk_size=args.chunk_size, abstract_cache_size=args.abstract_cache_size,
+                              annotation_cache=args.annotation_cache, pubtator_workers=args.pubtator_workers,
+                              pubtator_rate=args.pubtator_rate, single_pass=args.single_pass,
+                              matcher_backend=args.matcher, rules_file=args.rules, adaptive=args.adaptive,
+                              max_accepted=args.max_accepted, rule_history=args.rule_history,
+                              mention_matcher=args.mention_matcher, annotation_index_size=args.annotation_index_size)
+    summary = pipeline.process_file(args.input_file, args.output_file, resume=args.resume,
+                                    checkpoint_every=args.checkpoint_every, stats_file=args.stats,
+                                    stats_interval=args.stats_interval)
+    logger.info('Run completed in %.1f seconds', time.time() - start_time)
+    if summary is not None:
+        logger.info('tot docs to parse: %s', summary['documents'])
+        logger.info('Documents correctly parsed: %s', summary['documents_matched'])
+    # Hits, yield and time of each relation extraction rule
+    logger.info('Relation extraction rules:\n%s', pipeline.stats.rules.table())
+
+
+if __name__ == '__main__':
+    main()
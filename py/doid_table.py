@@ -0,0 +1,67 @@
+# Precomputed table of the DOIDs used by the disease extraction
+import hashlib
+import json
+import os
+import pickle
+
+# Version of the table format, part of the cache key
+doid_table_version = 1
+
+# Tables loaded so far, by hash of the names file and of the generic diseases
+_loaded = {}
+
+
+def build_doid_table(doid_to_names, generic_diseases):
+    """
+    Build the table of the DOIDs: the name of each disease is lower-cased and checked against the generic diseases
+    once, instead of at each mention.
+
+    :param doid_to_names: (dict) {DOID: Disease Name}.
+    :param generic_diseases: (set) lower-case names of the generic diseases.
+    :return: (dict) {DOID: (Disease Name, lower-case Disease Name, True if the disease is generic)}.
+    """
+    table = {}
+    for doid, disease_name in doid_to_names.items():
+        lower_name = disease_name.lower()
+        table[doid] = (disease_name, lower_name, lower_name in generic_diseases)
+    return table
+
+
+def load_doid_table(names_file, generic_diseases, cache_dir=None):
+    """
+    Load the table of the DOIDs built from a names file. The table is cached in a pickle file named after the hash of
+    the names file and of the generic diseases, so that it is built only when one of them changes.
+
+    :param names_file: (String) path to the JSON file mapping DOIDs to disease names, e.g., doid_to_names.json.
+    :param generic_diseases: (set) lower-case names of the generic diseases.
+    :param cache_dir: (String) directory of the cached tables, '.doid_cache' next to the names file if None.
+    :return: (dict) table of the DOIDs, see build_doid_table.
+    """
+    with open(names_file, 'rb') as f:
+        content = f.read()
+    key = '\n'.join([str(doid_table_version)] + sorted(generic_diseases)).encode()
+    digest = hashlib.sha256(content + b'\0' + key).hexdigest()
+    table = _loaded.get(digest)
+    if table is not None:
+        return table
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(names_file)), '.doid_cache')
+    cache_file = os.path.join(cache_dir, digest + '.pickle')
+    try:
+        with open(cache_file, 'rb') as f:
+            table = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        table = None
+    if not isinstance(table, dict):
+        table = build_doid_table(json.loads(content.decode('utf-8')), generic_diseases)
+        # The cache is optional, e.g., the data directory may be read-only
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_file = cache_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+    _loaded[digest] = table
+    return table
@@ -1,12 +1,21 @@
 import json
+import logging
 import os
 import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 import spacy
 from spacy.tokens import Span
 from exceptions import PubMedIDNotFound
 
+logger = logging.getLogger(__name__)
+
 # Triggers to detect if a phrase is of type 'Expression'
 expression_trigs = ['over-expression', 'under-expression', 'expression', 'up-regulation', 'down-regulation',
                     'overexpression', 'underexpression', 'upregulation', 'downregulation', 'level', 'levels',
@@ -24,6 +33,16 @@ disease_sample_trigs = ['tissue', 'cell', 'patient', 'sample', 'tumor', 'cancer'
 # Regular Expression to retrieve miRNA mentions
 mi_regex = '(([a-z]{3,4}-)?(mi|Mi|MI)(RNA|R|r)s?(((([0-9]|[a-z])+)-[^ ,.]*)|((([0-9]|[a-z])+)|(-[^ ,.]*))))' + '|' + '([M,m]icro[-]?RNA(s?)-([0-9]|[a-z])+)'
 
+# PubTator endpoint to export annotations in BioC JSON format
+PUBTATOR_EXPORT_URL = "https://www.ncbi.nlm.nih.gov/research/pubtator-api/publications/export/biocjson"
+# Version of the format of the annotation cache, caches written in other formats are discarded
+annotation_cache_version = 2
+# Days after which the pmids without a document in PubTator are requested again
+missing_recheck_days = 30
+
+# HTTP statuses of the failures caused by the requested pmids, the list is split without retrying it
+pubtator_split_statuses = {400, 413, 414}
+
 # Dictionary for mapping MESH IDs to DOIDs
 mesh_to_doid_json = str(Path(os.path.abspath(os.getcwd())).parent.absolute()) + "/data/input/" + 'mesh_to_doid.json'
 with open(mesh_to_doid_json, 'r') as udf:
@@ -98,102 +117,352 @@ def get_annotations(pmid):
     return abstract_text, genes, diseases, diseases_title, title_text
 
 
-def get_annotations_list_pmids(pmids):
+def get_annotations_list_pmids(pmids, cache_path=None, url=PUBTATOR_EXPORT_URL, max_workers=3,
+                               requests_per_second=3, timeout=60, max_retries=3):
     """
     Retrieves gene and disease mentions in the abstract and disease mentions in the title from PubTator given a
     list of pmids.
 
     :param pmids: List(String) List of PubMed IDs
+    :param cache_path: (String) path to a SQLite file used as persistent cache of the annotations. Only the pmids
+    not already in the cache are requested to PubTator, except the ones PubTator had no document for in the last
+    missing_recheck_days days. If None the cache is not used.
+    :param url: (String) url of the BioC JSON export endpoint of PubTator.
+    :param max_workers: (int) maximum number of requests in flight.
+    :param requests_per_second: (float) maximum number of requests started per second, None for no limit.
+    :param timeout: (float) timeout in seconds of each request.
+    :param max_retries: (int) number of retries of a failed request before splitting its list of pmids.
 
     :return: dictionary containing the gene and disease annotations for each pmid.
              {'pmid': {'genes': {'mention': 'ncbi gene id'}, 'diseases': {'mention': 'doid'}, 'diseases_title':{'mention': 'doid'}}}
     :return: dictionary of all annotations for the list of ids.
             {'genes': {'mention': 'ncbi gene id'}, 'diseases': {'mention': 'doid'}}
     """
-    # Storing pmids in list of maximum 1000 elements to request annotations
-    list_pmids = [[]]
-    count = 0
-    i = 0
-    check = {}
-    for pm_id in pmids:
-        if pm_id not in check.keys():
-            count += 1
-            list_pmids[i].append(str(pm_id))
-            check[str(pm_id)] = 1
-        if count > 0 and count % 1000 == 0:
-            i += 1
-            list_pmids.append([])
+    # Remove duplicate pmids preserving their order
+    unique_pmids = list(dict.fromkeys(str(pm_id) for pm_id in pmids))
     # dict of PubTator annotations based on pmid
     # ({'id': {'abstract':,'genes':{'text': id},'diseases':{'text': id},'diseases_title':{'text':i d}}})
     annotations = {}
+    cache = None
+    if cache_path is not None:
+        cache = open_annotation_cache(cache_path)
+        annotations.update(load_cached_annotations(cache, unique_pmids))
+        logger.info('%s pmids loaded from the annotation cache', len(annotations))
+        known_missing = load_missing_pmids(cache, [pm_id for pm_id in unique_pmids if pm_id not in annotations])
+        if known_missing:
+            logger.info('%s pmids without a document in PubTator skipped', len(known_missing))
+    else:
+        known_missing = set()
+    missing_pmids = [pm_id for pm_id in unique_pmids if pm_id not in annotations and pm_id not in known_missing]
+    try:
+        for answered, documents in fetch_bioc_chunks(missing_pmids, url=url, max_workers=max_workers,
+                                                     requests_per_second=requests_per_second, timeout=timeout,
+                                                     max_retries=max_retries):
+            fetched = {str(res['id']): parse_bioc_document(res) for res in documents}
+            # Store each list as soon as it is retrieved, so that an interrupted run keeps the annotations fetched
+            if cache is not None:
+                store_annotations(cache, documents, [pm_id for pm_id in answered if pm_id not in fetched])
+            annotations.update(fetched)
+    finally:
+        if cache is not None:
+            cache.close()
     # dict of all annotations retrieved by PubTator for the list of pmids
     # ({'genes':{'id':text},'diseases':{'id':text}})
     general_annotations = {'genes': {}, 'diseases': {}}
-    count = 0
-    for list_ids in list_pmids:
-        count += 1
-        payload = {"pmids": list_ids}
-        print("*** Parsing", str(count), 'list ***')
-        response = requests.post(
-            "https://www.ncbi.nlm.nih.gov/research/pubtator-api/publications/export/biocjson", json=payload)
-        for r in response.iter_lines():
-            res = json.loads(r.decode('utf-8'))
-            # Initialization of each dictionary-key value
-            annotations[res['id']] = {'genes': {}, 'diseases': {}, 'diseases_title': {}}
-            for passage in res["passages"]:
-                # Retrieving abstract text and annotations
-                if passage['infons']['type'] == 'abstract':
-                    # Retrieving abstract text
-                    annotations[res['id']]['abstract'] = passage['text']
-                    # Retrieving annotations
-                    for annotation in passage['annotations']:
-                        # Retrieving gene annotations
-                        if annotation['infons']['type'] == 'Gene':
-                            try:
-                                annotations[res['id']]['genes'][annotation['text']] = annotation['infons'][
-                                    'identifier']
-                            except KeyError:
-                                # Check if it is a gene without ncbi gene ID or if it is a miRNA
-                                if re.search(mi_regex, annotation['text']):
-                                    # if microRNA
-                                    annotations[res['id']]['genes'][annotation['text']] = 'micro-RNA'
-                                else:
-                                    annotations[res['id']]['genes'][annotation['text']] = 'ncbi gene_id not found'
-                        # Retrieving disease annotations
-                        elif annotation['infons']['type'] == 'Disease':
-                            try:
-                                if annotation['infons']['identifier'] is None:
-                                    continue
-                                try:
-                                    # Map MESH IDs to DOIDs
-                                    annotations[res['id']]['diseases'][annotation['text']] = mesh_to_doid[annotation['infons']['identifier']]
-                                except KeyError:
-                                    continue
-                            except KeyError:
-                                continue
-                # Retrieving title text and disease annotations
-                elif passage['infons']['type'] == 'title':
-                    # Retrieving title text
-                    annotations[res['id']]['title'] = passage['text']
-                    # Retrieve disease annotations
-                    for annotation in passage['annotations']:
-                        if annotation['infons']['type'] == 'Disease':
-                            try:
-                                if annotation['infons']['identifier'] is None:
-                                    continue
-                                try:
-                                    # Map MESH IDs to DOIDs
-                                    annotations[res['id']]['diseases'][annotation['text']] = mesh_to_doid[
-                                        annotation['infons']['identifier']]
-                                except KeyError:
-                                    continue
-                            except KeyError:
-                                continue
+    for pm_id in unique_pmids:
+        if pm_id in annotations:
             # Store mentions in general_annotations if not already present
-            general_annotations = populate_dict(annotations[res['id']], general_annotations)
+            general_annotations = populate_dict(annotations[pm_id], general_annotations)
     return annotations, general_annotations
 
 
+def fetch_bioc_chunks(pmids, url=PUBTATOR_EXPORT_URL, chunk_size=1000, max_workers=3, requests_per_second=3,
+                      timeout=60, max_retries=3, backoff=1.0, max_failed_requests=100, max_failed_lists=20):
+    """
+    Request the BioC JSON documents of a list of pmids to PubTator. Pmids are sent in lists of chunk_size elements,
+    keeping at most max_workers requests in flight over a pooled session.
+    Failed requests are retried with exponential backoff. Failures that may depend on the requested pmids (e.g., HTTP
+    413 or 5xx, invalid responses) split the list in two halves that are requested separately, without further
+    retries, to isolate the pmids causing them. Failures that do not depend on the pmids (connection errors,
+    timeouts, other HTTP 4xx) stop the fetch once the retries are used up, as do max_failed_requests failed requests
+    or max_failed_lists consecutive failed lists: the pmids not retrieved are logged and skipped.
+
+    :param pmids: List(String) List of PubMed IDs
+    :param url: (String) url of the BioC JSON export endpoint.
+    :param chunk_size: (int) maximum number of pmids for each request.
+    :param max_workers: (int) maximum number of requests in flight.
+    :param requests_per_second: (float) maximum number of requests started per second, None for no limit.
+    :param timeout: (float) timeout in seconds of each request.
+    :param max_retries: (int) number of retries of a failed request.
+    :param backoff: (float) seconds to wait before the first retry, doubled at each retry.
+    :param max_failed_requests: (int) maximum number of failed requests over the whole fetch.
+    :param max_failed_lists: (int) maximum number of consecutive lists (or halves) failing after their retries.
+
+    :return: generator of (answered pmids, BioC JSON documents) for each list of pmids, in order. Answered pmids
+    are the ones requested with a successful response: those without a document are unknown to PubTator, while the
+    pmids not answered could not be retrieved.
+    """
+    if not pmids:
+        return
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Time at which the next request can be started (shared among workers to respect the rate limit)
+    rate_lock = threading.Lock()
+    next_request = [time.monotonic()]
+    # Failure counters and pmids not retrieved, shared among workers
+    state_lock = threading.Lock()
+    state = {'failed_requests': 0, 'failed_lists': 0, 'dropped': [], 'given_up': False}
+    # Set when the fetch is given up or the generator is closed, the lists not yet requested are skipped
+    stop = threading.Event()
+
+    def wait_turn():
+        if not requests_per_second:
+            return
+        with rate_lock:
+            now = time.monotonic()
+            start = max(now, next_request[0])
+            next_request[0] = start + 1.0 / requests_per_second
+        time.sleep(start - now)
+
+    def give_up(reason):
+        with state_lock:
+            if state['given_up']:
+                return
+            state['given_up'] = True
+        stop.set()
+        logger.error('Giving up on the PubTator requests: %s', reason)
+
+    def drop(list_ids):
+        with state_lock:
+            state['dropped'].extend(list_ids)
+        return [], []
+
+    def request_documents(list_ids, split=False):
+        for attempt in range(max_retries + 1):
+            if stop.is_set():
+                # Lists not requested because the generator was closed are not failures
+                return drop(list_ids) if state['given_up'] else ([], [])
+            wait_turn()
+            try:
+                response = session.post(url, json={"pmids": list_ids}, timeout=timeout)
+                response.raise_for_status()
+                documents = [json.loads(line.decode('utf-8')) for line in response.iter_lines() if line]
+            except (requests.RequestException, ValueError) as e:
+                error = e
+                if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                    # PubTator cannot be reached, whatever the pmids
+                    depends_on_pmids, retry = False, True
+                elif isinstance(e, requests.HTTPError) and e.response.status_code < 500:
+                    depends_on_pmids = e.response.status_code in pubtator_split_statuses
+                    # Too many requests
+                    retry = e.response.status_code == 429
+                else:
+                    # Server errors and invalid responses
+                    depends_on_pmids, retry = True, True
+                logger.warning('Request for %s pmids failed (%s), attempt %s', len(list_ids), e, attempt + 1)
+                with state_lock:
+                    state['failed_requests'] += 1
+                    failed_requests = state['failed_requests']
+                if failed_requests >= max_failed_requests:
+                    give_up(f'{failed_requests} failed requests')
+                    return drop(list_ids)
+                # The halves of a split list are not retried, the failure is expected to depend on their pmids
+                if retry and not (depends_on_pmids and split) and attempt < max_retries:
+                    stop.wait(backoff * 2 ** attempt)
+                    continue
+                break
+            else:
+                with state_lock:
+                    state['failed_lists'] = 0
+                return list_ids, documents
+        with state_lock:
+            state['failed_lists'] += 1
+            failed_lists = state['failed_lists']
+        if not depends_on_pmids:
+            give_up(f'PubTator is not available ({error})')
+            return drop(list_ids)
+        if failed_lists >= max_failed_lists:
+            give_up(f'{failed_lists} consecutive lists of pmids failed')
+            return drop(list_ids)
+        if len(list_ids) == 1:
+            return drop(list_ids)
+        # Split the failing list and request the two halves separately
+        half = len(list_ids) // 2
+        first_answered, first_documents = request_documents(list_ids[:half], True)
+        second_answered, second_documents = request_documents(list_ids[half:], True)
+        return first_answered + second_answered, first_documents + second_documents
+
+    # Storing pmids in list of maximum chunk_size elements to request annotations
+    list_pmids = [pmids[i:i + chunk_size] for i in range(0, len(pmids), chunk_size)]
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                # map keeps at most max_workers requests running and returns the results in order
+                for count, result in enumerate(executor.map(request_documents, list_pmids), start=1):
+                    logger.info('Parsing list %s of %s', count, len(list_pmids))
+                    yield result
+            finally:
+                # Skip the lists not yet requested if the generator is closed early
+                stop.set()
+    finally:
+        session.close()
+        position = {pmid: k for k, pmid in enumerate(pmids)}
+        dropped = sorted(state['dropped'], key=position.get)
+        if dropped:
+            logger.error('Failed to retrieve the annotations of %s pmids: %s%s', len(dropped),
+                         ', '.join(dropped[:20]), ', ...' if len(dropped) > 20 else '')
+
+
+def parse_bioc_document(res):
+    """
+    Normalize the PubTator annotations of a single document in BioC JSON format.
+
+    :param res: (dict) BioC JSON document returned by PubTator.
+
+    :return: dictionary with the gene and disease annotations of the document.
+             {'abstract': text, 'title': text, 'genes': {'mention': 'ncbi gene id'}, 'diseases': {'mention': 'doid'},
+             'diseases_title':{'mention': 'doid'}}
+    """
+    # Initialization of each dictionary-key value
+    document = {'genes': {}, 'diseases': {}, 'diseases_title': {}}
+    for passage in res["passages"]:
+        # Retrieving abstract text and annotations
+        if passage['infons']['type'] == 'abstract':
+            # Retrieving abstract text
+            document['abstract'] = passage['text']
+            # Retrieving annotations
+            for annotation in passage['annotations']:
+                # Retrieving gene annotations
+                if annotation['infons']['type'] == 'Gene':
+                    try:
+                        document['genes'][annotation['text']] = annotation['infons']['identifier']
+                    except KeyError:
+                        # Check if it is a gene without ncbi gene ID or if it is a miRNA
+                        if re.search(mi_regex, annotation['text']):
+                            # if microRNA
+                            document['genes'][annotation['text']] = 'micro-RNA'
+                        else:
+                            document['genes'][annotation['text']] = 'ncbi gene_id not found'
+                # Retrieving disease annotations
+                elif annotation['infons']['type'] == 'Disease':
+                    try:
+                        if annotation['infons']['identifier'] is None:
+                            continue
+                        try:
+                            # Map MESH IDs to DOIDs
+                            document['diseases'][annotation['text']] = mesh_to_doid[annotation['infons']['identifier']]
+                        except KeyError:
+                            continue
+                    except KeyError:
+                        continue
+        # Retrieving title text and disease annotations
+        elif passage['infons']['type'] == 'title':
+            # Retrieving title text
+            document['title'] = passage['text']
+            # Retrieve disease annotations
+            for annotation in passage['annotations']:
+                if annotation['infons']['type'] == 'Disease':
+                    try:
+                        if annotation['infons']['identifier'] is None:
+                            continue
+                        try:
+                            # Map MESH IDs to DOIDs
+                            document['diseases'][annotation['text']] = mesh_to_doid[
+                                annotation['infons']['identifier']]
+                        except KeyError:
+                            continue
+                    except KeyError:
+                        continue
+    return document
+
+
+def open_annotation_cache(cache_path):
+    """
+    Open (and create if needed) the SQLite file storing the BioC JSON documents retrieved from PubTator. The
+    documents are stored as retrieved and normalized when loaded, so that the cache does not depend on the mapping
+    of mesh_to_doid.json. If the cache was written in a different format it is emptied.
+
+    :param cache_path: (String) path to the SQLite file.
+    :return: (sqlite3.Connection) connection to the cache.
+    """
+    connection = sqlite3.connect(cache_path)
+    connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    version = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    if version is None or version[0] != str(annotation_cache_version):
+        tables = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'annotations' in tables:
+            logger.warning('Discarding the annotation cache %s, written in a different format', cache_path)
+        connection.execute('DROP TABLE IF EXISTS annotations')
+        connection.execute('DROP TABLE IF EXISTS missing')
+        connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                           (str(annotation_cache_version),))
+    connection.execute('CREATE TABLE IF NOT EXISTS annotations (pmid TEXT PRIMARY KEY, document BLOB NOT NULL)')
+    # Pmids without a document in PubTator, and time (seconds since the epoch) they were last requested
+    connection.execute('CREATE TABLE IF NOT EXISTS missing (pmid TEXT PRIMARY KEY, checked REAL NOT NULL)')
+    connection.commit()
+    return connection
+
+
+def load_cached_annotations(connection, pmids):
+    """
+    Load the annotations of the given pmids available in the cache, normalizing their BioC JSON documents with the
+    current mapping of the MESH IDs to DOIDs.
+
+    :param connection: (sqlite3.Connection) connection to the cache.
+    :param pmids: List(String) List of PubMed IDs
+    :return: dictionary of annotations for the cached pmids, same format of get_annotations_list_pmids.
+    """
+    annotations = {}
+    # Query the pmids in blocks to stay below the SQLite limit of variables per statement
+    for i in range(0, len(pmids), 500):
+        block = pmids[i:i + 500]
+        query = 'SELECT pmid, document FROM annotations WHERE pmid IN ({})'.format(', '.join('?' * len(block)))
+        for pm_id, document in connection.execute(query, block):
+            annotations[pm_id] = parse_bioc_document(json.loads(zlib.decompress(document).decode('utf-8')))
+    return annotations
+
+
+def load_missing_pmids(connection, pmids, max_age_days=None):
+    """
+    Load the pmids PubTator had no document for when they were last requested, if not longer than max_age_days ago.
+
+    :param connection: (sqlite3.Connection) connection to the cache.
+    :param pmids: List(String) List of PubMed IDs
+    :param max_age_days: (float) days after which a pmid is requested again, missing_recheck_days if None.
+    :return: set(String) pmids to skip.
+    """
+    if max_age_days is None:
+        max_age_days = missing_recheck_days
+    oldest = time.time() - max_age_days * 86400
+    missing = set()
+    for i in range(0, len(pmids), 500):
+        block = pmids[i:i + 500]
+        query = 'SELECT pmid FROM missing WHERE checked >= ? AND pmid IN ({})'.format(', '.join('?' * len(block)))
+        missing.update(pm_id for pm_id, in connection.execute(query, [oldest] + block))
+    return missing
+
+
+def store_annotations(connection, documents, missing_pmids=()):
+    """
+    Store the BioC JSON documents retrieved from PubTator in the cache (compressed), replacing the ones of the same
+    pmids, and the pmids PubTator has no document for.
+
+    :param connection: (sqlite3.Connection) connection to the cache.
+    :param documents: list(dict) BioC JSON documents.
+    :param missing_pmids: List(String) pmids requested with a successful response but without a document.
+    :return: None
+    """
+    rows = [(str(res['id']), zlib.compress(json.dumps(res).encode('utf-8'))) for res in documents]
+    connection.executemany('INSERT OR REPLACE INTO annotations (pmid, document) VALUES (?, ?)', rows)
+    connection.executemany('DELETE FROM missing WHERE pmid = ?', [(pm_id,) for pm_id, _ in rows])
+    now = time.time()
+    connection.executemany('INSERT OR REPLACE INTO missing (pmid, checked) VALUES (?, ?)',
+                           [(pm_id, now) for pm_id in missing_pmids])
+    connection.commit()
+
+
 def populate_dict(pmid_annotation, general_annotations):
     """
     Populate general_annotations with mentions retrieved for the specific pmid, if not already present.
@@ -39,3 +39,15 @@ class MistypedExpressionLevel(Exception):
     """Raise when the scale indicator cannot be normalized."""
     def __str__(self):
         return 'Failed to normalize the expression level'
+
+
+class InvalidRuleFile(Exception):
+    """Raised when a rule file does not define valid relation extraction rules."""
+    def __init__(self, reason=None):
+        super().__init__(reason)
+        self.reason = reason
+
+    def __str__(self):
+        if self.reason is None:
+            return 'Invalid rule file'
+        return 'Invalid rule file: ' + self.reason
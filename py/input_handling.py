@@ -1,7 +1,11 @@
+import logging
 import re
 
+import pandas as pd
 import requests
 
+logger = logging.getLogger(__name__)
+
 
 def load_from_pubtator(pmid):
     """
@@ -24,10 +28,37 @@ def load_from_pubtator(pmid):
     if title is not None and abstract is not None:
         return title, abstract
     else:
-        print("Could not find requested information")
+        logger.error('Could not find requested information')
         raise Exception
 
 
+def read_input_pmids(input_file, chunksize=10000):
+    """
+    Read the PubMed IDs of the input file, reading only the PMID column in chunks.
+
+    :param input_file: (String) path to the input csv file.
+    :param chunksize: (int) number of rows read at once.
+    :return: list of unique PubMed IDs in order of appearance.
+    """
+    pmids = {}
+    for chunk in pd.read_csv(input_file, usecols=['PMID'], dtype={'PMID': str}, chunksize=chunksize):
+        pmids.update(dict.fromkeys(str(pmid) for pmid in chunk['PMID']))
+    return list(pmids)
+
+
+def read_input_sentences(input_file, chunksize=10000):
+    """
+    Stream the rows of the input file, reading it in chunks so that memory does not depend on the input size.
+
+    :param input_file: (String) path to the input csv file.
+    :param chunksize: (int) number of rows read at once.
+    :return: generator of (pmid, sentence) tuples.
+    """
+    for chunk in pd.read_csv(input_file, usecols=['PMID', 'Sentence'], dtype={'PMID': str}, chunksize=chunksize):
+        for pmid, sentence in zip(chunk['PMID'], chunk['Sentence']):
+            yield str(pmid), str(sentence)
+
+
 def preprocess_sentence(sentence):
     """
     Preprocess input sentence by removing undesired tokens and symbols.
@@ -0,0 +1,242 @@
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class Instrumentation:
+    """
+    Record the time spent in each stage of the pipeline, the number of calls of each stage and the outcome of the
+    extraction (e.g., exceptions raised by the modules).
+    Stages can be nested: the time of a stage does not include the time of the stages nested in it.
+    """
+
+    def __init__(self):
+        # Statistics of the relation extraction rules
+        self.rules = RuleStats()
+        self.reset()
+
+    def reset(self):
+        """
+        Discard all the recorded timings and counters.
+
+        :return: None
+        """
+        self.timings = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.outcomes = Counter()
+        self.rules.reset()
+        self.start_time = time.time()
+        # Stack of the running stages: [name, start, time spent in nested stages]
+        self._running = []
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block of code as a stage of the pipeline.
+
+        :param name: (String) name of the stage.
+        """
+        frame = [name, time.perf_counter(), 0.0]
+        self._running.append(frame)
+        try:
+            yield
+        finally:
+            self._running.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.timings[name] += elapsed - frame[2]
+            self.calls[name] += 1
+            if self._running:
+                self._running[-1][2] += elapsed
+
+    def timed_iter(self, name, iterable):
+        """
+        Time the production of the items of an iterable (e.g., a generator of parsed sentences) as a stage.
+
+        :param name: (String) name of the stage.
+        :param iterable: iterable to time.
+        :return: generator of the items of iterable.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, outcome, n=1):
+        """
+        Count an outcome of the pipeline.
+
+        :param outcome: (String) name of the outcome, e.g., the name of the exception raised.
+        :param n: (int) number of occurrences.
+        :return: None
+        """
+        self.outcomes[outcome] += n
+
+    def to_dict(self):
+        """
+        :return: (dict) {'elapsed': seconds since the start, 'stages': {name: {'seconds', 'calls'}}, 'outcomes':
+        {name: count}, 'rules': {rule name: statistics}}.
+        """
+        return {'elapsed': time.time() - self.start_time,
+                'stages': {name: {'seconds': self.timings[name], 'calls': self.calls[name]} for name in self.calls},
+                'outcomes': dict(self.outcomes), 'rules': self.rules.to_dict()}
+
+    def emit(self, stats_file=None):
+        """
+        Emit the recorded statistics as JSON.
+
+        :param stats_file: (String) path to the JSON file, atomically replaced at each call. If None, the statistics
+        are printed.
+        :return: None
+        """
+        if stats_file is None:
+            print(json.dumps(self.to_dict(), indent=2))
+            return
+        tmp_file = stats_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_file, stats_file)
+
+
+class RuleStats:
+    """
+    Per-rule statistics of the relation extraction rules: how often each rule is selected and matches, how many
+    components and output rows it yields, and the time spent matching it and extracting its components.
+    The statistics of previous runs (history) can be loaded to estimate the yield of the rules.
+    """
+
+    counters = ['selected', 'matched', 'matches', 'components', 'survived', 'rows']
+    timers = ['matcher_seconds', 'extract_seconds']
+
+    def __init__(self):
+        # Statistics of previous runs, {rule name: {counter or timer: value}}
+        self.history = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Discard all the recorded statistics, except the history.
+
+        :return: None
+        """
+        self.rules = {}
+
+    def _rule(self, rule_name):
+        stats = self.rules.get(rule_name)
+        if stats is None:
+            stats = dict.fromkeys(self.counters, 0)
+            stats.update(dict.fromkeys(self.timers, 0.0))
+            self.rules[rule_name] = stats
+        return stats
+
+    def count(self, rule_name, counter, n=1):
+        """
+        :param rule_name: (String) name of the rule.
+        :param counter: (String) one of RuleStats.counters.
+        :param n: (int) number of occurrences.
+        :return: None
+        """
+        self._rule(rule_name)[counter] += n
+
+    def add_time(self, rule_name, timer, seconds):
+        """
+        :param rule_name: (String) name of the rule.
+        :param timer: (String) one of RuleStats.timers.
+        :param seconds: (float) time to add.
+        :return: None
+        """
+        self._rule(rule_name)[timer] += seconds
+
+    def to_dict(self):
+        """
+        :return: (dict) {rule name: {counter or timer: value}}.
+        """
+        return {rule_name: dict(stats) for rule_name, stats in self.rules.items()}
+
+    def rule_yield(self, rule_name):
+        """
+        Estimate the fraction of selections of a rule that produce a component meeting the type constraints, over
+        the history and the current statistics. Rules never selected have yield 0.5.
+
+        :param rule_name: (String) name of the rule.
+        :return: (float) estimated yield.
+        """
+        selected = 0
+        survived = 0
+        for stats in (self.history.get(rule_name), self.rules.get(rule_name)):
+            if stats is not None:
+                selected += stats.get('selected', 0)
+                survived += stats.get('survived', 0)
+        return (survived + 1) / (selected + 2)
+
+    def load_history(self, history_file):
+        """
+        Load the statistics of previous runs, if the history file exists.
+
+        :param history_file: (String) path to the JSON history file, see save_history.
+        :return: None
+        """
+        if not os.path.exists(history_file):
+            return
+        with open(history_file, 'r') as f:
+            self.history = json.load(f)
+
+    def merged_history(self):
+        """
+        :return: (dict) history updated with the current statistics, {rule name: {counter or timer: value}}.
+        """
+        history = {rule_name: dict(stats) for rule_name, stats in self.history.items()}
+        for rule_name, stats in self.rules.items():
+            merged = history.setdefault(rule_name, {})
+            for key, value in stats.items():
+                merged[key] = merged.get(key, 0) + value
+        return history
+
+    def fold_into_history(self):
+        """
+        Add the current statistics to the history and discard them, e.g., when a new run starts, so that the
+        statistics of the new run are recorded on their own while the yield of the rules still accounts for the
+        previous runs.
+
+        :return: None
+        """
+        self.history = self.merged_history()
+        self.reset()
+
+    def save_history(self, history_file):
+        """
+        Atomically save the history updated with the current statistics.
+
+        :param history_file: (String) path to the JSON history file.
+        :return: None
+        """
+        history = self.merged_history()
+        tmp_file = history_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(history, f, indent=2)
+        os.replace(tmp_file, history_file)
+
+    def table(self):
+        """
+        Format the statistics as a table, rules sorted by output rows per millisecond spent on them.
+
+        :return: (String) table of the statistics.
+        """
+        def rows_per_ms(stats):
+            milliseconds = 1000 * (stats['matcher_seconds'] + stats['extract_seconds'])
+            return stats['rows'] / milliseconds if milliseconds > 0 else 0.0
+
+        width = max([len('rule')] + [len(rule_name) for rule_name in self.rules])
+        columns = self.counters + ['matcher_ms', 'extract_ms', 'rows/ms']
+        lines = [' '.join(['rule'.ljust(width)] + [column.rjust(11) for column in columns])]
+        for rule_name, stats in sorted(self.rules.items(), key=lambda item: rows_per_ms(item[1]), reverse=True):
+            values = [str(stats[counter]) for counter in self.counters]
+            values += ['%.1f' % (1000 * stats['matcher_seconds']), '%.1f' % (1000 * stats['extract_seconds']),
+                       '%.3f' % rows_per_ms(stats)]
+            lines.append(' '.join([rule_name.ljust(width)] + [value.rjust(11) for value in values]))
+        return '\n'.join(lines)
@@ -0,0 +1,270 @@
+# Multi-pattern matching of the PubTator mentions in the components extracted by the RE module
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc, Token
+
+# Mention sets smaller than this are matched with one substring test per mention
+min_automaton_size = 32
+# Maximum number of automata kept in memory (one per mention set, e.g., the genes of each PubMed ID)
+matcher_cache_size = 256
+
+# Automata built so far, {(id of the mention set, lower): (mention set, size, last mention, MentionMatcher)}
+_matchers = OrderedDict()
+
+# Per-Doc matches of the PhraseMentionIndex
+if not Doc.has_extension('mention_matches'):
+    Doc.set_extension('mention_matches', default=None)
+
+
+class MentionMatcher:
+    """
+    Aho-Corasick automaton over a set of mentions: all the mentions occurring in a text as substrings are found in a
+    single pass over the text, whatever the number of mentions.
+    """
+
+    def __init__(self, mentions, lower=False):
+        """
+        :param mentions: iterable(String) mentions to match, e.g., the keys of a dictionary of gene mentions.
+        :param lower: (Boolean) if True mentions and texts are compared lower-case.
+        """
+        self.mentions = list(mentions)
+        self.lower = lower
+        # Mentions occurring in every text
+        self.empty = []
+        # Trie of the mentions: transitions and ids of the mentions ending in each state
+        goto = [{}]
+        output = [[]]
+        for k, mention in enumerate(self.mentions):
+            key = mention.lower() if lower else mention
+            if not key:
+                self.empty.append(k)
+                continue
+            state = 0
+            for ch in key:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    output.append([])
+                state = next_state
+            output[state].append(k)
+        # Failure links (longest proper suffix that is a state of the trie) and output links (longest proper suffix
+        # where a mention ends), computed in breadth-first order
+        fail = [0] * len(goto)
+        output_link = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in goto[state].items():
+                queue.append(next_state)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[next_state] = goto[f].get(ch, 0)
+                suffix = fail[next_state]
+                output_link[next_state] = suffix if output[suffix] else output_link[suffix]
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+        self._output_link = output_link
+
+    def find(self, text):
+        """
+        :param text: (String) text to search.
+        :return: list(String) mentions occurring in the text, in the order of the mention set.
+        """
+        if self.lower:
+            text = text.lower()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        output_link = self._output_link
+        found = set(self.empty)
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            match = state if output[state] else output_link[state]
+            while match:
+                found.update(output[match])
+                match = output_link[match]
+        return [self.mentions[k] for k in sorted(found)]
+
+
+class MentionIndex(Mapping):
+    """
+    Read-only view of a mention dictionary ({mention: identifier}, e.g., the gene mentions of a PubMed ID) with the
+    lookups precomputed once for all the sentences using it: lower-case mentions and mention automata, built on
+    first use. It can be passed wherever the dictionary is expected.
+    """
+
+    def __init__(self, mentions):
+        """
+        :param mentions: (dict) mention dictionary, not modified while the index is used.
+        """
+        self.mentions = mentions
+        self.keys_list = list(mentions)
+        self.lower_keys = [mention.lower() for mention in self.keys_list]
+        # {lower: MentionMatcher}
+        self._automata = {}
+
+    def __getitem__(self, mention):
+        return self.mentions[mention]
+
+    def __contains__(self, mention):
+        return mention in self.mentions
+
+    def __iter__(self):
+        return iter(self.mentions)
+
+    def __reversed__(self):
+        return reversed(self.mentions)
+
+    def __len__(self):
+        return len(self.mentions)
+
+    def find(self, text, lower=False):
+        """
+        :param text: (String) text to search.
+        :param lower: (Boolean) if True mentions and text are compared lower-case.
+        :return: list(String) mentions occurring in the text, in the order of the mention dictionary.
+        """
+        if len(self.keys_list) < min_automaton_size:
+            if lower:
+                text = text.lower()
+                return [mention for mention, key in zip(self.keys_list, self.lower_keys) if key in text]
+            return [mention for mention in self.keys_list if mention in text]
+        automaton = self._automata.get(lower)
+        if automaton is None:
+            automaton = MentionMatcher(self.keys_list, lower)
+            self._automata[lower] = automaton
+        return automaton.find(text)
+
+
+def get_matcher(mentions, lower=False):
+    """
+    Get the automaton of a mention set, building it only if the set has not been seen or it has grown since.
+
+    :param mentions: (dict|list) mention set, e.g., the gene mentions of a PubMed ID or of all the processed ones.
+    Mention sets are expected to be only extended, never modified in place otherwise.
+    :param lower: (Boolean) if True mentions and texts are compared lower-case.
+    :return: (MentionMatcher) automaton of the mention set.
+    """
+    key = (id(mentions), lower)
+    last = next(reversed(mentions), None)
+    entry = _matchers.get(key)
+    if entry is not None and entry[0] is mentions and entry[1] == len(mentions) and entry[2] == last:
+        _matchers.move_to_end(key)
+        return entry[3]
+    matcher = MentionMatcher(mentions, lower)
+    # The mention set is referenced by the cache, so that its id cannot be reused by another object
+    _matchers[key] = (mentions, len(mentions), last, matcher)
+    _matchers.move_to_end(key)
+    if len(_matchers) > matcher_cache_size:
+        _matchers.popitem(last=False)
+    return matcher
+
+
+def find_mentions(mentions, text, lower=False):
+    """
+    Find the mentions occurring in a text, with the same result as [m for m in mentions if m in text] (or
+    m.lower() in text.lower() if lower is True).
+
+    :param mentions: (dict|list|MentionIndex) mention set, e.g., the gene mentions of a PubMed ID or of all the
+    processed ones. Automata of dictionaries and lists are cached by get_matcher, those of a MentionIndex by the index.
+    :param text: (String) text to search, e.g., a component extracted by the RE module.
+    :param lower: (Boolean) if True mentions and text are compared lower-case.
+    :return: list(String) mentions occurring in the text, in the order of the mention set.
+    """
+    if isinstance(mentions, MentionIndex):
+        return mentions.find(text, lower)
+    if len(mentions) < min_automaton_size:
+        if lower:
+            text = text.lower()
+            return [m for m in mentions if m.lower() in text]
+        return [m for m in mentions if m in text]
+    return get_matcher(mentions, lower).find(text)
+
+
+class PhraseMentionIndex:
+    """
+    Token-level alternative to the substring matching of the mentions: a spaCy PhraseMatcher, built from a mention
+    set, is run once over each sentence, and the mentions of a component are the matches within its tokens. Mentions
+    matching characters inside a token are not found, so no further check on the tokens of the component is needed.
+    """
+
+    def __init__(self, nlp, cache_size=matcher_cache_size):
+        """
+        :param nlp: (spacy.language) nlp object Spacy model, whose tokenizer is used to tokenize the mentions.
+        :param cache_size: (int) maximum number of PhraseMatchers kept in memory (one per mention set).
+        """
+        self.nlp = nlp
+        self.cache_size = cache_size
+        # {id of the mention set: (mention set, size, last mention, (PhraseMatcher, mentions, {mention: position}))}
+        self._matchers = OrderedDict()
+
+    def get_matcher(self, mentions):
+        """
+        Get the PhraseMatcher of a mention set, building it only if the set has not been seen or it has grown since.
+
+        :param mentions: (dict|list) mention set, expected to be only extended, never modified in place otherwise.
+        :return: (tuple) PhraseMatcher, list of the mentions and position of each mention in the list.
+        """
+        key = id(mentions)
+        last = next(reversed(mentions), None)
+        entry = self._matchers.get(key)
+        if entry is not None and entry[0] is mentions and entry[1] == len(mentions) and entry[2] == last:
+            self._matchers.move_to_end(key)
+            return entry[3]
+        mention_list = list(mentions)
+        matcher = PhraseMatcher(self.nlp.vocab)
+        for mention, pattern in zip(mention_list, self.nlp.tokenizer.pipe(mention_list)):
+            # Empty mentions cannot be matched on tokens
+            if len(pattern):
+                matcher.add(mention, [pattern])
+        compiled = (matcher, mention_list, {mention: k for k, mention in enumerate(mention_list)})
+        self._matchers[key] = (mentions, len(mentions), last, compiled)
+        self._matchers.move_to_end(key)
+        if len(self._matchers) > self.cache_size:
+            self._matchers.popitem(last=False)
+        return compiled
+
+    def sentence_matches(self, doc, mentions):
+        """
+        Match a mention set on a sentence. Matches are computed once per sentence and mention set, and stored in the
+        Doc extension 'mention_matches'.
+
+        :param doc: (spacy.tokens.doc.Doc) input sentence.
+        :param mentions: (dict|list) mention set.
+        :return: list of (position of the mention in the mention set, start token, end token) tuples.
+        """
+        compiled = self.get_matcher(mentions)
+        cache = doc._.mention_matches
+        if cache is None or cache['length'] != len(doc):
+            cache = {'length': len(doc), 'matches': {}}
+            doc._.mention_matches = cache
+        entry = cache['matches'].get(id(mentions))
+        if entry is None or entry[0] is not compiled:
+            matcher, _, positions = compiled
+            strings = self.nlp.vocab.strings
+            entry = (compiled, [(positions[strings[match_id]], start, end) for match_id, start, end in matcher(doc)])
+            cache['matches'][id(mentions)] = entry
+        return entry[1]
+
+    def find(self, component, mentions):
+        """
+        :param component: (spacy.tokens.span.Span) component extracted by the RE module, or a single token.
+        :param mentions: (dict|list) mention set.
+        :return: list(String) mentions matching tokens of the component, in the order of the mention set.
+        """
+        if isinstance(component, Token):
+            first, last = component.i, component.i + 1
+        else:
+            first, last = component.start, component.end
+        matches = self.sentence_matches(component.doc, mentions)
+        found = {k for k, start, end in matches if first <= start and end <= last}
+        mention_list = self.get_matcher(mentions)[1]
+        return [mention_list[k] for k in sorted(found)]
@@ -0,0 +1,133 @@
+import csv
+import hashlib
+import json
+import os
+
+# Columns of the output csv file
+header = ['PMID', 'geneMen', 'geneID', 'DOID', 'DOID_Name', 'DiseaseMention', 'DiseaseDetectedFrom', 'ExpressionLevel',
+          'SentenceType', 'Sample1', 'Sample2', 'Sentence']
+
+
+def row_key(row):
+    """
+    Compute a compact hash of an output row, used to detect duplicate rows. Values are normalized as they are
+    written in the csv file (None as empty string), so that rows read back from the output file share the same key.
+
+    :param row: (list) output row.
+    :return: (bytes) digest of the row.
+    """
+    values = tuple('' if value is None else str(value) for value in row)
+    return hashlib.blake2b(repr(values).encode('utf-8'), digest_size=16).digest()
+
+
+def truncate_partial_row(output_file):
+    """
+    Remove the last row of the output file if it was only partially written (i.e., interrupted run).
+
+    :param output_file: (String) path to the output csv file.
+    :return: None
+    """
+    with open(output_file, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        # Look backwards for the end of the last complete row
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+def load_checkpoint(checkpoint_file):
+    """
+    Load the checkpoint of a previous run.
+
+    :param checkpoint_file: (String) path to the checkpoint file.
+    :return: (dict) checkpoint {'input_file': path, 'offset': number of input rows processed, 'rows_written': number
+    of output rows, 'completed': True if the run ended} or None if the file does not exist.
+    """
+    if not os.path.exists(checkpoint_file):
+        return None
+    with open(checkpoint_file, 'r') as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint_file, checkpoint):
+    """
+    Atomically save the checkpoint of the current run.
+
+    :param checkpoint_file: (String) path to the checkpoint file.
+    :param checkpoint: (dict) checkpoint, see load_checkpoint.
+    :return: None
+    """
+    tmp_file = checkpoint_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_file, checkpoint_file)
+
+
+class ResultWriter:
+    """
+    Write the output rows to a csv file as soon as they are produced, discarding duplicate rows.
+    """
+
+    def __init__(self, output_file, append=False):
+        """
+        :param output_file: (String) path to the output csv file.
+        :param append: (Boolean) if True and the output file exists, keep its rows and append the new ones,
+        skipping the rows already written.
+        """
+        # Hashes of the rows already written
+        self.written = set()
+        # PubMed IDs with at least one row written
+        self.pmids_matched = set()
+        self.tot_matched = 0
+        if append and os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+            truncate_partial_row(output_file)
+            with open(output_file, 'r') as csvfile:
+                for row in csv.reader(csvfile):
+                    if row == header:
+                        continue
+                    self.written.add(row_key(row))
+                    self.pmids_matched.add(row[0])
+                    self.tot_matched += 1
+            self.csvfile = open(output_file, 'a')
+            self.csvwriter = csv.writer(self.csvfile)
+        else:
+            self.csvfile = open(output_file, 'w')
+            self.csvwriter = csv.writer(self.csvfile)
+            self.csvwriter.writerow(header)
+            self.csvfile.flush()
+
+    def write_row(self, row):
+        """
+        Write a row to the output file, unless the same row has already been written.
+
+        :param row: (list) output row, the first element is the PubMed ID.
+        :return: True if the row has been written, False if it was a duplicate.
+        """
+        key = row_key(row)
+        if key in self.written:
+            return False
+        self.written.add(key)
+        self.pmids_matched.add(row[0])
+        self.tot_matched += 1
+        self.csvwriter.writerow(row)
+        # Flush so that rows are not lost if the run is interrupted
+        self.csvfile.flush()
+        return True
+
+    def close(self):
+        self.csvfile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,247 @@
+# Local stand-in of the PubTator export endpoint, replaying BioC JSON documents, and checks of the fetcher against it
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from entity_detection import fetch_bioc_chunks, get_annotations_list_pmids
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """
+    Answer the POST requests of the fetcher ({"pmids": [...]}) with the BioC JSON documents of the requested pmids,
+    one per line, skipping the unknown pmids as PubTator does.
+    """
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        pmids = json.loads(body.decode('utf-8'))['pmids']
+        if server.status is not None:
+            self.send_error(server.status)
+        elif server.max_pmids is not None and len(pmids) > server.max_pmids:
+            self.send_error(413)
+        elif server.fail_pmids.intersection(pmids):
+            self.send_error(500)
+        else:
+            content = b''.join(server.documents[pmid] + b'\n' for pmid in pmids if pmid in server.documents)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logging.getLogger(__name__).debug(format, *args)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """
+    HTTP server replaying BioC JSON documents, with optional failures: a fixed status for every request (e.g., 500
+    for an outage), 413 for the requests of more than max_pmids pmids, and 500 for the requests of the fail_pmids.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, documents, port=0, status=None, max_pmids=None, fail_pmids=()):
+        """
+        :param documents: (dict) {pmid: BioC JSON document (dict)}.
+        :param port: (int) port to listen on, 0 for any free port.
+        :param status: (int) HTTP status of every response, None to answer normally.
+        :param max_pmids: (int) maximum number of pmids of a request, None for no limit.
+        :param fail_pmids: iterable(String) pmids whose requests fail.
+        """
+        super().__init__(('127.0.0.1', port), ReplayHandler)
+        self.documents = {pmid: json.dumps(document).encode('utf-8') for pmid, document in documents.items()}
+        self.status = status
+        self.max_pmids = max_pmids
+        self.fail_pmids = set(fail_pmids)
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    def start(self):
+        """
+        Serve the requests in a background thread.
+
+        :return: (ReplayServer) the server.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        :return: None
+        """
+        self.shutdown()
+        self.server_close()
+
+
+def load_documents(jsonl_file):
+    """
+    :param jsonl_file: (String) path to a file of BioC JSON documents, one per line.
+    :return: (dict) {pmid: BioC JSON document (dict)}.
+    """
+    documents = {}
+    with open(jsonl_file, 'r') as f:
+        for line in f:
+            if line.strip():
+                document = json.loads(line)
+                documents[document['id']] = document
+    return documents
+
+
+def make_documents(n):
+    """
+    :param n: (int) number of documents.
+    :return: (dict) {pmid: BioC JSON document (dict)} of n documents with a title and an abstract without annotations.
+    """
+    return {str(pmid): {'id': str(pmid), 'passages': [
+        {'infons': {'type': 'title'}, 'text': f'Title of {pmid}', 'annotations': []},
+        {'infons': {'type': 'abstract'}, 'text': f'Abstract of {pmid}', 'annotations': []}]}
+        for pmid in range(10000000, 10000000 + n)}
+
+
+def run_fetch(server, pmids, **kwargs):
+    """
+    :param server: (ReplayServer) server the pmids are requested to, or None for an unreachable endpoint.
+    :param pmids: List(String) List of PubMed IDs
+    :param kwargs: options of fetch_bioc_chunks.
+    :return: list(String), int, float pmids retrieved, requests received by the server and seconds elapsed.
+    """
+    if server is None:
+        # Port of a server that has been closed
+        closed = ReplayServer({})
+        url = closed.url
+        closed.server_close()
+    else:
+        url = server.start().url
+    start_time = time.perf_counter()
+    try:
+        retrieved = [document['id'] for _, documents in fetch_bioc_chunks(pmids, url=url, **kwargs)
+                     for document in documents]
+    finally:
+        if server is not None:
+            server.stop()
+    return retrieved, (server.request_count if server is not None else 0), time.perf_counter() - start_time
+
+
+def check_cache(documents):
+    """
+    Check the annotation cache: a pmid unknown to PubTator is not requested again, a pmid whose request failed is.
+
+    :param documents: (dict) {pmid: BioC JSON document (dict)}.
+    :return: (Boolean) True if the check succeeds.
+    """
+    pmids = list(documents)
+    requested = pmids + ['0']
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_path = os.path.join(cache_dir, 'annotations.sqlite')
+        # (server, expected number of requests, None if not checked)
+        runs = [(ReplayServer(documents, fail_pmids=pmids[:1]), None), (ReplayServer(documents), 1),
+                (ReplayServer(documents), 0)]
+        ok = True
+        for k, (server, expected_requests) in enumerate(runs, start=1):
+            server.start()
+            try:
+                annotations, _ = get_annotations_list_pmids(requested, cache_path=cache_path, url=server.url,
+                                                            requests_per_second=None, max_retries=0)
+            finally:
+                server.stop()
+            expected = pmids[1:] if k == 1 else pmids
+            run_ok = sorted(annotations) == sorted(expected) and expected_requests in (None, server.request_count)
+            ok = ok and run_ok
+            print(f'cache, run {k}: {len(annotations)} of {len(requested)} pmids annotated, '
+                  f'{server.request_count} requests {"OK" if run_ok else "FAILED"}')
+    return ok
+
+
+def check(args):
+    """
+    Check the fetcher against the replay server: success, partial failure (pmids whose requests fail, lists too
+    large), total failure (every request fails), unreachable endpoint and annotation cache.
+
+    :param args: (argparse.Namespace) command line arguments.
+    :return: (int) exit status, 1 if any check fails.
+    """
+    documents = load_documents(args.documents) if args.documents else make_documents(args.n)
+    pmids = list(documents)
+    options = {'chunk_size': args.chunk_size, 'max_workers': 3, 'requests_per_second': None, 'timeout': 5,
+               'max_retries': 3, 'backoff': 0.01, 'max_failed_requests': 100, 'max_failed_lists': 20}
+    fail_pmids = set(pmids[1::max(1, len(pmids) // 3)][:3])
+    n_lists = -(-len(pmids) // args.chunk_size)
+    budget = options['max_failed_requests']
+    # (name, server, requested pmids, expected pmids, maximum number of requests)
+    checks = [('success', ReplayServer(documents), pmids, pmids, n_lists),
+              ('unknown pmids', ReplayServer(documents), pmids[:-1] + ['0'] + pmids[-1:], pmids,
+               -(-(len(pmids) + 1) // args.chunk_size)),
+              ('failing pmids', ReplayServer(documents, fail_pmids=fail_pmids), pmids,
+               [pmid for pmid in pmids if pmid not in fail_pmids], n_lists + budget),
+              ('lists too large', ReplayServer(documents, max_pmids=max(1, args.chunk_size // 3)), pmids, pmids,
+               n_lists + budget),
+              ('outage', ReplayServer(documents, status=500), pmids, [], budget),
+              ('unreachable', None, pmids, [], 0)]
+    failed = 0
+    for name, server, requested, expected, max_requests in checks:
+        retrieved, request_count, seconds = run_fetch(server, requested, **options)
+        ok = retrieved == expected and request_count <= max_requests
+        failed += not ok
+        print(f'{name}: {len(retrieved)} of {len(requested)} pmids retrieved, {request_count} requests, '
+              f'{seconds:.2f}s {"OK" if ok else "FAILED"}')
+    failed += not check_cache(documents)
+    return 1 if failed else 0
+
+
+def serve(args):
+    """
+    Serve the documents until interrupted.
+
+    :param args: (argparse.Namespace) command line arguments.
+    :return: (int) exit status.
+    """
+    server = ReplayServer(load_documents(args.documents), port=args.port, status=args.status,
+                          max_pmids=args.max_pmids, fail_pmids=args.fail_pmids)
+    print(f'Replaying {len(server.documents)} documents at {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in of the PubTator export endpoint')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='replay the BioC JSON documents of a file')
+    serve_parser.add_argument('documents', help='path to a file of BioC JSON documents, one per line')
+    serve_parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    serve_parser.add_argument('--status', type=int, default=None, help='HTTP status of every response')
+    serve_parser.add_argument('--max-pmids', type=int, default=None,
+                              help='answer 413 to the requests of more pmids than this')
+    serve_parser.add_argument('--fail-pmids', nargs='*', default=[], help='answer 500 to the requests of these pmids')
+    serve_parser.set_defaults(func=serve)
+    check_parser = subparsers.add_parser('check', help='check the fetcher against the replay server')
+    check_parser.add_argument('documents', nargs='?', default=None,
+                              help='path to a file of BioC JSON documents, one per line (synthetic if not given)')
+    check_parser.add_argument('--n', type=int, default=100, help='number of synthetic documents')
+    check_parser.add_argument('--chunk-size', type=int, default=16, help='maximum number of pmids for each request')
+    check_parser.set_defaults(func=check)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,960 +1,296 @@
+import logging
+import os
+import time
+from bisect import bisect_left
 from spacy.matcher import DependencyMatcher
-from exceptions import MatchNotFound
-
-# Triggers for sentence form
-# Compare words triggers
-cmp_triggers = ["than", "versus", "vs.", "compared", "comparison"]
-# Triggers for pattern rule selection
-cmp1_triggers = ["high", "low", "higher", "lower"]
-cmp2_triggers = ["increase", "decrease", "express", "silence", "reduce", "elevate", "change", "regulate",
-                 "overexpresse", "over-expresse", "over-expressed", "underexpresse", "under-expressed", "unchanged", "up-regulate", "upregulate", "down-regulate",
-                 "downregulate", "elevated", "normalize", 'underexpresse', 'under-expressed', 'amplify', 'amplified/over-expressed',
-                 'coexpressed', 'coexpresse', 'downexpressed', 'downexpresse', 'lower-expressed', 'lower-expresse']
-cmp12B_triggers = ["high", "low", "higher", "lower", "increase", "decrease", "express", "silence", "reduce", "elevate",
-                   "change", "regulate", "overexpresse", "over-expresse", "over-expressed", "underexpresse", "under-expressed",
-                   "unchanged", "up-regulate", "upregulate", "down-regulate", "downregulate", "elevated", "normalize",
-                   'underexpresse', 'under-expressed', 'amplify', 'expressed', 'express', 'expressed',
-                   'amplified/over-expressed', 'coexpressed', 'coexpresse', 'downexpressed', 'downexpresse',
-                   'lower-expressed', 'lower-expresse', 'frequently']
-cmp3_triggers = ['find', 'note', 'detect', 'observe', 'discover', 'occurred', 'occur', 'appear', 'show', 'identify',
-                 'significant', 'reveal', 'demonstrate', 'appear', 'identify', 'show', 'prove', 'know', 'report',
-                 'suggest', 'document', 'tend', 'determine', 'examine', 'confirm', 'validate', 'indicate']
+from spacy.tokens import Doc
+from exceptions import InvalidRuleFile, MatchNotFound
+from rule_loader import load_rule_file
+from rule_matcher import CompiledDependencyMatcher
+
+logger = logging.getLogger(__name__)
+
+# The rules (patterns and trigger lexicons) are defined in a rule file, see rule_loader and rules/dexter_rules.json.
+# The module-level names below are bound by use_rules.
+# Lexicons of the rule file used by rule selection and component extraction
+required_lexicons = ['cmp_triggers', 'cmp1_triggers', 'cmp2_triggers', 'cmp12B_triggers', 'cmp3_triggers']
+# Patterns of the rule file selected by find_rule and find_rule_b
+required_patterns = ['cmp1_n0', 'cmp1_n1', 'cmp2_n0', 'cmp2_n1', 'cmp3_n0_amod', 'cmp3_n0_xcomp_n0', 'cmp3_n1',
+                     'cmp3_n0_xcomp_SI', 'than_1_SI', 'than_1_CE1', 'vs_1_SI', 'vs_1_CE1', 'than_2_SI', 'than_2_CE1',
+                     'vs_2', 'compare_1_SI', 'compare_1_CE1', 'compare_2', 'compare_3', 'subj_exp', 'conj_exp',
+                     'appos_exp', 'subj_fnd', 'conj_fnd', 'expressionIn_1', 'expressionIn_2', 'foundIn_1', 'foundIn_2',
+                     'RBfoundIn_xcomp', 'EXPfoundIn_xcomp_1', 'EXPfoundIn_xcomp_2']
+
+# Dependencies of the expressed aspect in TypeB sentences
+subj_deps = ['nsubjpass', 'nsubj', 'dep', 'dobj', 'acl']
+# Tags of adjectival level indicators
+adj_tags = frozenset(['JJ', 'JJR', 'VBN', 'VBD'])
 
 # Component to extract
 component_keys = ["scale_indicator", "compared_aspect", "compared_entity_1", "compared_entity_2", "n0"]
 
-# ---
-# TYPE A PATTERNS
-# ---
-# Sentence-form based patterns (starter rules)
-# n0: both CE1 and CE2 depends on the scale_indicator
-# n1: CE1 depends on the scale_indicator, CE2 depends on the compared_aspect
-cmp1_n0 = [
-    # Cond_1: {word:/(higher|lower|high|low)/}=N0
-    # scale indicator: high|higher|low|lower
-    {
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": ["high", "low"]}}
-    },
-    # Cond_2: {}=N0>nsubj {}=N1
-    # scale_indicator -> subject (CA)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": "nsubj"},
-    },
-    # Cond_3: {}=N0>/nmod:in/ {}=N2
-    # scale_indicator -[nmod]-> compared_entity_1
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl", 'conj']}, "ORTH": {"NOT_IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_3 part_b: case:in
-    # compared_entity_1 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-]
-cmp1_n1 = [
-    # Cond_1: {word:/(higher|lower|high|low)/}=N0
-    # scale indicator: high|higher|low|lower
-    {
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": ["high", "low"]}}
-    },
-    # Cond_2: {}=N0>nsubj {}=N1
-    # scale_indicator -> subject (CA)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": "nsubj"},
-    },
-    # Cond_3: {}=N1>/nmod:in/ {}=N2
-    # compared_aspect -[nmod]-> compared_entity_1
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl"]}, "ORTH": {"NOT_IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_3 part_b: case:in
-    # compared_entity_1 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "of"]}},
-    },
-]
-cmp2_n0 = [
-    # Cond_1: {lemma:/.*(increase|decrease|express|silence|reduce|elevate|change|regulate)/}=N0
-    # scale indicator: increase|decrease|...
-    {
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp2_triggers}}
-    },
-    # Cond_2: {}=N0>nsubjpass|nsubj {}=N1
-    # scale_indicator -> subject (CA)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "nsubj", "dobj"]}},
-    },
-    # Cond_3: {}=N0>/nmod:in/ {}=N2
-    # scale_indicator -[nmod|advcl|dobj]-> compared_entity_1
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl", "dobj"]}, "ORTH": {"NOT_IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_3 part_b: case:in
-    # compared_entity_1 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    }
-]
-cmp2_n1 = [
-    # Cond_1: {lemma:/.*(increase|decrease|express|silence|reduce|elevate|change|regulate)/}=N0
-    # scale indicator: increase|decrease|...
-    {
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp2_triggers}}
-    },
-    # Cond_2: {}=N0>nsubjpass {}=N1
-    # scale_indicator -> subject (CA)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "nsubj", "dobj"]}},
-    },
-    # Cond_3: {}=N1>/nmod:in/ {}=N2
-    # compared_aspect -[nmod|advcl|dobj]-> compared_entity_1
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl", "dobj"]}, "ORTH": {"NOT_IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_3 part_b: case:in
-    # compared_entity_1 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    }
-]
-# SI is amod dep on compared_aspect
-cmp3_n0_amod = [
-    # Cond_1: {lemma:/.*(find|note|detect|observe|discover|occurred|occur)/}=N0
-    # n0: found|noted|observed|...
-    {
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp3_triggers}}
-    },
-    # Cond_2: {}=N0</(nsubjpass|dobj)/{}=N1
-    # n0 -[nsubjpass|dobj]-> compared_aspect
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "dobj", "nsubj"]}}
-    },
-    # Cond_3: {}=N0 >/nmod:in/ {}=N2
-    # n0 -[nmod]-> compared_entity_1
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": "nmod", "ORTH": {"NOT_IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_3 part_b: case:in
-    # compared_entity_1 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-    # Cond_5|6 {}=N1 >amod{tag:/(JJ|JJR|VBN)/}=N4
-    # compared_aspect > scale_indicator
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">>",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"DEP": "amod", "TAG": {"IN": ["JJ", "JJR", "VBN", "VBD"]}},
-    }
-]
-# SI is xcomp dep on compared_aspect, all the rest depends on cmp3 trig
-cmp3_n0_xcomp_n0 = [
-    # Cond_1: {lemma:/.*(find|note|detect|observe|discover|occurred|occur)/}=N0
-    # n0: found|noted|observed|...
-    {
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp3_triggers}}
-    },
-    # Cond_2: {}=N0</(nsubjpass|dobj)/{}=N1
-    # n0 -[nsubjpass|dobj]-> compared_aspect
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "dobj", "nsubj"]}}
-    },
-    # Cond_5|6 {}=N1 >amod{tag:/(JJ|JJR|VBN)/}=N4
-    # compared_aspect > scale_indicator
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["xcomp", "acl"]}, "TAG": {"IN": ["JJ", "JJR", "VBN", "VBD"]}},
-    },
-    # Cond_3: {}=N0 >/nmod:in/ {}=N2
-    # n0 -[nmod]-> compared_entity_1
-    {
-        "LEFT_ID": "scale_indicator",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": "nmod", "ORTH": {"NOT_IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_3 part_b: case:in
-    # compared_entity_1 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    }
-]
-# SI is xcomp dep on compared_aspect, all the rest depends on SI
-cmp3_n0_xcomp_SI = [
-    # Cond_1: {lemma:/.*(find|note|detect|observe|discover|occurred|occur)/}=N0
-    # n0: found|noted|observed|...
-    {
-        "RIGHT_ID": "n1",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp3_triggers}}
-    },
-    # Cond_2: {}=N0</(nsubjpass|dobj)/{}=N1
-    # n0 -[nsubjpass|dobj]-> compared_aspect
-    {
-        "LEFT_ID": "n1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "dobj", "nsubj"]}}
-    },
-    # Cond_5|6 {}=N1 >amod{tag:/(JJ|JJR|VBN)/}=N4
-    # compared_aspect > scale_indicator
-    {
-        "LEFT_ID": "n1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["ccomp", "xcomp", "acl"]}, "TAG": {"IN": ["JJ", "JJR", "VBN", "VBD"]}},
-    },
-    # Cond_3: {}=N0 >/nmod:in/ {}=N2
-    # n0 -[nmod]-> compared_entity_1
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": "nmod", "ORTH": {"NOT_IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_3 part_b: case:in
-    # compared_entity_1 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    }
-]
-cmp3_n1 = [
-    # Cond_1: {lemma:/.*(find|note|detect|observe|discover|occurred|occur)/}=N0
-    # found_in: found|noted|observed|...
-    {
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp3_triggers}}
-    },
-    # Cond_2: {}=N0</(nsubjpass|dobj)/{}=N1
-    # found_in -[nsubjpass|dobj]-> compared_aspect
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "dobj", "nsubj"]}}
-    },
-    # Cond_3: {}=N0 >/nmod:in/ {}=N2
-    # compared_aspect -[nmod]-> compared_entity_1
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": "nmod", "ORTH": {"NOT_IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_3 part_b: case:in
-    # compared_entity_1 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-    # Cond_5|6 {}=N1 >amod{tag:/(JJ|JJR|VBN)/}=N4
-    # compared_aspect > scale_indicator
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">>",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"DEP": "amod", "TAG": {"IN": ["JJ", "JJR", "VBN", "VBD"]}},
-    }
-]
-
-# ---
-# Comparison-word based patterns (cmp_rules)
-# than + in
-# CE2 depends on SI
-than_1_SI = [
-    # Cond_4: {}=N2 !>/case/ {word:than}
-    # not compared_entity_1 -[case]-> than
-    {
-        "LEFT_ID": "case_in_1",
-        "REL_OP": ";",
-        "RIGHT_ID": "case_than_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": "than", "OP": "!"},
-    },
-    # Cond_5: {}=N0>/nmod:in/({}=N3 > /case/{word:than})
-    # scale_indicator -[nmod|advcl]-> compared_entity_2
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl", "dep"]}},
-    },
-    # Cond_5b: case:in
-    # compared_entity_2 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_in_2",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-    # Cond_5c: case:than
-    # compared_entity_2 -[case]-> than
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_than_2",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": "than"},
-    }
-]
-# CE2 depends on CE1
-than_1_CE1 = [
-    # Cond_4: {}=N2 !>/case/ {word:than}
-    # not compared_entity_1 -[case]-> than
-    {
-        "LEFT_ID": "case_in_1",
-        "REL_OP": ";",
-        "RIGHT_ID": "case_than_1",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": "than", "OP": "!"},
-    },
-    # Cond_5: {}=N0>/nmod:in/({}=N3 > /case/{word:than})
-    # scale_indicator -[nmod|advcl]-> compared_entity_2
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl", "dep"]}},
-    },
-    # Cond_5b: case:in
-    # compared_entity_2 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_in_2",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-    # Cond_5c: case:than
-    # compared_entity_2 -[case]-> than
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_than_2",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": "than"},
-    }
-]
-# versus + in
-# CE2 depends on SI
-vs_1_SI = [
-    # Cond_4: {}=N2 !>/cc/ {word:(versus|vs.)}
-    # not case_in_1 ; versus_1
-    {
-        "LEFT_ID": "case_in_1",
-        "REL_OP": ";",
-        "RIGHT_ID": "versus_1",
-        "RIGHT_ATTRS": {"ORTH": {"IN": ["versus", "vs."]}, "OP": "!"},
-    },
-    # Cond_5: {}=N0>/nmod:in/({}=N3 > /case/{word:(versus|vs.)})
-    # scale_indicator -[nmod|advcl]-> compared_entity_2
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl", "dep"]}},
-    },
-    # Cond_5b: case:in
-    # compared_entity_2 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_in_2",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-    # Cond_5c: cc:{word:(versus|vs.)}
-    # case_in_2 ; versus_2
-    {
-        "LEFT_ID": "case_in_2",
-        "REL_OP": ";",
-        "RIGHT_ID": "versus_2",
-        "RIGHT_ATTRS": {"ORTH": {"IN": ["versus", "vs."]}},
-    }
-]
-# CE2 depends on CE1
-vs_1_CE1 = [
-    # Cond_4: {}=N2 !>/cc/ {word:(versus|vs.)}
-    # not case_in_1 ; versus_1
-    {
-        "LEFT_ID": "case_in_1",
-        "REL_OP": ";",
-        "RIGHT_ID": "versus_1",
-        "RIGHT_ATTRS": {"ORTH": {"IN": ["versus", "vs."]}, "OP": "!"},
-    },
-    # Cond_5: {}=N0>/nmod:in/({}=N3 > /case/{word:(versus|vs.)})
-    # scale_indicator -[nmod|advcl]-> compared_entity_2
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl", "dep"]}},
-    },
-    # Cond_5b: case:in
-    # compared_entity_2 -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_in_2",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-    # Cond_5c: cc:{word:(versus|vs.)}
-    # case_in_2 ; versus_2
-    {
-        "LEFT_ID": "case_in_2",
-        "REL_OP": ";",
-        "RIGHT_ID": "versus_2",
-        "RIGHT_ATTRS": {"ORTH": {"IN": ["versus", "vs."]}},
-    }
-]
-# than|versus without "in"
-# CE2 depends on SI
-than_2_SI = [
-    # Cond_4: {}=N0>/nmod:in/({}=N3 > /case/{word:(than|versus|vs.)})
-    # scale_indicator -[nmod]-> compared_entity_2
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dep"]}},
-    },
-    # Cond_5b: case:than|versus|vs.
-    # compared_entity_2 -[case]-> (than|versus|vs.)
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_cmp_2",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["than", "versus", "vs."]}},
-    },
-]
-# CE2 depends on CE1
-than_2_CE1 = [
-    # Cond_4: {}=N0>/nmod:in/({}=N3 > /case/{word:(than|versus|vs.)})
-    # scale_indicator -[nmod]-> compared_entity_2
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dep"]}},
-    },
-    # Cond_5b: case:than|versus|vs.
-    # compared_entity_2 -[case]-> (than|versus|vs.)
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_cmp_2",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["than", "versus", "vs."]}},
-    },
-]
-# versus with dep "cc"
-# CE2 depends on CE1
-vs_2 = [
-    # Cond_4: {}=N0>/nmod:in/({}=N3 > /case/{word:(versus|vs.)})
-    # compared_entity_1 -[conj]-> compared_entity_2
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": "conj"},
-    },
-    # Cond_5b: case:than|versus|vs.
-    # compared_entity_1 -[cc]-> versus|vs.
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">",
-        "RIGHT_ID": "case_cmp_2",
-        "RIGHT_ATTRS": {"DEP": "cc", "ORTH": {"IN": ["versus", "vs."]}},
-    },
-]
-# compare_1: both CEs depends on SI
-compare_1_SI = [
-    # Cond_4: {}=N0 </(advcl|nmod):(compared_to|compared_with)/ {}=N3
-    # scale_indicator -[advcl|nmod]-> compared_entity_2
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["advcl", "nmod"]}},
-    },
-    # Cond_4b: case:compared|comparison
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_compared",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["case", "dep"]}, "ORTH": {"IN": ["compared", "comparison","Compared", "Comparison"]}},
-    },
-]
-# compare_1_CE1: CE2 depens on CE1
-compare_1_CE1 = [
-    # Cond_4: {}=N0 </(advcl|nmod):(compared_to|compared_with)/ {}=N3
-    # scale_indicator -[advcl|nmod]-> compared_entity_2
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["advcl", "nmod"]}},
-    },
-    # Cond_4b: case:compared|comparison
-    {
-        "LEFT_ID": "compared_entity_2",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_compared",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["case", "dep"]}, "ORTH": {"IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-]
-# compare_2: SI->compared|comparison->CE2
-compare_2 = [
-    # Cond_4: {}=N0 /xcomp/ {word:compared}
-    # scale_indicator -[xcomp|advcl|nmod|dep|prep]-> case_compared
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_compared",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["xcomp", "advcl", "nmod", "dep", "prep"]},
-                        "ORTH": {"IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_4b: case_compared -[nmod]-> compared_entity_2
-    {
-        "LEFT_ID": "case_compared",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": "nmod"},
-    },
-]
-# compared_3 : CE1->compared->CE2
-compare_3 = [
-    # Cond_4: {}=N2 </(advcl|nmod):(compared_to|compared_with)/ {}=N3
-    # compared_entity_1 -[advcl|nmod]-> case_compared
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_compared",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["advcl", "nmod", "dep", "acl"]},
-                        "ORTH": {"IN": ["compared", "comparison", "Compared", "Comparison"]}},
-    },
-    # Cond_4b: case_compared -[nmod]|advcl-> compared_entity_2
-    {
-        "LEFT_ID": "case_compared",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_2",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "advcl"]}},
-    },
-
-]
-
-# ---
-# TYPE B PATTERNS
-# ---
-# Sentence-form based patterns for retrieving EA (starter rules)
-# EA is the subject/acl of the sentence and depends on level indicator
-subj_exp = [
-    # Cond_1: {lemma:/cmp2_triggers + cmp1_triggers/}=N0
-    # level indicator: cmp2_triggers
-    {
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp12B_triggers}}
-    },
-    # Cond_2: {}=N0>nsubjpass {}=N1
-    # level_indicator (LI) -[nsubjpass]-> expressed_aspect (EA)
-    {
-        "LEFT_ID": "scale_indicator",
-        "REL_OP": ">",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "nsubj", "dep", "dobj", "acl"]}},
-    }
-]
-# EA is linked to level indicator by a path subj-conj
-conj_exp = [
-    # Cond_1: {lemma:/cmp2_triggers + cmp1_triggers/}=N0
-    # level indicator: cmp2_triggers
-    {
-        "RIGHT_ID": "conj_clause",
-        "RIGHT_ATTRS": {}
-    },
-    # Cond_0a: {}=N0< conj {}=N3
-    # level_indicator (LI) -[conj]-> conjunction
-    {
-        "LEFT_ID": "conj_clause",
-        "REL_OP": ">>",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp12B_triggers}, "DEP": {"IN": ["conj", "acl", "dep"]}}
-    },
-    # Cond_0b: {}=N3> nsubj|nsubjpass {}=N4
-    # conjunction -[nsubj|nsubjpass]-> expressed_aspect
-    {
-        "LEFT_ID": "conj_clause",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "nsubj", "dobj"]}},
-    },
-]
-# EA is appos depending on head of level indicator
-appos_exp = [
-    # Cond_1: {lemma:/cmp2_triggers + cmp1_triggers/}=N0
-    # level indicator: cmp2_triggers
-    {
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {}
-    },
-    # Cond_0b: {}=N3> nsubj|nsubjpass {}=N4
-    # conjunction -[nsubj|nsubjpass]-> expressed_aspect
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">",
-        "RIGHT_ID": "conj_clause",
-        "RIGHT_ATTRS": {"DEP": "appos"},
-    },
-    # Cond_0a: {}=N0< conj {}=N3
-    # level_indicator (LI) -[conj]-> conjunction
-    {
-        "LEFT_ID": "conj_clause",
-        "REL_OP": ">",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp12B_triggers}, "DEP": {"IN": ["conj", "acl"]}}
-    }
-]
-# EA is the subject/dobj/acl of the sentence and depends on n0
-subj_fnd = [
-    # Cond_1: {lemma:/cmp3_triggers/}=N0
-    # n0: cmp3_triggers
-    {
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp3_triggers}}
-    },
-    # Cond_2: {}=N0>nsubjpass|nsubj {}=N1
-    # n0 -[nsubjpass|nsubj]-> expressed_aspect (EA)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubj", "nsubjpass", "dep", "acl", "dobj"]}},
-    }
-]
-# EA is linked to n0 by a path subj-conj
-conj_fnd = [
-    # Cond_1: {lemma:/cmp2_triggers + cmp1_triggers/}=N0
-    # level indicator: cmp2_triggers
-    {
-        "RIGHT_ID": "conj_clause",
-        "RIGHT_ATTRS": {}
-    },
-    # Cond_0: {}=N0< conj {}=N3
-    # level_indicator (LI) -[conj]-> conjunction
-    {
-        "LEFT_ID": "conj_clause",
-        "REL_OP": ">",
-        "RIGHT_ID": "n0",
-        "RIGHT_ATTRS": {"LEMMA": {"IN": cmp3_triggers}, "DEP": "conj"}
-    },
-    # Cond_0b: {}=N3> nsubj|nsubjpass {}=N4
-    # conjunction -[nsubj|nsubjpass]-> expressed_aspect
-    {
-        "LEFT_ID": "conj_clause",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_aspect",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nsubjpass", "nsubj"]}},
-    },
-]
-
-# ---
-# Patterns to retrieve express_location (cmp_rules)
-# express_location depends on level_indicator
-expressionIn_1 = [
-    # Cond_3: {}=N0>/nmod:in/ {}=N2
-    # level_indicator -[nmod]-> expression_location (EL)
-    {
-        "LEFT_ID": "scale_indicator",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dobj"]}},
-    },
-    # Cond_3 part_b: case:in
-    # expression_location -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    }
-]
-# express_location depends on expressed_aspect
-expressionIn_2 = [
-    # Cond_3: {}=N1>/nmod:in/ {}=N2
-    # expressed_aspect -[nmod]-> expression_location (EL)
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dobj"]}},
-    },
-    # Cond_3 part_b: case:in
-    # expression_location -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    }
-]
-# express_location depends on n0, LI dep 'amod' on n0
-foundIn_1 = [
-    # Cond_3: {}=N0>/nmod:in/ {}=N2
-    # n0 -[nmod]-> expression_location (EL)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dobj"]}},
-    },
-    # Cond_3 part_b: case:in
-    # expression_location -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-    # Cond_4: {}=N1 >amod {tag:/(JJ|JJR|VBN)/}=N3
-    # expressed_aspect -[amod]-> level_indicator
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"DEP": "amod", "TAG": {"IN": ['JJ', 'JJR', 'VBN', 'VBD']}},
-    }
-]
-# express_location depends on expressed_aspect, LI dep 'amod' on n0
-foundIn_2 = [
-    # Cond_3: {}=N1>/nmod:in/ {}=N2
-    # expressed_aspect -[nmod]-> expression_location (EL)
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dobj"]}},
-    },
-    # Cond_3 part_b: case:in
-    # expression_location -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-    # Cond_4: {}=N1 >amod {tag:/(JJ|JJR|VBN)/}=N3
-    # expressed_aspect -[amod]-> level_indicator
-    {
-        "LEFT_ID": "compared_aspect",
-        "REL_OP": ">",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"DEP": "amod", "TAG": {"IN": ['JJ', 'JJR', 'VBN', 'VBD']}},
-    }
-]
-# level_indicator is xcomp, expression_location depends on level_indicator
-EXPfoundIn_xcomp_1 = [
-    # Cond_4: {}=N0>/xcomp|conj/ {}=N3
-    # n0 -[xcomp|conj]-> level_indicator (LI)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["xcomp", "ccomp", "advcl"]}, "TAG": {"IN": ['JJ', 'JJR', 'VBN', 'VBD']}},
-    },
-    # Cond_3: {}=N1>/nmod:in/ {}=N2
-    # expressed_aspect -[nmod]-> expression_location (EL)
-    {
-        "LEFT_ID": "scale_indicator",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dobj"]}},
-    },
-    # Cond_3 part_b: case:in
-    # expression_location -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-]
-# level_indicator is xcomp, expression_location depends on n0
-EXPfoundIn_xcomp_2 = [
-    # Cond_4: {}=N0>/xcomp|conj/ {}=N3
-    # n0 -[xcomp|conj]-> level_indicator (LI)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["xcomp", "ccomp", "advcl"]}, "TAG": {"IN": ['JJ', 'JJR', 'VBN', 'VBD']}},
-    },
-    # Cond_3: {}=N1>/nmod:in/ {}=N2
-    # expressed_aspect -[nmod]-> expression_location (EL)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dobj"]}},
-    },
-    # Cond_3 part_b: case:in
-    # expression_location -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-]
-# level_indicator is xcomp, expression_location depends on level_indicator
-RBfoundIn_xcomp = [
-    # Cond_4: {}=N0>/xcomp|conj/ {}=N3
-    # n0 -[xcomp|conj]-> level_indicator (LI)
-    {
-        "LEFT_ID": "n0",
-        "REL_OP": ">",
-        "RIGHT_ID": "scale_indicator",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["xcomp", "ccomp"]}, "TAG": "RB"},
-    },
-    {
-        "LEFT_ID": "scale_indicator",
-        "REL_OP": ">",
-        "RIGHT_ID": "adverb",
-        "RIGHT_ATTRS": {"DEP": "acl"},
-    },
-    # Cond_3: {}=N1>/nmod:in/ {}=N2
-    # expressed_aspect -[nmod]-> expression_location (EL)
-    {
-        "LEFT_ID": "adverb",
-        "REL_OP": ">>",
-        "RIGHT_ID": "compared_entity_1",
-        "RIGHT_ATTRS": {"DEP": {"IN": ["nmod", "dobj"]}},
-    },
-    # Cond_3 part_b: case:in
-    # expression_location -[case]-> in
-    {
-        "LEFT_ID": "compared_entity_1",
-        "REL_OP": ">>",
-        "RIGHT_ID": "case_in",
-        "RIGHT_ATTRS": {"DEP": "case", "ORTH": {"IN": ["in", "In"]}},
-    },
-]
-
-
-def relation_extraction(sentence, nlp, verbose=False, debug=False):
+# Matcher backends: spaCy DependencyMatcher or the compiled matcher of rule_matcher
+matcher_backends = {'spacy': DependencyMatcher, 'compiled': CompiledDependencyMatcher}
+
+
+class RuleRegistry:
+    """
+    DependencyMatchers of all the TypeA and TypeB rules, compiled once for a spaCy vocabulary and shared across
+    sentences. Each rule has its own matcher, so that matches are returned as if the rule was the only one applied.
+    Matchers combining several rules, each under its own key, are compiled on demand and cached.
     """
-    Relation Extraction Module
 
-    :param sentence: (spacy.tokens.doc.Doc) input sentence
+    def __init__(self, vocab, rule_set, max_combined=1024, backend='spacy'):
+        """
+        :param vocab: (spacy.vocab.Vocab) vocabulary of the spaCy model.
+        :param rule_set: (dict) rule set returned by rule_loader.load_rule_file.
+        :param max_combined: (int) maximum number of combined matchers kept in memory.
+        :param backend: (String) matcher backend, one of matcher_backends.
+        """
+        self.vocab = vocab
+        self.backend = backend
+        self.matcher_class = matcher_backends[backend]
+        self.rule_set = rule_set
+        self.patterns = {}
+        self.matchers = {}
+        for rule_name, pattern in rule_set['rules']:
+            self.patterns[rule_name] = pattern
+            self.matchers[rule_name] = self._new_matcher([rule_name])
+        self.max_combined = max_combined
+        self.combined_matchers = {}
+
+    def _new_matcher(self, rule_names):
+        matcher = self.matcher_class(self.vocab)
+        for rule_name in rule_names:
+            if self.matcher_class is CompiledDependencyMatcher:
+                # The rules have already been validated and compiled by the rule loader
+                matcher.add_compiled(rule_name, [self.patterns[rule_name]], [self.rule_set['compiled'][rule_name]])
+            else:
+                matcher.add(rule_name, [self.patterns[rule_name]])
+        return matcher
+
+    def combined(self, rule_names):
+        """
+        :param rule_names: tuple(String) names of the rules, without repetitions.
+        :return: (spacy.matcher.DependencyMatcher) matcher containing all the rules, each under its own key.
+        """
+        matcher = self.combined_matchers.get(rule_names)
+        if matcher is None:
+            if len(self.combined_matchers) >= self.max_combined:
+                self.combined_matchers.clear()
+            matcher = self._new_matcher(rule_names)
+            self.combined_matchers[rule_names] = matcher
+        return matcher
+
+    def __getitem__(self, rule_name):
+        """
+        :param rule_name: (String) name of the rule, as returned by find_rule and find_rule_b.
+        :return: (spacy.matcher.DependencyMatcher) matcher containing only the rule.
+        """
+        return self.matchers[rule_name]
+
+
+# Registries compiled so far, by vocabulary and backend
+_registries = {}
+
+
+def compile_rules(nlp, backend='spacy'):
+    """
+    Compile the rule registry for a spaCy model, if it has not been compiled yet. Call it at startup to avoid
+    compiling the rules while processing the first sentence.
+
     :param nlp: (spacy.language) nlp object Spacy model.
-    :param verbose: (Boolean) if True display diagnostic prints
-    :param debug: (Boolean) if True not raise an exception but return 'rule_not_found'
+    :param backend: (String) matcher backend, one of matcher_backends.
+    :return: (RuleRegistry) registry of the model.
+    """
+    registry = _registries.get((id(nlp.vocab), backend))
+    # The registry keeps a reference to its vocab, so the id cannot be reused by another vocabulary
+    if registry is None or registry.vocab is not nlp.vocab:
+        registry = RuleRegistry(nlp.vocab, rule_set, backend=backend)
+        _registries[(id(nlp.vocab), backend)] = registry
+    return registry
 
-    :return: list(dict()) list of dictionary of extracted components with the following keys: scale_indicator
-            (spacy.tokens), compared_aspect (spacy.tokens.doc.Doc.ents), compared_entity_1 (spacy.tokens.doc.Doc.ents),
-            compared_entity_2 (spacy.tokens.doc.Doc.ents)
-    :return: string containing sentence_type
-    :return: list of applied rules for debugging purposes
+
+def use_rules(rules_file=None):
+    """
+    Load a rule file and use its rules in the relation extraction module. The registries compiled for the previous
+    rules are discarded.
+
+    :param rules_file: (String) path to the JSON rule file, rule_loader.default_rules_file if None.
+    :return: (dict) rule set, see rule_loader.compile_rule_file.
+    """
+    global rule_set, patterns, cmp_triggers, cmp1_triggers, cmp2_triggers, cmp12B_triggers, cmp3_triggers, \
+        cmp1_trigger_set, cmp2_trigger_set, cmp12_trigger_set, cmp3_trigger_set
+    new_rule_set = load_rule_file(rules_file)
+    missing = [name for name in required_lexicons if name not in new_rule_set['lexicons']] + \
+              [name for name in required_patterns if name not in new_rule_set['patterns']]
+    if missing:
+        raise InvalidRuleFile(f'missing lexicons or patterns {missing}')
+    rule_set = new_rule_set
+    patterns = rule_set['patterns']
+    lexicons = rule_set['lexicons']
+    # Compare words triggers
+    cmp_triggers = lexicons['cmp_triggers']
+    # Triggers for pattern rule selection
+    cmp1_triggers = lexicons['cmp1_triggers']
+    cmp2_triggers = lexicons['cmp2_triggers']
+    cmp12B_triggers = lexicons['cmp12B_triggers']
+    cmp3_triggers = lexicons['cmp3_triggers']
+    # Trigger sets for rule selection lookups
+    cmp1_trigger_set = frozenset(cmp1_triggers)
+    cmp2_trigger_set = frozenset(cmp2_triggers)
+    cmp12_trigger_set = cmp1_trigger_set | cmp2_trigger_set
+    cmp3_trigger_set = frozenset(cmp3_triggers)
+    _registries.clear()
+    return rule_set
+
+
+def iter_rules():
+    """
+    Enumerate all the rules that find_rule and find_rule_b can select, named as in those functions.
+
+    :return: generator of (rule name, pattern) tuples, where the pattern is the concatenation of starter and cmp_rule.
+    """
+    yield from rule_set['rules']
+
+
+# Rules used by the module, DEXTER_RULES_FILE overrides the rule file shipped with DEXTER
+use_rules(os.environ.get('DEXTER_RULES_FILE'))
+
+
+def match_rules(sentence, rules_list, registry, single_pass=False):
+    """
+    Apply the rules to the sentence, either running the matcher of each rule or, if single_pass is True, running
+    once a matcher containing all the rules and routing the matches to the rules by match_id.
+
+    :param sentence: (spacy.tokens.doc.Doc) input sentence
+    :param rules_list: list(dict()) rules returned by find_rule or find_rule_b.
+    :param registry: (RuleRegistry) compiled rules.
+    :param single_pass: (Boolean) if True match all the rules in one matcher call.
+
+    :return: generator of (rule name, matcher, matches, seconds spent matching) tuples, in the order of rules_list.
+    """
+    # Matches of different parse trees are ordered differently by a combined matcher, so sentences with more than
+    # one root are matched rule by rule (see rule_matcher.order_roots)
+    if single_pass and len(rules_list) > 1 and len([t for t in sentence if t.head.i == t.i]) == 1:
+        rule_names = tuple(dict.fromkeys(rule['name'] for rule in rules_list))
+        matcher = registry.combined(rule_names)
+        start_time = time.perf_counter()
+        matches_by_id = {}
+        for match_id, token_ids in matcher(sentence):
+            matches_by_id.setdefault(match_id, []).append(token_ids)
+        # The time of the single pass is split among the rules
+        seconds = (time.perf_counter() - start_time) / len(rules_list)
+        for rule in rules_list:
+            rule_name = rule['name']
+            # Token ids are copied as extract_components modifies them
+            matches = [(registry.vocab.strings[rule_name], list(token_ids))
+                       for token_ids in matches_by_id.get(registry.vocab.strings[rule_name], [])]
+            yield rule_name, matcher, matches, seconds
+    else:
+        for rule in rules_list:
+            matcher = registry[rule['name']]
+            start_time = time.perf_counter()
+            matches = matcher(sentence)
+            yield rule['name'], matcher, matches, time.perf_counter() - start_time
+
+
+def order_rules(rules_list, rule_stats):
     """
+    Order the rules by their historical yield, see instrumentation.RuleStats.rule_yield. Rules with the same yield
+    keep their order.
+
+    :param rules_list: list(dict()) rules returned by find_rule or find_rule_b.
+    :param rule_stats: (instrumentation.RuleStats) statistics of the rules. If None, the rules keep their order.
+
+    :return: list(dict()) rules sorted by decreasing yield.
+    """
+    if rule_stats is None:
+        return rules_list
+    return sorted(rules_list, key=lambda rule: -rule_stats.rule_yield(rule['name']))
+
+
+# Status of an ExtractionResult: components extracted, or name of the failure (as the exception raised by
+# relation_extraction)
+status_ok = 'ok'
+status_match_not_found = 'MatchNotFound'
+
+
+class ExtractionResult:
+    """
+    Outcome of the relation extraction module on a sentence.
+    """
+
+    def __init__(self, status, components=None, sent_type=None, rules=None, component_rules=None):
+        """
+        :param status: (String) status_ok if components have been extracted, otherwise status_match_not_found.
+        :param components: list(dict()) extracted components, see relation_extraction.
+        :param sent_type: (String) 'TypeA' or 'TypeB', None if no component has been extracted.
+        :param rules: list(String) names of the applied rules, in order.
+        :param component_rules: list(String) name of the rule that produced each component.
+        """
+        self.status = status
+        self.components = components if components is not None else []
+        self.sent_type = sent_type
+        self.rules = rules if rules is not None else []
+        self.component_rules = component_rules if component_rules is not None else []
+
+    def __repr__(self):
+        return f'ExtractionResult(status={self.status!r}, sent_type={self.sent_type!r}, ' \
+               f'components={len(self.components)}, rules={self.rules!r})'
+
+
+def extract_relations(sentence, nlp, verbose=False, single_pass=False, backend='spacy', rule_stats=None,
+                      adaptive=False, accept=None, max_accepted=1):
+    """
+    Relation Extraction Module, returning the outcome as a result object instead of raising an exception.
+
+    :param sentence: (spacy.tokens.doc.Doc) input sentence
+    :param nlp: (spacy.language) nlp object Spacy model.
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
+    :param single_pass: (Boolean) if True match all the applicable rules in one matcher call
+    :param backend: (String) matcher backend, 'spacy' (DependencyMatcher) or 'compiled' (rule_matcher)
+    :param rule_stats: (instrumentation.RuleStats) if given, record the statistics of the applied rules
+    :param adaptive: (Boolean) if True apply the rules in order of historical yield (in their listed order if
+    rule_stats is None)
+    :param accept: (callable) if given, called on each extracted component, True if the component meets the type
+    constraints. Once max_accepted components have been accepted, the remaining rules are not applied.
+    :param max_accepted: (int) number of accepted components after which the module stops applying rules
+
+    :return: (ExtractionResult) extracted components, sentence type and applied rules. If no TypeA component is
+    found, the result of extract_relations_b.
+    """
+    # Diagnostic messages are also produced when DEBUG logging is enabled for this module
+    verbose = verbose or logger.isEnabledFor(logging.DEBUG)
     rules = []
     rules_list = find_rule(sentence, verbose)
     if not rules_list:
         if verbose:
-            print('No rules for TypeA sentences, trying for TypeB')
-        return re_module_b(sentence, nlp, verbose, debug)
+            logger.debug('No rules for TypeA sentences, trying for TypeB')
+        return extract_relations_b(sentence, nlp, verbose, single_pass, backend, rule_stats, adaptive, accept,
+                                   max_accepted)
     # List of matches that will be returned
     results = []
+    # Rule of each returned match
+    result_rules = []
     check_duplicate = []
-    matcher = DependencyMatcher(nlp.vocab)
-    rule_name = rules_list[0]['name']
-    rules.append(rule_name)
-    print("Using rule: " + rule_name)
-    matcher.add(rule_name, [rules_list[0]['starter'] + rules_list[0]['cmp']])
-    matches = matcher(sentence)
-    if matches:
-        if verbose:
-            print("Number of matches: " + str(len(matches)))
-            print("Extracting components from matches")
-        # Storing components in a dictionary
-        for components in extract_components(sentence, 'TypeA', matches, matcher, rule_name, nlp, verbose):
-            # Discard duplicate matches, if any
-            tmp = [components['scale_indicator'].text, components['compared_aspect'].text,
-                   components['compared_entity_1'].text, components['compared_entity_2'].text]
-            if tmp not in check_duplicate:
-                check_duplicate.append(tmp)
-                results.append(components)
-    prev_rule = rules_list[0]
-    for j in range(1, len(rules_list)):
-        # Removing previous rule
-        matcher.remove(prev_rule['name'])
-        # Adding next rule to the DependencyMatcher
-        rule_name = rules_list[j]['name']
+    accepted = 0
+    if adaptive:
+        rules_list = order_rules(rules_list, rule_stats)
+    registry = compile_rules(nlp, backend)
+    for rule_name, matcher, matches, seconds in match_rules(sentence, rules_list, registry, single_pass):
         rules.append(rule_name)
-        print("Using rule: " + rule_name)
-        # Adding comparison pattern based on retrieved information
-        matcher.add(rule_name, [rules_list[j]['starter'] + rules_list[j]['cmp']])
-        matches = matcher(sentence)
+        if verbose:
+            logger.debug('Using rule: %s', rule_name)
+        if rule_stats is not None:
+            rule_stats.count(rule_name, 'selected')
+            rule_stats.add_time(rule_name, 'matcher_seconds', seconds)
         # Extracting components from matched results
         if matches:
             if verbose:
-                print("Number of matches: " + str(len(matches)))
-                print("Extracting components from matches")
+                logger.debug('Number of matches: %s', len(matches))
+                logger.debug('Extracting components from matches')
+            start_time = time.perf_counter()
             # Storing components in a dictionary
             for components in extract_components(sentence, 'TypeA', matches, matcher, rule_name, nlp, verbose):
                 # Discard duplicate matches, if any
@@ -963,89 +299,208 @@ def relation_extraction(sentence, nlp, verbose=False, debug=False):
                 if tmp not in check_duplicate:
                     check_duplicate.append(tmp)
                     results.append(components)
-        # Updating previous rule
-        prev_rule = rules_list[j]
+                    result_rules.append(rule_name)
+                    if accept is not None and accept(components):
+                        accepted += 1
+            if rule_stats is not None:
+                rule_stats.count(rule_name, 'matched')
+                rule_stats.count(rule_name, 'matches', len(matches))
+                rule_stats.add_time(rule_name, 'extract_seconds', time.perf_counter() - start_time)
+            if accept is not None and accepted >= max_accepted:
+                if verbose:
+                    logger.debug('Enough components accepted, skipping the remaining rules')
+                break
     if not results:
         if verbose:
-            print('No TypeA matches, trying for typeB matches')
-        return re_module_b(sentence, nlp, verbose, debug)
+            logger.debug('No TypeA matches, trying for typeB matches')
+        return extract_relations_b(sentence, nlp, verbose, single_pass, backend, rule_stats, adaptive, accept,
+                                   max_accepted)
     if verbose:
-        print('Returning TypeA matches')
-    return results, 'TypeA', rules
+        logger.debug('Returning TypeA matches')
+    if rule_stats is not None:
+        for rule_name in result_rules:
+            rule_stats.count(rule_name, 'components')
+    return ExtractionResult(status_ok, results, 'TypeA', rules, result_rules)
 
 
-def re_module_b(sentence, nlp, verbose, debug):
+def extract_relations_b(sentence, nlp, verbose=False, single_pass=False, backend='spacy', rule_stats=None,
+                        adaptive=False, accept=None, max_accepted=1):
     """
-    Relation Extraction module for TypeB sentences. If RE module fails and debug is False raise an Exception
-    otherwise return None, string message, list of used rules
-
-    :param sentence: (spacy.tokens.doc.Doc) input sentence
-    :param nlp: (spacy.language) nlp object Spacy model.
-    :param verbose: (Boolean) if True display diagnostic prints
-    :param debug: (Boolean) if True also return list of rules used
+    Relation Extraction module for TypeB sentences, returning the outcome as a result object instead of raising an
+    exception. Parameters as in extract_relations.
 
-    :return: list(dict()) list of dictionary of extracted components with the following keys: scale_indicator
-            (spacy.tokens), compared_aspect (spacy.tokens.doc.Doc.ents), compared_entity_1 (spacy.tokens.doc.Doc.ents),
-            compared_entity_2 (spacy.tokens.doc.Doc.ents)
-    :return: string containing sentence_type
-    :return: list of applied rules for debugging purposes
+    :return: (ExtractionResult) extracted components, sentence type and applied rules, or status_match_not_found.
     """
+    verbose = verbose or logger.isEnabledFor(logging.DEBUG)
     rules = []
     # Return list of rules that can be applied to the sentence
     rules_list = find_rule_b(sentence, verbose)
     if not rules_list:
         if verbose:
-            print('No rule found')
-        if debug:
-            return None, 'match_not_found', rules
-        else:
-            raise MatchNotFound
+            logger.debug('No rule found')
+        return ExtractionResult(status_match_not_found, rules=rules)
     # List of matches that will be returned
     results = []
-    # Create DependencyMatcher object
-    matcher = DependencyMatcher(nlp.vocab)
-    rule_name = rules_list[0]['name']
-    rules.append(rule_name)
-    if verbose:
-        print("Using rule: " + rule_name)
-    matcher.add(rule_name, [rules_list[0]['starter'] + rules_list[0]['cmp']])
-    matches = matcher(sentence)
-    if matches:
-        if verbose:
-            print("Number of matches: " + str(len(matches)))
-            print("Extracting components from matches")
-        # Storing components in a dictionary
-        for components in extract_components(sentence, 'TypeB', matches, matcher, rule_name, nlp, verbose):
-            results.append(components)
-    prev_rule = rules_list[0]
-    for j in range(1, len(rules_list)):
-        matcher.remove(prev_rule['name'])
-        rule_name = rules_list[j]['name']
+    # Rule of each returned match
+    result_rules = []
+    accepted = 0
+    if adaptive:
+        rules_list = order_rules(rules_list, rule_stats)
+    registry = compile_rules(nlp, backend)
+    for rule_name, matcher, matches, seconds in match_rules(sentence, rules_list, registry, single_pass):
         rules.append(rule_name)
         if verbose:
-            print("Using rule: " + rule_name)
-        # Adding comparison pattern based on retrieved information
-        matcher.add(rule_name, [rules_list[j]['starter'] + rules_list[j]['cmp']])
-        matches = matcher(sentence)
+            logger.debug('Using rule: %s', rule_name)
+        if rule_stats is not None:
+            rule_stats.count(rule_name, 'selected')
+            rule_stats.add_time(rule_name, 'matcher_seconds', seconds)
         # Extracting components from matched results
         if matches:
             if verbose:
-                print("Number of matches: " + str(len(matches)))
-                print("Extracting components from matches")
+                logger.debug('Number of matches: %s', len(matches))
+                logger.debug('Extracting components from matches')
+            start_time = time.perf_counter()
             # Storing components in a dictionary
             for components in extract_components(sentence, 'TypeB', matches, matcher, rule_name, nlp, verbose):
                 results.append(components)
-        prev_rule = rules_list[j]
+                result_rules.append(rule_name)
+                if accept is not None and accept(components):
+                    accepted += 1
+            if rule_stats is not None:
+                rule_stats.count(rule_name, 'matched')
+                rule_stats.count(rule_name, 'matches', len(matches))
+                rule_stats.add_time(rule_name, 'extract_seconds', time.perf_counter() - start_time)
+            if accept is not None and accepted >= max_accepted:
+                if verbose:
+                    logger.debug('Enough components accepted, skipping the remaining rules')
+                break
     if not results:
         if verbose:
-            print('RE module failed')
-        if debug:
-            return None, 'match_not_found', rules
-        else:
-            raise MatchNotFound
+            logger.debug('RE module failed')
+        return ExtractionResult(status_match_not_found, rules=rules)
     if verbose:
-        print('Returning TypeB matches')
-    return results, 'TypeB', rules
+        logger.debug('Returning TypeB matches')
+    if rule_stats is not None:
+        for rule_name in result_rules:
+            rule_stats.count(rule_name, 'components')
+    return ExtractionResult(status_ok, results, 'TypeB', rules, result_rules)
+
+
+def unpack_result(result, debug):
+    """
+    Convert a result of extract_relations into the return value of relation_extraction.
+
+    :param result: (ExtractionResult) outcome of the relation extraction module.
+    :param debug: (Boolean) if True not raise an exception but return 'match_not_found'
+
+    :return: extracted components, sentence type and applied rules, or None, 'match_not_found' and applied rules
+    """
+    if result.status == status_ok:
+        return result.components, result.sent_type, result.rules
+    if debug:
+        return None, 'match_not_found', result.rules
+    raise MatchNotFound
+
+
+def relation_extraction(sentence, nlp, verbose=False, debug=False, single_pass=False, backend='spacy',
+                        rule_stats=None, adaptive=False, accept=None, max_accepted=1):
+    """
+    Relation Extraction Module. See extract_relations for a version that does not raise exceptions.
+
+    :param sentence: (spacy.tokens.doc.Doc) input sentence
+    :param nlp: (spacy.language) nlp object Spacy model.
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
+    :param debug: (Boolean) if True not raise an exception but return 'rule_not_found'
+    :param single_pass: (Boolean) if True match all the applicable rules in one matcher call
+    :param backend: (String) matcher backend, 'spacy' (DependencyMatcher) or 'compiled' (rule_matcher)
+    :param rule_stats: (instrumentation.RuleStats) if given, record the statistics of the applied rules
+    :param adaptive: (Boolean) if True apply the rules in order of historical yield (in their listed order if
+    rule_stats is None)
+    :param accept: (callable) if given, called on each extracted component, True if the component meets the type
+    constraints. Once max_accepted components have been accepted, the remaining rules are not applied.
+    :param max_accepted: (int) number of accepted components after which the module stops applying rules
+
+    :return: list(dict()) list of dictionary of extracted components with the following keys: scale_indicator
+            (spacy.tokens), compared_aspect (spacy.tokens.doc.Doc.ents), compared_entity_1 (spacy.tokens.doc.Doc.ents),
+            compared_entity_2 (spacy.tokens.doc.Doc.ents)
+    :return: string containing sentence_type
+    :return: list of applied rules for debugging purposes
+    """
+    return unpack_result(extract_relations(sentence, nlp, verbose, single_pass, backend, rule_stats, adaptive, accept,
+                                           max_accepted), debug)
+
+
+def re_module_b(sentence, nlp, verbose, debug, single_pass=False, backend='spacy', rule_stats=None, adaptive=False,
+                accept=None, max_accepted=1):
+    """
+    Relation Extraction module for TypeB sentences. If RE module fails and debug is False raise an Exception
+    otherwise return None, string message, list of used rules. See extract_relations_b for a version that does not
+    raise exceptions.
+
+    :param sentence: (spacy.tokens.doc.Doc) input sentence
+    :param nlp: (spacy.language) nlp object Spacy model.
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
+    :param debug: (Boolean) if True also return list of rules used
+    :param single_pass: (Boolean) if True match all the applicable rules in one matcher call
+    :param backend: (String) matcher backend, 'spacy' (DependencyMatcher) or 'compiled' (rule_matcher)
+    :param rule_stats: (instrumentation.RuleStats) if given, record the statistics of the applied rules
+    :param adaptive: (Boolean) if True apply the rules in order of historical yield (in their listed order if
+    rule_stats is None)
+    :param accept: (callable) if given, called on each extracted component, True if the component meets the type
+    constraints. Once max_accepted components have been accepted, the remaining rules are not applied.
+    :param max_accepted: (int) number of accepted components after which the module stops applying rules
+
+    :return: list(dict()) list of dictionary of extracted components with the following keys: scale_indicator
+            (spacy.tokens), compared_aspect (spacy.tokens.doc.Doc.ents), compared_entity_1 (spacy.tokens.doc.Doc.ents),
+            compared_entity_2 (spacy.tokens.doc.Doc.ents)
+    :return: string containing sentence_type
+    :return: list of applied rules for debugging purposes
+    """
+    return unpack_result(extract_relations_b(sentence, nlp, verbose, single_pass, backend, rule_stats, adaptive,
+                                             accept, max_accepted), debug)
+
+
+# Token features used by rule selection, see index_rule_features
+if not Doc.has_extension('rule_features'):
+    Doc.set_extension('rule_features', default=None)
+
+
+def index_rule_features(sentence):
+    """
+    Index in one pass the token features used to select the rules, and store the index in the Doc extension
+    'rule_features'. The index is rebuilt if the sentence has been retokenized.
+
+    :param sentence: (spacy.tokens.doc.Doc) input sentence
+
+    :return: dict() index with keys: 'length' (number of tokens), 'lemmas' ({lemma: [token ids]}), 'deps'
+    ({dep: [token ids]}), 'child_deps' ({token id: set of dependencies of its children}), 'case_in_heads' (set of
+    the ids of the heads of 'in' tokens with dependency 'case') and 'cmps' (comparison words, in sentence order).
+    """
+    features = sentence._.rule_features
+    if features is not None and features['length'] == len(sentence):
+        return features
+    lemmas = {}
+    deps = {}
+    child_deps = {}
+    case_in_heads = set()
+    cmps = []
+    for t in sentence:
+        lemmas.setdefault(t.lemma_, []).append(t.i)
+        deps.setdefault(t.dep_, []).append(t.i)
+        head_i = t.head.i
+        if head_i != t.i:
+            child_deps.setdefault(head_i, set()).add(t.dep_)
+        if t.dep_ == 'case' and t.text == 'in':
+            case_in_heads.add(head_i)
+        # Comparison word (i.e., 'than'|'versus'|'compared'|'comparison')
+        lower = t.text.lower()
+        if (lower in cmp_triggers and t.dep_ in ['case', 'cc']) or \
+                (lower in ['compared', 'comparison'] and t.dep_ in ['case', 'dep', 'xcomp', 'advcl', 'prep', 'nmod', 'acl']):
+            cmps.append(t)
+    features = {'length': len(sentence), 'lemmas': lemmas, 'deps': deps, 'child_deps': child_deps,
+                'case_in_heads': case_in_heads, 'cmps': cmps}
+    sentence._.rule_features = features
+    return features
 
 
 def find_rule(sentence, verbose):
@@ -1053,91 +508,95 @@ def find_rule(sentence, verbose):
     Finding TypeA rules that can be applied to the sentence based on its structure.
 
     :param sentence: (spacy.tokens.doc.Doc) input sentence
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
     :return: list(dict()) list of dictionaries with rule names and pattern to be applied to the sentence.
     """
+    features = index_rule_features(sentence)
+    lemmas = features['lemmas']
     # Comparison word (i.e., 'than'|'versus'|'compared'|'comparison')
-    cmps = [t for t in sentence if (t.text.lower() in cmp_triggers and t.dep_ in ['case', 'cc']) or
-            (t.text.lower() in ['compared', 'comparison'] and t.dep_ in ['case', 'dep', 'xcomp', 'advcl', 'prep', 'nmod', 'acl'])]
+    cmps = features['cmps']
     if cmps:
         rules = []
+        # Lemmas of tokens with dependency 'xcomp'
+        xcomp_lemmas = {sentence[i].lemma_ for i in features['deps'].get('xcomp', ())}
         # Checking for cmp1 triggers
-        if [t for t in sentence if t.lemma_ in cmp1_triggers]:
+        if not cmp1_trigger_set.isdisjoint(lemmas):
             if verbose:
-                print('There is a cmp1 trigger ***')
+                logger.debug('There is a cmp1 trigger ***')
             # Check if there is a cmp_rule that can be applied
-            cmp_rule = find_cmp_rule(sentence, cmps, cmp1_triggers, verbose)
+            cmp_rule = find_cmp_rule(sentence, cmps, cmp1_trigger_set, verbose)
             if cmp_rule is not None:
                 if verbose:
-                    print('*** cmp1 rules can be applied ***')
+                    logger.debug('*** cmp1 rules can be applied ***')
                 # Both CE1 and CE2 depends on the scale_indicator
-                rules.append({'name': 'cmp1_n0_' + cmp_rule[0], 'starter': cmp1_n0, 'cmp': cmp_rule[1]})
+                rules.append({'name': 'cmp1_n0_' + cmp_rule[0], 'starter': patterns['cmp1_n0'], 'cmp': cmp_rule[1]})
                 # CE1 depends on the scale_indicator, CE2 depends on the compared_aspect
-                rules.append({'name': 'cmp1_n1_' + cmp_rule[0], 'starter': cmp1_n1, 'cmp': cmp_rule[1]})
+                rules.append({'name': 'cmp1_n1_' + cmp_rule[0], 'starter': patterns['cmp1_n1'], 'cmp': cmp_rule[1]})
             else:
                 if verbose:
-                    print('cmp_rule is None, failed to apply cmp1 rules')
+                    logger.debug('cmp_rule is None, failed to apply cmp1 rules')
         # Checking for cmp2 triggers
-        if [t for t in sentence if t.lemma_ in cmp2_triggers]:
+        if not cmp2_trigger_set.isdisjoint(lemmas):
             if verbose:
-                print('There is a cmp2 trigger ***')
+                logger.debug('There is a cmp2 trigger ***')
             # Check if there is a cmp_rule that can be applied
-            cmp_rule = find_cmp_rule(sentence, cmps, cmp2_triggers, verbose)
+            cmp_rule = find_cmp_rule(sentence, cmps, cmp2_trigger_set, verbose)
             if cmp_rule is not None:
                 if verbose:
-                    print('*** cmp2 rules can be applied ***')
+                    logger.debug('*** cmp2 rules can be applied ***')
                 # Both CE1 and CE2 depends on the scale_indicator
-                rules.append({'name': 'cmp2_n0_' + cmp_rule[0], 'starter': cmp2_n0, 'cmp': cmp_rule[1]})
+                rules.append({'name': 'cmp2_n0_' + cmp_rule[0], 'starter': patterns['cmp2_n0'], 'cmp': cmp_rule[1]})
                 # CE1 depends on the scale_indicator, CE2 depends on the compared_aspect
-                rules.append({'name': 'cmp2_n1_' + cmp_rule[0], 'starter': cmp2_n1, 'cmp': cmp_rule[1]})
+                rules.append({'name': 'cmp2_n1_' + cmp_rule[0], 'starter': patterns['cmp2_n1'], 'cmp': cmp_rule[1]})
             else:
                 if verbose:
-                    print('cmp_rule is None, failed to apply cmp2 rules')
+                    logger.debug('cmp_rule is None, failed to apply cmp2 rules')
         # Checking for cmp3 triggers
-        if [t for t in sentence if t.lemma_ in cmp3_triggers]:
+        if not cmp3_trigger_set.isdisjoint(lemmas):
             if verbose:
-                print('There is a cmp3 trigger ***')
+                logger.debug('There is a cmp3 trigger ***')
             # Check if there is a cmp_rule that can be applied
-            cmp_rule = find_cmp_rule(sentence, cmps, cmp3_triggers, verbose)
+            cmp_rule = find_cmp_rule(sentence, cmps, cmp3_trigger_set, verbose)
             if cmp_rule is not None:
                 if verbose:
-                    print('*** cmp3 rules can be applied ***')
+                    logger.debug('*** cmp3 rules can be applied ***')
                 # SI is amod dep on compared_aspect
-                rules.append({'name': 'cmp3_n0_amod_' + cmp_rule[0], 'starter': cmp3_n0_amod, 'cmp': cmp_rule[1]})
+                rules.append({'name': 'cmp3_n0_amod_' + cmp_rule[0], 'starter': patterns['cmp3_n0_amod'], 'cmp': cmp_rule[1]})
                 # SI is xcomp dep on compared_aspect, all the rest depends on cmp3 trig
-                rules.append({'name': 'cmp3_n0_xcomp_n0_' + cmp_rule[0], 'starter': cmp3_n0_xcomp_n0, 'cmp': cmp_rule[1]})
+                rules.append({'name': 'cmp3_n0_xcomp_n0_' + cmp_rule[0], 'starter': patterns['cmp3_n0_xcomp_n0'], 'cmp': cmp_rule[1]})
                 # CE1 depends on the scale_indicator, CE2 depends on the compared_aspect
-                rules.append({'name': 'cmp3_n1_' + cmp_rule[0], 'starter': cmp3_n1, 'cmp': cmp_rule[1]})
+                rules.append({'name': 'cmp3_n1_' + cmp_rule[0], 'starter': patterns['cmp3_n1'], 'cmp': cmp_rule[1]})
             else:
                 if verbose:
-                    print('cmp_rule is None, failed to apply cmp3 rules')
-        if [t for t in sentence if t.lemma_ in cmp1_triggers if t.dep_ == 'xcomp']:
+                    logger.debug('cmp_rule is None, failed to apply cmp3 rules')
+        if not cmp1_trigger_set.isdisjoint(xcomp_lemmas):
             # Check if there is a cmp_rule that can be applied
-            cmp_rule = find_cmp_rule(sentence, cmps, cmp1_triggers, verbose)
+            cmp_rule = find_cmp_rule(sentence, cmps, cmp1_trigger_set, verbose)
             if cmp_rule is not None:
                 if verbose:
-                    print('*** cmp3_n0_xcomp_SI rule can be applied ***')
+                    logger.debug('*** cmp3_n0_xcomp_SI rule can be applied ***')
                 # SI is xcomp dep on cmp3 trig, all the rest depends on SI (cmp1 trigger)
-                rules.append({'name': 'cmp3_n0_xcomp_SI_' + cmp_rule[0], 'starter': cmp3_n0_xcomp_SI, 'cmp': cmp_rule[1]})
-        if [t for t in sentence if t.lemma_ in cmp2_triggers if t.dep_ == 'xcomp']:
+                rules.append({'name': 'cmp3_n0_xcomp_SI_' + cmp_rule[0], 'starter': patterns['cmp3_n0_xcomp_SI'], 'cmp': cmp_rule[1]})
+        if not cmp2_trigger_set.isdisjoint(xcomp_lemmas):
             # Check if there is a cmp_rule that can be applied
-            cmp_rule = find_cmp_rule(sentence, cmps, cmp2_triggers, verbose)
+            cmp_rule = find_cmp_rule(sentence, cmps, cmp2_trigger_set, verbose)
             if cmp_rule is not None:
                 if verbose:
-                    print('*** cmp3_n0_xcomp_SI rule can be applied ***')
+                    logger.debug('*** cmp3_n0_xcomp_SI rule can be applied ***')
                 # SI is xcomp dep on cmp3 trig, all the rest depends on SI (cmp2 trigger)
-                rules.append({'name': 'cmp3_n0_xcomp_SI_' + cmp_rule[0], 'starter': cmp3_n0_xcomp_SI, 'cmp': cmp_rule[1]})
+                rules.append({'name': 'cmp3_n0_xcomp_SI_' + cmp_rule[0], 'starter': patterns['cmp3_n0_xcomp_SI'], 'cmp': cmp_rule[1]})
         if rules:
-            print('Returning TypeA rules')
+            if verbose:
+                logger.debug('Returning TypeA rules')
             return rules
         else:
             if verbose:
-                print('No comparison word in the sentence, try for type-B sentence')
+                logger.debug('No comparison word in the sentence, try for type-B sentence')
             return None
     else:
         if verbose:
-            print('No comparison word in the sentence, try for type-B sentence')
+            logger.debug('No comparison word in the sentence, try for type-B sentence')
         return None
 
 
@@ -1147,99 +606,102 @@ def find_cmp_rule(sentence, cmps, triggers, verbose):
 
     :param sentence: (spacy.tokens.doc.Doc) input sentence
     :param cmps: (list(String)) list of comparison word found in the sentence.
-    :param triggers: (list(String)) list of scale_indicator triggers.
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param triggers: (frozenset(String)) set of scale_indicator triggers.
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
     :return: list() list with rule names and pattern to be applied to the sentence.
     """
+    features = index_rule_features(sentence)
+    case_in_heads = features['case_in_heads']
+    child_deps = features['child_deps']
 
     for cmp_word in cmps:
         if cmp_word.text.lower() == "than":
             # than + in
-            if [t for t in sentence if t.dep_ == 'case' and t.text == 'in' and t.head == cmp_word.head]:
+            if cmp_word.head.i in case_in_heads:
                 # CE2 depends on SI
                 if cmp_word.head.head.lemma_ in triggers:
                     if verbose:
-                        print('*** cmp_rule found: than_1_SI')
-                    return ["than_1_SI", than_1_SI]
+                        logger.debug('*** cmp_rule found: than_1_SI')
+                    return ["than_1_SI", patterns['than_1_SI']]
                 # CE2 depends on CE1
                 elif cmp_word.head.head.head.lemma_ in triggers or cmp_word.head.head.head.head.lemma_ in triggers:
                     if verbose:
-                        print('*** cmp_rule found: than_1_CE1')
-                    return ["than_1_CE1", than_1_CE1]
+                        logger.debug('*** cmp_rule found: than_1_CE1')
+                    return ["than_1_CE1", patterns['than_1_CE1']]
             # than
             else:
                 # CE2 depends on SI
                 if cmp_word.head.head.lemma_ in triggers:
                     if verbose:
-                        print('*** cmp_rule found: than_2_SI')
-                    return ["than_2_SI", than_2_SI]
+                        logger.debug('*** cmp_rule found: than_2_SI')
+                    return ["than_2_SI", patterns['than_2_SI']]
                 # CE2 depends on CE1
                 elif cmp_word.head.head.head.lemma_ in triggers or cmp_word.head.head.head.head.lemma_ in triggers:
                     if verbose:
-                        print('*** cmp_rule found: than_2_CE1')
-                    return ["than_2_CE1", than_2_CE1]
+                        logger.debug('*** cmp_rule found: than_2_CE1')
+                    return ["than_2_CE1", patterns['than_2_CE1']]
         elif cmp_word.text.lower() == "versus" or cmp_word.text.lower() == "vs.":
             # Check 'versus' dependencies
             if cmp_word.dep_ == 'case':
                 # versus + in
-                if [t for t in sentence if t.dep_ == 'case' and t.text == 'in' and t.head == cmp_word.head]:
+                if cmp_word.head.i in case_in_heads:
                     # CE2 depends on SI
                     if cmp_word.head.head.lemma_ in triggers:
                         if verbose:
-                            print('*** cmp_rule found: vs_1_SI')
-                        return ["vs_1_SI", vs_1_SI]
+                            logger.debug('*** cmp_rule found: vs_1_SI')
+                        return ["vs_1_SI", patterns['vs_1_SI']]
                     # CE2 depends on CE1
                     elif cmp_word.head.head.head.lemma_ in triggers or cmp_word.head.head.head.lemma_ in triggers:
                         if verbose:
-                            print('*** cmp_rule found: vs_1_CE1')
-                        return ["vs_1_CE1", vs_1_CE1]
+                            logger.debug('*** cmp_rule found: vs_1_CE1')
+                        return ["vs_1_CE1", patterns['vs_1_CE1']]
                 else:
                     # CE2 depends on SI
                     if cmp_word.head.head.lemma_ in triggers:
                         if verbose:
-                            print('*** cmp_rule found: than_2_SI')
-                        return ["than_2_SI", than_2_SI]
+                            logger.debug('*** cmp_rule found: than_2_SI')
+                        return ["than_2_SI", patterns['than_2_SI']]
                     # CE2 depends on CE1
                     elif cmp_word.head.head.head.lemma_ in triggers or cmp_word.head.head.head.lemma_ in triggers:
                         if verbose:
-                            print('*** cmp_rule found: than_2_CE1')
-                        return ["than_2_CE1", than_2_CE1]
+                            logger.debug('*** cmp_rule found: than_2_CE1')
+                        return ["than_2_CE1", patterns['than_2_CE1']]
             # versus with dep "cc"
             elif cmp_word.dep_ == 'cc':
                 if verbose:
-                    print('*** cmp_rule found: vs_2')
-                return ["vs_2", vs_2]
+                    logger.debug('*** cmp_rule found: vs_2')
+                return ["vs_2", patterns['vs_2']]
             else:
                 if verbose:
-                    print('*** No cmp_rule found')
+                    logger.debug('*** No cmp_rule found')
                 return None
         elif cmp_word.text.lower() == "compared" or cmp_word.text.lower() == "comparison":
             # if compared have no children with dependency "nmod" then both CEs depends on the SI
-            if not [t for t in cmp_word.children if t.dep_ == "nmod"]:
+            if "nmod" not in child_deps.get(cmp_word.i, ()):
                 # CE2 depends on SI
                 if cmp_word.head.head.lemma_ in triggers:
                     if verbose:
-                        print('*** cmp_rule found: compare_1_SI')
-                    return ["compare_1_SI", compare_1_SI]
+                        logger.debug('*** cmp_rule found: compare_1_SI')
+                    return ["compare_1_SI", patterns['compare_1_SI']]
                 # CE2 depends on CE1
                 else:
                     if verbose:
-                        print('*** cmp_rule found: compare_1_CE1')
-                    return ["compare_1_CE1", compare_1_CE1]
+                        logger.debug('*** cmp_rule found: compare_1_CE1')
+                    return ["compare_1_CE1", patterns['compare_1_CE1']]
             else:
                 # SI|n0 > compared|comparison > CE2
                 if cmp_word.head.lemma_ in triggers:
                     if verbose:
-                        print('*** cmp_rule found: compare_2')
-                    return ['compare_2', compare_2]
+                        logger.debug('*** cmp_rule found: compare_2')
+                    return ['compare_2', patterns['compare_2']]
                 # CE1 > compared|comparison > CE2, CE1 may depend on SI or CA
                 elif cmp_word.head.head.lemma_ in triggers or cmp_word.head.head.head.lemma_ in triggers:
                     if verbose:
-                        print('*** cmp_rule found: compare_3')
-                    return ['compare_3', compare_3]
+                        logger.debug('*** cmp_rule found: compare_3')
+                    return ['compare_3', patterns['compare_3']]
     if verbose:
-        print('*** No cmp_rule found')
+        logger.debug('*** No cmp_rule found')
     return None
 
 
@@ -1248,96 +710,143 @@ def find_rule_b(sentence, verbose):
     Finding TypeB rules that can be applied to the sentence based on its structure.
 
     :param sentence: (spacy.tokens.doc.Doc) input sentence
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
     :return: list(dict()) list of dictionaries with rule names and pattern to be applied to the sentence.
     """
     rules = []
+    features = index_rule_features(sentence)
+    deps = features['deps']
+    # Tokens with a subject/acl dependency and tokens with a conj/acl/dep dependency
+    subj_ids = [i for dep in subj_deps for i in deps.get(dep, ())]
+    conj_ids = [i for dep in ['conj', 'acl', 'dep'] for i in deps.get(dep, ())]
     # Check if any subject depends on a possible level indicator (i.e, cmp1/2 trigger) (t.head is the level indicator)
-    subjs_trigs = [t for t in sentence if
-                   t.dep_ in ['nsubjpass', 'nsubj', 'dep', 'dobj', 'acl'] and t.head.lemma_ in cmp1_triggers + cmp2_triggers]
-    expIn_trigs = [t.head for t in subjs_trigs]
+    subjs_trigs = [i for i in subj_ids if sentence[i].head.lemma_ in cmp12_trigger_set]
     # Check if any cmp1/2 trigger has a dep 'conj' and its head have a subject/appos dependant
-    conj_expIn_trigs = [t for t in sentence if
-                        t.dep_ in ['conj', 'acl', 'dep'] and t.lemma_ in cmp1_triggers + cmp2_triggers]
-    appos_expIn_trigs = [t for t in sentence if t.dep_ in ['conj', 'acl', 'dep'] and
-                        t.lemma_ in cmp1_triggers + cmp2_triggers and t.head.dep_ == 'appos']
-    cmp3s = [t for t in sentence if t.lemma_ in cmp3_triggers]
+    conj_expIn_trigs = [i for i in conj_ids if sentence[i].lemma_ in cmp12_trigger_set]
+    appos_expIn_trigs = [i for i in conj_expIn_trigs if sentence[i].head.dep_ == 'appos']
+    cmp3s = {i for lemma in cmp3_trigger_set.intersection(features['lemmas']) for i in features['lemmas'][lemma]}
     if subjs_trigs:
         if verbose:
-            print('Rules where EA is the subject/acl of the sentence and depends on level indicator can be applied')
+            logger.debug('Rules where EA is the subject/acl of the sentence and depends on level indicator can be applied')
         # express_location depends on level_indicator
-        rules.append({'name': 'subj_expressionIn_1', 'starter': subj_exp, 'cmp': expressionIn_1})
+        rules.append({'name': 'subj_expressionIn_1', 'starter': patterns['subj_exp'], 'cmp': patterns['expressionIn_1']})
         # express_location depends on expressed_aspect
-        rules.append({'name': 'subj_expressionIn_2', 'starter': subj_exp, 'cmp': expressionIn_2})
+        rules.append({'name': 'subj_expressionIn_2', 'starter': patterns['subj_exp'], 'cmp': patterns['expressionIn_2']})
     if conj_expIn_trigs:
         if verbose:
-            print('Rules where EA is linked to level indicator by a path subj-conj can be applied')
+            logger.debug('Rules where EA is linked to level indicator by a path subj-conj can be applied')
         # express_location depends on level_indicator
-        rules.append({'name': 'conj_expressionIn_1', 'starter': conj_exp, 'cmp': expressionIn_1})
+        rules.append({'name': 'conj_expressionIn_1', 'starter': patterns['conj_exp'], 'cmp': patterns['expressionIn_1']})
         # express_location depends on expressed_aspect
-        rules.append({'name': 'conj_expressionIn_2', 'starter': conj_exp, 'cmp': expressionIn_2})
+        rules.append({'name': 'conj_expressionIn_2', 'starter': patterns['conj_exp'], 'cmp': patterns['expressionIn_2']})
     if appos_expIn_trigs:
         if verbose:
-            print('Rules where EA is appos depending on head of level indicator can be applied')
+            logger.debug('Rules where EA is appos depending on head of level indicator can be applied')
         # express_location depends on level_indicator
-        rules.append({'name': 'appos_expressionIn_1', 'starter': appos_exp, 'cmp': expressionIn_1})
+        rules.append({'name': 'appos_expressionIn_1', 'starter': patterns['appos_exp'], 'cmp': patterns['expressionIn_1']})
         # express_location depends on expressed_aspect
-        rules.append({'name': 'appos_expressionIn_2', 'starter': appos_exp, 'cmp': expressionIn_2})
+        rules.append({'name': 'appos_expressionIn_2', 'starter': patterns['appos_exp'], 'cmp': patterns['expressionIn_2']})
     if cmp3s:
         # Check if there is a subject/dobj/acl that depends on cmp3 trigs
-        subj = [t for t in sentence if t.dep_ in ['nsubjpass', 'nsubj', 'dep', 'dobj', 'acl'] and t.head in cmp3s]
+        subj = [i for i in subj_ids if sentence[i].head.i in cmp3s]
         # Check if any cmp3 trig have a dep 'conj' and its head have a subject dependant
-        conj = [t for t in cmp3s if t.dep_ == "conj"
-                and [c for c in t.head.children if c.dep_ in ['nsubj', 'nsubjpass', 'dep']]]
+        conj = [i for i in cmp3s if sentence[i].dep_ == "conj"
+                and not features['child_deps'].get(sentence[i].head.i, set()).isdisjoint(['nsubj', 'nsubjpass', 'dep'])]
         starters = []
         if verbose:
-            print('*** Sentence contains cmp3s triggers ***')
+            logger.debug('*** Sentence contains cmp3s triggers ***')
         if subj:
             if verbose:
-                print('Rules where EA is the subject/dobj/acl of the sentence and depends on cmp3 trigger can be applied')
-                print('Checking for cmp_rule')
-            starters.append(['subj_fnd', subj_fnd])
+                logger.debug('Rules where EA is the subject/dobj/acl of the sentence and depends on cmp3 trigger can be applied')
+                logger.debug('Checking for cmp_rule')
+            starters.append(['subj_fnd', patterns['subj_fnd']])
         if conj:
             if verbose:
-                print('Rules where EA is linked to n0 by a path subj-conj and depends on cmp3 trigger can be applied')
-                print('Checking for cmp_rule')
-            starters.append(['conj_fnd', conj_fnd])
+                logger.debug('Rules where EA is linked to n0 by a path subj-conj and depends on cmp3 trigger can be applied')
+                logger.debug('Checking for cmp_rule')
+            starters.append(['conj_fnd', patterns['conj_fnd']])
         if starters:
             # level indicator is an adjective whose dep is 'amod'
-            if [t for t in sentence if t.dep_ == 'amod' and t.tag_ in ['JJ', 'JJR', 'VBN', 'VBD']]:
+            if [i for i in deps.get('amod', ()) if sentence[i].tag_ in adj_tags]:
                 if verbose:
-                    print('Rules where LI is amod can be applied')
+                    logger.debug('Rules where LI is amod can be applied')
                 for s in starters:
                     # express_location depends on cmp3 trigger, LI dep 'amod' on cmp3 trigger
-                    rules.append({'name': s[0] + '_foundIn_1', 'starter': s[1], 'cmp': foundIn_1})
+                    rules.append({'name': s[0] + '_foundIn_1', 'starter': s[1], 'cmp': patterns['foundIn_1']})
                     # express_location depends on expressed_aspect, LI dep 'amod' on cmp3 trigger
-                    rules.append({'name': s[0] + '_foundIn_2', 'starter': s[1], 'cmp': foundIn_2})
+                    rules.append({'name': s[0] + '_foundIn_2', 'starter': s[1], 'cmp': patterns['foundIn_2']})
             # level indicator is an adverb
-            if [t for t in sentence if t.dep_ in ['xcomp', 'ccomp'] and t.tag_ == 'RB' and t.head in cmp3s]:
+            if [i for dep in ['xcomp', 'ccomp'] for i in deps.get(dep, ())
+                    if sentence[i].tag_ == 'RB' and sentence[i].head.i in cmp3s]:
                 if verbose:
-                    print('Rules where LI is adverb can be applied')
+                    logger.debug('Rules where LI is adverb can be applied')
                 for s in starters:
                     # level_indicator is xcomp, expression_location depends on level_indicator
-                    rules.append({'name': s[0] + '_RBfoundIn_xcomp', 'starter': s[1], 'cmp': RBfoundIn_xcomp})
+                    rules.append({'name': s[0] + '_RBfoundIn_xcomp', 'starter': s[1], 'cmp': patterns['RBfoundIn_xcomp']})
             # level indicator is an adjective whose dep is 'xcomp'/'ccomp'/'advcl'
-            if [t for t in sentence if
-                t.dep_ in ['xcomp', 'ccomp', 'advcl'] and t.tag_ in ['JJ', 'JJR', 'VBN', 'VBD'] and t.head in cmp3s]:
+            if [i for dep in ['xcomp', 'ccomp', 'advcl'] for i in deps.get(dep, ())
+                    if sentence[i].tag_ in adj_tags and sentence[i].head.i in cmp3s]:
                 if verbose:
-                    print('Rules where LI is xcomp can be applied')
+                    logger.debug('Rules where LI is xcomp can be applied')
                 for s in starters:
                     # level_indicator is xcomp, expression_location depends on level_indicator
-                    rules.append({'name': s[0] + '_EXPfoundIn_xcomp_1', 'starter': s[1], 'cmp': EXPfoundIn_xcomp_1})
+                    rules.append({'name': s[0] + '_EXPfoundIn_xcomp_1', 'starter': s[1], 'cmp': patterns['EXPfoundIn_xcomp_1']})
                     # level_indicator is xcomp, expression_location depends on cmp3 trigger
-                    rules.append({'name': s[0] + '_EXPfoundIn_xcomp_2', 'starter': s[1], 'cmp': EXPfoundIn_xcomp_2})
+                    rules.append({'name': s[0] + '_EXPfoundIn_xcomp_2', 'starter': s[1], 'cmp': patterns['EXPfoundIn_xcomp_2']})
     if rules:
         if verbose:
-            print('Returning TypeB rules')
+            logger.debug('Returning TypeB rules')
         return rules
     else:
         return None
 
 
+def expand_subtrees(sentence, token):
+    """
+    Expand a token to the smallest span that contains it and, for each of its tokens, the whole subtree.
+
+    :param sentence: (spacy.tokens.doc.Doc) input sentence
+    :param token: (spacy.tokens.Token) token to expand
+
+    :return: int, int start and end of the expanded span
+    """
+    start = token.left_edge.i
+    end = token.right_edge.i + 1
+    # Tokens in [left, right) have been visited
+    left = token.i
+    right = token.i + 1
+    while left > start or right < end:
+        if left > start:
+            left -= 1
+            t = sentence[left]
+        else:
+            t = sentence[right]
+            right += 1
+        start = min(start, t.left_edge.i)
+        end = max(end, t.right_edge.i + 1)
+    return start, end
+
+
+def index_entities(sentence):
+    """
+    Index the entities of the sentence by token, storing the index in the rule_features Doc extension.
+
+    :param sentence: (spacy.tokens.doc.Doc) input sentence
+
+    :return: list of entities, list of their start, list mapping each token to the entity containing it (or None)
+    """
+    features = index_rule_features(sentence)
+    if 'entities' not in features:
+        ents = list(sentence.ents)
+        ent_at = [None] * len(sentence)
+        for e in ents:
+            for j in range(e.start, e.end):
+                ent_at[j] = e
+        features['entities'] = (ents, [e.start for e in ents], ent_at)
+    return features['entities']
+
+
 def extract_components(sentence, sen_type, matches, matcher, rule_name, nlp, verbose):
     """
     Storing components in a dictionary {'match_id': {'comparison_component': (token|entity)}}.
@@ -1348,12 +857,14 @@ def extract_components(sentence, sen_type, matches, matcher, rule_name, nlp, ver
     :param matcher: (spacy.matcher.DependencyMatcher) matcher object
     :param rule_name: (string) rule used.
     :param nlp: (spacy.language) nlp object Spacy model.
-    :param verbose: (Boolean) if True display diagnostic prints
+    :param verbose: (Boolean) if True log diagnostic messages at DEBUG level
 
     :return: list of dictionary {'comparison_component': (token|entity)} for each match.
     """
     # List of matches to be returned
     comp_list = []
+    n_tokens = len(sentence)
+    ents, ent_starts, ent_at = index_entities(sentence)
 
     for idx in range(len(matches)):
         match_id, token_ids = matches[idx]
@@ -1363,7 +874,7 @@ def extract_components(sentence, sen_type, matches, matcher, rule_name, nlp, ver
         # Populate the new entry with token or entity corresponding to the component of the comparison
         for i in range(len(token_ids)):
             if verbose:
-                print(f'Extracting {patterns[i]["RIGHT_ID"]}, expanding {sentence[token_ids[i]].text}')
+                logger.debug('Extracting %s, expanding %s', patterns[i]['RIGHT_ID'], sentence[token_ids[i]].text)
             # Skip components used only for semgrex matching
             if patterns[i]["RIGHT_ID"] in component_keys:
                 if patterns[i]["RIGHT_ID"] == 'n0' and rule_name.startswith(('cmp1', 'cmp2', 'cmp3_n0_xcomp_SI')):
@@ -1373,7 +884,7 @@ def extract_components(sentence, sen_type, matches, matcher, rule_name, nlp, ver
                     component = patterns[i]['RIGHT_ID']
                 # Expanding "that" to retrieve the related entity
                 if sentence[token_ids[i]].pos_ == "DET" and sentence[token_ids[i]].text in ['that', 'those']:
-                    heads = [t for t in sentence if (t.head == sentence[token_ids[i]] and t.dep_ in ["nmod", "acl"])]
+                    heads = [t for t in sentence[token_ids[i]].children if t.dep_ in ["nmod", "acl"]]
                     if heads:
                         token_ids[i] = heads[0].i
                 # Expanding 'which' in CA/CE1/CE2
@@ -1382,32 +893,13 @@ def extract_components(sentence, sen_type, matches, matcher, rule_name, nlp, ver
                     if sentence[token_ids[i]].head.dep_ == 'acl:relcl':
                         token_ids[i] = sentence[token_ids[i]].head.head.i
                 # Extracting components (all outgoing edges from matched token)
-                children = [t for t in sentence[token_ids[i]].children]
+                token = sentence[token_ids[i]]
                 # Expanding CE1/CE2 if tokens have any children
-                if children and component not in ['n0', 'scale_indicator']:
-                    children.append(sentence[token_ids[i]])
-                    children.sort(key=lambda t: t.i)
-                    start = min(children[0].i, token_ids[i])
-                    end = max(children[len(children)-1].i+1, token_ids[i]+1)
-                    prev_component = sentence[token_ids[i]:token_ids[i]+1]
-                    # Expanding until new tokens have children
-                    while True:
-                        children = []
-                        for j in range(start, end):
-                            if sentence[j] not in prev_component:
-                                for c in sentence[j].children:
-                                    children.append(c)
-                        if verbose:
-                            print(children)
-                        if children:
-                            children.sort(key=lambda t: t.i)
-                            prev_component = sentence[start:end]
-                            start = min(children[0].i, start)
-                            end = max(children[len(children) - 1].i + 1, end)
-                            if verbose:
-                                print('new component:', sentence[start:end])
-                        else:
-                            break
+                if (token.n_lefts or token.n_rights) and component not in ['n0', 'scale_indicator']:
+                    # Expanding until the subtrees of all the tokens are included
+                    start, end = expand_subtrees(sentence, token)
+                    if verbose:
+                        logger.debug('new component: %s', sentence[start:end])
                     # Bounding start-end of the compared_entities
                     for j in range(start, end):
                         # Bounding CE1 start:  CE1 must start with 'in'
@@ -1435,7 +927,7 @@ def extract_components(sentence, sen_type, matches, matcher, rule_name, nlp, ver
                                     break
                             if end == prev_end:
                                 # look for cmp_trigger after end, stop also if verb is found
-                                for k in range(end, len([t for t in sentence])):
+                                for k in range(end, n_tokens):
                                     if component == 'compared_entity_1':
                                         end = k
                                         if (sen_type == 'TypeA' and sentence[k].text.lower() in cmp_triggers) \
@@ -1454,45 +946,48 @@ def extract_components(sentence, sen_type, matches, matcher, rule_name, nlp, ver
                                 if sentence[j].text.lower() in cmp_triggers:
                                     start = j
                                     if verbose:
-                                        print('new start detected:', sentence[start:end])
+                                        logger.debug('new start detected: %s', sentence[start:end])
                                     break
                             if start == prev_start:
                                 if verbose:
-                                    print('bounding compared_entity_2 start outside')
+                                    logger.debug('bounding compared_entity_2 start outside')
                                 # look for cmp_trigger before start
                                 j = start
                                 while j > 0:
                                     if sentence[j].text.lower() in cmp_triggers:
                                         start = j
                                         if verbose:
-                                            print('new start detected:', sentence[start:end])
+                                            logger.debug('new start detected: %s', sentence[start:end])
                                         # Expansion completed, exit while loop
                                         break
                                     else:
                                         j = j-1
                                 if verbose:
-                                    print('start remains unchanged')
+                                    logger.debug('start remains unchanged')
                                 # Expansion competed, exit outer loop
                                 break
                             else:
                                 # Expansion completed, exit outer loop
                                 break
                     # Expand component if next token is a closing bracket
-                    if end+1 < len([t for t in sentence]) and sentence[end+1].text == ')':
+                    if end+1 < n_tokens and sentence[end+1].text == ')':
                         end = end+1
                     # Expand component if it does not contain an entity but there is an entity right after it
-                    if not [e for e in sentence[start:end].ents] and [e for e in sentence.ents if (end+1 in range(e.start, e.end))]:
-                        # Extracting the entity
-                        end = [e for e in sentence.ents if (end+1 in range(e.start, e.end))][0].end
+                    if end+1 < n_tokens and ent_at[end+1] is not None:
+                        # First entity starting within the component, the component contains an entity if it also ends within
+                        k = bisect_left(ent_starts, start)
+                        if not (k < len(ents) and ents[k].end <= end):
+                            # Extracting the entity
+                            end = ent_at[end+1].end
                     if verbose:
-                        print(f'Adding expandend component {sentence[start:end]}')
+                        logger.debug('Adding expandend component %s', sentence[start:end])
                     comp_dict[component] = sentence[start:end]
                 else:
                     if verbose:
-                        print(f'Adding component {sentence[token_ids[i]]}')
+                        logger.debug('Adding component %s', sentence[token_ids[i]])
                     # Other components remains unchanged (i.e., scale_indicator)
                     comp_dict[component] = sentence[token_ids[i]]
         if verbose:
-            print('Adding components to the list of matches')
+            logger.debug('Adding components to the list of matches')
         comp_list.append(comp_dict)
     return comp_list
@@ -0,0 +1,157 @@
+# Loader of the declarative rule files of the relation extraction module
+import hashlib
+import json
+import os
+import pickle
+
+from exceptions import InvalidRuleFile
+from rule_matcher import compile_pattern
+
+# Rule file shipped with DEXTER
+default_rules_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules', 'dexter_rules.json')
+# Version of the rule file format and of the compiled rule sets, part of the cache key
+rule_format_version = 1
+# Keys of a pattern node, 'comment' is ignored
+node_keys = {'RIGHT_ID', 'RIGHT_ATTRS', 'LEFT_ID', 'REL_OP', 'comment'}
+# Rule sets are built combining each starter pattern with each cmp_rule pattern
+rule_set_keys = ['starters', 'cmp_rules']
+
+# Rule sets loaded so far, by hash of the rule file
+_loaded = {}
+
+
+def resolve_lexicons(attrs, lexicons, where):
+    """
+    Replace the references to lexicons ("@name") used as IN/NOT_IN values of the node attributes.
+
+    :param attrs: (dict) RIGHT_ATTRS of a pattern node.
+    :param lexicons: (dict) {lexicon name: list of words}.
+    :param where: (String) location of the node, used in error messages.
+    :return: (dict) RIGHT_ATTRS with the lexicons in place of the references.
+    """
+    resolved = {}
+    for key, value in attrs.items():
+        if isinstance(value, dict):
+            value = dict(value)
+            for op in ['IN', 'NOT_IN']:
+                if isinstance(value.get(op), str):
+                    if not value[op].startswith('@') or value[op][1:] not in lexicons:
+                        raise InvalidRuleFile(f'{where}: unknown lexicon {value[op]}')
+                    value[op] = list(lexicons[value[op][1:]])
+        resolved[key] = value
+    return resolved
+
+
+def compile_rule_file(data, digest=None):
+    """
+    Validate the content of a rule file and compile it into a rule set. Every rule is compiled by
+    rule_matcher.compile_pattern, so that invalid or unsupported patterns are rejected when the file is loaded.
+
+    :param data: (dict) content of the rule file with keys 'version', 'lexicons' ({name: list of words}), 'patterns'
+    ({name: {'description': optional list of comments, 'nodes': list of DependencyMatcher nodes}}) and 'rule_sets'
+    ({name: {'starters': {rule name: pattern name}, 'cmp_rules': {rule name: pattern name}}}).
+    :param digest: (String) hash of the rule file.
+    :return: (dict) rule set with keys 'digest', 'lexicons', 'patterns' ({name: list of nodes}), 'rule_sets' ({name:
+    {'starters': list of (rule name, pattern name), 'cmp_rules': ...}}), 'rules' (list of (rule name, pattern) of
+    all the combinations of starter and cmp_rule) and 'compiled' ({rule name: compiled pattern}).
+    """
+    if not isinstance(data, dict):
+        raise InvalidRuleFile('the rule file must contain a JSON object')
+    if data.get('version') != rule_format_version:
+        raise InvalidRuleFile(f"unsupported version {data.get('version')}")
+    for key in ['lexicons', 'patterns', 'rule_sets']:
+        if not isinstance(data.get(key), dict):
+            raise InvalidRuleFile(f'missing or invalid {key}')
+    lexicons = {}
+    for name, words in data['lexicons'].items():
+        if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+            raise InvalidRuleFile(f'lexicon {name} must be a list of strings')
+        lexicons[name] = words
+    patterns = {}
+    for name, pattern in data['patterns'].items():
+        if not isinstance(pattern, dict) or not isinstance(pattern.get('nodes'), list) or not pattern['nodes']:
+            raise InvalidRuleFile(f'pattern {name} must have a non-empty list of nodes')
+        nodes = []
+        for j, node in enumerate(pattern['nodes']):
+            where = f'pattern {name}, node {j}'
+            if not isinstance(node, dict) or not isinstance(node.get('RIGHT_ID'), str) or \
+                    not isinstance(node.get('RIGHT_ATTRS'), dict):
+                raise InvalidRuleFile(f'{where}: RIGHT_ID and RIGHT_ATTRS are required')
+            unknown = set(node) - node_keys
+            if unknown:
+                raise InvalidRuleFile(f'{where}: unknown keys {sorted(unknown)}')
+            node = {key: value for key, value in node.items() if key != 'comment'}
+            node['RIGHT_ATTRS'] = resolve_lexicons(node['RIGHT_ATTRS'], lexicons, where)
+            nodes.append(node)
+        patterns[name] = nodes
+    rule_sets = {}
+    rules = []
+    compiled = {}
+    for set_name, rule_set in data['rule_sets'].items():
+        if not isinstance(rule_set, dict) or set(rule_set) != set(rule_set_keys):
+            raise InvalidRuleFile(f'rule set {set_name} must have keys {rule_set_keys}')
+        rule_sets[set_name] = {}
+        for key in rule_set_keys:
+            if not isinstance(rule_set[key], dict):
+                raise InvalidRuleFile(f'{key} of rule set {set_name} must map rule names to pattern names')
+            for pattern_name in rule_set[key].values():
+                if pattern_name not in patterns:
+                    raise InvalidRuleFile(f'rule set {set_name}: unknown pattern {pattern_name}')
+            rule_sets[set_name][key] = list(rule_set[key].items())
+        for starter_name, starter in rule_sets[set_name]['starters']:
+            for cmp_name, cmp_rule in rule_sets[set_name]['cmp_rules']:
+                rule_name = starter_name + '_' + cmp_name
+                if rule_name in compiled:
+                    raise InvalidRuleFile(f'duplicate rule {rule_name}')
+                pattern = patterns[starter] + patterns[cmp_rule]
+                try:
+                    compiled[rule_name] = compile_pattern(pattern)
+                except ValueError as e:
+                    raise InvalidRuleFile(f'rule {rule_name}: {e}')
+                rules.append((rule_name, pattern))
+    return {'digest': digest, 'lexicons': lexicons, 'patterns': patterns, 'rule_sets': rule_sets, 'rules': rules,
+            'compiled': compiled}
+
+
+def load_rule_file(rules_file=None, cache_dir=None):
+    """
+    Load a rule file. The compiled rule set is cached in a pickle file named after the hash of the rule file, so
+    that the rules are validated and compiled only when the file changes.
+
+    :param rules_file: (String) path to the JSON rule file, default_rules_file if None.
+    :param cache_dir: (String) directory of the compiled rule sets, '.rule_cache' next to the rule file if None.
+    :return: (dict) compiled rule set, see compile_rule_file.
+    """
+    if rules_file is None:
+        rules_file = default_rules_file
+    with open(rules_file, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content + b'\0' + str(rule_format_version).encode()).hexdigest()
+    rule_set = _loaded.get(digest)
+    if rule_set is not None:
+        return rule_set
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(rules_file)), '.rule_cache')
+    cache_file = os.path.join(cache_dir, digest + '.pickle')
+    try:
+        with open(cache_file, 'rb') as f:
+            rule_set = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        rule_set = None
+    if rule_set is None or rule_set.get('digest') != digest:
+        try:
+            data = json.loads(content.decode('utf-8'))
+        except ValueError as e:
+            raise InvalidRuleFile(f'{rules_file}: {e}')
+        rule_set = compile_rule_file(data, digest)
+        # The cache is optional, e.g., the rule directory may be read-only
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_file = cache_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(rule_set, f)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+    _loaded[digest] = rule_set
+    return rule_set
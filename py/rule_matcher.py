@@ -0,0 +1,318 @@
+from spacy.tokens import Doc
+
+# Token attributes supported in RIGHT_ATTRS
+token_attributes = {'LEMMA': 'lemma_', 'DEP': 'dep_', 'ORTH': 'orth_', 'TAG': 'tag_'}
+# Relation operators supported in REL_OP
+relation_operators = ['>', '>>', ';']
+
+# Per-Doc arrays used by the compiled matcher, see analyze_tree
+if not Doc.has_extension('dependency_tree'):
+    Doc.set_extension('dependency_tree', default=None)
+
+
+def compile_node(attrs):
+    """
+    Compile the RIGHT_ATTRS of a pattern node into a hashable predicate specification.
+
+    :param attrs: (dict) RIGHT_ATTRS of the node.
+
+    :return: tuple(Boolean, tuple) negation flag ('OP': '!') and tuple of (attribute, operator, value) checks.
+    """
+    checks = []
+    negate = False
+    for key, value in attrs.items():
+        if key == 'OP':
+            if value != '!':
+                raise ValueError(f'Unsupported operator {value}')
+            negate = True
+        elif key not in token_attributes:
+            raise ValueError(f'Unsupported token attribute {key}')
+        elif isinstance(value, str):
+            checks.append((token_attributes[key], '==', value))
+        elif isinstance(value, dict) and len(value) == 1 and 'IN' in value:
+            checks.append((token_attributes[key], 'IN', frozenset(value['IN'])))
+        elif isinstance(value, dict) and len(value) == 1 and 'NOT_IN' in value:
+            checks.append((token_attributes[key], 'NOT_IN', frozenset(value['NOT_IN'])))
+        else:
+            raise ValueError(f'Unsupported value for token attribute {key}: {value}')
+    return negate, tuple(sorted(checks, key=repr))
+
+
+def compile_pattern(pattern):
+    """
+    Compile a DependencyMatcher pattern. The first node is the root, every other node is linked to a previous node.
+
+    :param pattern: list(dict) pattern with keys RIGHT_ID, RIGHT_ATTRS and, except for the root, LEFT_ID and REL_OP.
+
+    :return: list of (node specification, index of the left node, relation operator) tuples, one for each node.
+    """
+    node_ids = {}
+    nodes = []
+    for j, node in enumerate(pattern):
+        if node['RIGHT_ID'] in node_ids:
+            raise ValueError(f"Duplicate RIGHT_ID {node['RIGHT_ID']}")
+        if j == 0:
+            if 'LEFT_ID' in node or 'REL_OP' in node:
+                raise ValueError('The first node of a pattern must be the root')
+            left, op = None, None
+        else:
+            if node.get('LEFT_ID') not in node_ids:
+                raise ValueError(f"LEFT_ID of {node['RIGHT_ID']} must be defined by a previous node")
+            if node.get('REL_OP') not in relation_operators:
+                raise ValueError(f"Unsupported relation operator {node.get('REL_OP')}")
+            left, op = node_ids[node['LEFT_ID']], node['REL_OP']
+        node_ids[node['RIGHT_ID']] = j
+        nodes.append((compile_node(node['RIGHT_ATTRS']), left, op))
+    return nodes
+
+
+def analyze_tree(doc):
+    """
+    Compute the per-Doc arrays used to evaluate the patterns, and store them in the Doc extension 'dependency_tree'.
+
+    :param doc: (spacy.tokens.doc.Doc) input sentence
+
+    :return: dict() with keys 'values' ({attribute: list of token values}), 'children' (token ids of the children of
+    each token, in order), 'root' (root of the tree of each token), 'tin'/'tout' (visit interval of each token: a
+    token is an ancestor of another iff its interval strictly contains the other's), 'hull' ({root: (first token,
+    last token) of its tree, as computed by spaCy}) and 'candidates' (cache of the tokens matching each node
+    specification).
+    """
+    tree = doc._.dependency_tree
+    if tree is not None and tree['length'] == len(doc):
+        return tree
+    n = len(doc)
+    heads = [t.head.i for t in doc]
+    children = [[] for _ in range(n)]
+    roots = []
+    for i, head in enumerate(heads):
+        if head == i:
+            roots.append(i)
+        else:
+            children[head].append(i)
+    root = [0] * n
+    tin = [0] * n
+    tout = [0] * n
+    hull = {}
+    clock = 0
+    for r in roots:
+        # Iterative depth-first visit of the tree of r
+        stack = [(r, 0)]
+        tin[r] = clock
+        clock += 1
+        while stack:
+            node, k = stack[-1]
+            if k < len(children[node]):
+                stack[-1] = (node, k + 1)
+                child = children[node][k]
+                root[child] = r
+                tin[child] = clock
+                clock += 1
+                stack.append((child, 0))
+            else:
+                stack.pop()
+                tout[node] = clock
+        root[r] = r
+        # The ';' operator of DependencyMatcher is bounded by the edges computed by spaCy, which may not cover the
+        # whole tree if it is not projective
+        hull[r] = (doc[r].left_edge.i, doc[r].right_edge.i)
+    values = {attr: [getattr(t, attr) for t in doc] for attr in token_attributes.values()}
+    tree = {'length': n, 'values': values, 'children': children, 'root': root, 'tin': tin, 'tout': tout,
+            'hull': hull, 'candidates': {}}
+    doc._.dependency_tree = tree
+    return tree
+
+
+def node_candidates(tree, spec):
+    """
+    :param tree: (dict) per-Doc arrays, see analyze_tree.
+    :param spec: (tuple) node specification, see compile_node.
+
+    :return: (list, set) ids of the tokens matching the node specification, in order, and the same ids as a set.
+    """
+    cached = tree['candidates'].get(spec)
+    if cached is None:
+        negate, checks = spec
+        values = tree['values']
+        ids = []
+        for i in range(tree['length']):
+            match = True
+            for attr, op, value in checks:
+                v = values[attr][i]
+                if op == '==':
+                    match = v == value
+                elif op == 'IN':
+                    match = v in value
+                else:
+                    match = v not in value
+                if not match:
+                    break
+            if match != negate:
+                ids.append(i)
+        cached = (ids, set(ids))
+        tree['candidates'][spec] = cached
+    return cached
+
+
+class CompiledDependencyMatcher:
+    """
+    Matcher for the subset of DependencyMatcher patterns used by DEXTER rules: '>', '>>' and ';' relations, LEMMA,
+    DEP, ORTH and TAG attributes with exact values, IN and NOT_IN, and the '!' operator. Patterns are compiled into
+    node predicates evaluated on per-Doc arrays, and matches are returned in the same format and order as
+    spacy.matcher.DependencyMatcher.
+    """
+
+    def __init__(self, vocab):
+        """
+        :param vocab: (spacy.vocab.Vocab) vocabulary of the spaCy model.
+        """
+        self.vocab = vocab
+        # {key: (raw patterns, compiled patterns)}
+        self._patterns = {}
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __contains__(self, key):
+        return self._normalize_key(key) in self._patterns
+
+    def _normalize_key(self, key):
+        if isinstance(key, str):
+            return self.vocab.strings.add(key)
+        return key
+
+    def add(self, key, patterns, on_match=None):
+        """
+        Add a rule to the matcher.
+
+        :param key: (String) match ID.
+        :param patterns: list(list(dict)) patterns of the rule.
+        :param on_match: not supported, must be None.
+        """
+        if on_match is not None:
+            raise ValueError('Callbacks are not supported by the compiled matcher')
+        self.add_compiled(key, patterns, [compile_pattern(pattern) for pattern in patterns])
+
+    def add_compiled(self, key, patterns, compiled):
+        """
+        Add a rule whose patterns have already been compiled (e.g., by the rule loader), skipping their validation.
+
+        :param key: (String) match ID.
+        :param patterns: list(list(dict)) patterns of the rule.
+        :param compiled: list(list(tuple)) patterns compiled by compile_pattern, in the same order.
+        """
+        raw, compiled_patterns = self._patterns.setdefault(self._normalize_key(key), ([], []))
+        raw.extend(patterns)
+        compiled_patterns.extend(compiled)
+
+    def get(self, key, default=None):
+        """
+        :param key: (String|int) match ID.
+        :return: (tuple) (on_match, patterns) of the rule, as spacy.matcher.DependencyMatcher.get.
+        """
+        key = self._normalize_key(key)
+        if key not in self._patterns:
+            return default
+        return None, self._patterns[key][0]
+
+    def remove(self, key):
+        """
+        :param key: (String|int) match ID of the rule to remove.
+        """
+        key = self._normalize_key(key)
+        if key not in self._patterns:
+            raise ValueError(f'Key {key} not in the matcher')
+        del self._patterns[key]
+
+    def __call__(self, doc):
+        """
+        Find all the matches of the rules in the sentence.
+
+        :param doc: (spacy.tokens.doc.Doc) input sentence
+
+        :return: list[tuple[int, list[int]]] list of (match_id, token ids) tuples, token ids in pattern node order.
+        """
+        tree = analyze_tree(doc)
+        compiled = [(key, nodes) for key, (_, compiled_patterns) in self._patterns.items() for nodes in compiled_patterns]
+        # Trees are ordered by the first token matching any node of any rule in the matcher
+        roots = order_roots(tree, [spec for _, nodes in compiled for spec, _, _ in nodes])
+        matches = []
+        for key, nodes in compiled:
+            for token_ids in match_pattern(tree, nodes, roots):
+                matches.append((key, token_ids))
+        return matches
+
+
+def order_roots(tree, specs):
+    """
+    Order the trees of the sentence by their first token matching any of the node specifications, as
+    spacy.matcher.DependencyMatcher does. Trees without any matching token are discarded.
+
+    :param tree: (dict) per-Doc arrays, see analyze_tree.
+    :param specs: list(tuple) node specifications, see compile_node.
+
+    :return: list(int) roots of the trees.
+    """
+    if len(tree['hull']) == 1:
+        return list(tree['hull'])
+    root = tree['root']
+    first = {}
+    for spec in set(specs):
+        for i in node_candidates(tree, spec)[0]:
+            if i < first.get(root[i], tree['length']):
+                first[root[i]] = i
+    return sorted(first, key=first.get)
+
+
+def match_pattern(tree, nodes, roots=None):
+    """
+    Find the matches of a compiled pattern. As in spacy.matcher.DependencyMatcher, matches are grouped by the tree
+    they belong to, and within a tree they are ordered as the cartesian product of the candidates of each node.
+
+    :param tree: (dict) per-Doc arrays, see analyze_tree.
+    :param nodes: list(tuple) compiled pattern, see compile_pattern.
+    :param roots: list(int) roots of the trees in matching order, see order_roots. If None, trees are ordered by the
+    first token matching any node of the pattern.
+
+    :return: list(list(int)) token ids of each match, in pattern node order.
+    """
+    candidates = [node_candidates(tree, spec) for spec, _, _ in nodes]
+    if not all(ids for ids, _ in candidates):
+        return []
+    if roots is None:
+        roots = order_roots(tree, [spec for spec, _, _ in nodes])
+    root = tree['root']
+    if len(roots) == 1:
+        groups = [(roots[0], candidates[0][0])]
+    else:
+        groups = [(r, [i for i in candidates[0][0] if root[i] == r]) for r in roots]
+    children = tree['children']
+    tin = tree['tin']
+    tout = tree['tout']
+    results = []
+    assignment = [0] * len(nodes)
+
+    def search(j, group_root):
+        if j == len(nodes):
+            results.append(list(assignment))
+            return
+        _, left, op = nodes[j]
+        ids, id_set = candidates[j]
+        left_i = assignment[left]
+        if op == '>':
+            options = [c for c in children[left_i] if c in id_set]
+        elif op == '>>':
+            options = [c for c in ids if tin[left_i] < tin[c] < tout[left_i]]
+        else:
+            c = left_i - 1
+            first_i, last_i = tree['hull'][root[left_i]]
+            options = [c] if c in id_set and root[c] == group_root and first_i <= c <= last_i else []
+        for c in options:
+            assignment[j] = c
+            search(j + 1, group_root)
+
+    for group_root, root_ids in groups:
+        for i in root_ids:
+            assignment[0] = i
+            search(1, group_root)
+    return results